@@ -1,17 +1,32 @@
-import streamlit
-from streamlit_agraph import agraph, Node, Edge, Config
+import os
 from pathlib import Path
-from tkinter import filedialog
-import tkinter as tk
-from typing import Callable, Iterable, List, Optional
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional
 
 import streamlit as st
 from streamlit_option_menu import option_menu
 
-from fdk.storage.gateway import TModel, fdk_gateway
+from fdk.analysis.graph import (AGGREGATE, OBJECT, PROPERTY, PSET,
+                                ModelGraph, SubGraph)
+from fdk.importer import FdkImporter
+from fdk.jobs import FAILED, SUCCEEDED, Job, JobRunner
+from fdk.journal import ImportJournal
+from fdk.metrics import MetricsRegistry, metrics
+from fdk.storage.columnar.gateway import columnar_gateway, export_catalog
+from fdk.models.models import Property
+from fdk.storage.db.documents import DetaDocumentStore, DocumentListener
+from fdk.storage.db.hierarchy import DetaHierarchyStore, HierarchyListener
+from fdk.storage.db.stats import DetaStatsStore, StatsListener
+from fdk.storage.gateway import IFdkGateway, IGatewayListener, fdk_gateway
+from fdk.storage.query import Page
 from fdk.storage.json.gateway import fdk_import_gateway
 
-db = fdk_gateway()
+if TYPE_CHECKING:
+    from streamlit_agraph import Edge, Node
+
+catalog_path = Path(os.getenv('FDK_CATALOG', '.fdk/catalog.fdkc'))
+journal_path = Path(os.getenv('FDK_IMPORT_JOURNAL', '.fdk/import-journal.jsonl'))
+page_size = 25
+object_documents = os.getenv('FDK_OBJECT_DOCUMENTS', '0') == '1'
 
 
 # -------------- SETTINGS --------------
@@ -26,7 +41,34 @@ st.set_page_config(page_title=page_title, page_icon=page_icon, layout=layout)
 st.title(page_title + ' ' + page_icon)
 
 
+@st.cache_resource
+def _stats_store() -> DetaStatsStore:
+    return DetaStatsStore()
+
+
+@st.cache_resource
+def _hierarchy_store() -> DetaHierarchyStore:
+    return DetaHierarchyStore()
+
+
+@st.cache_resource
+def _document_store() -> Optional[DetaDocumentStore]:
+    return DetaDocumentStore() if object_documents else None
+
+
+@st.cache_resource
+def _db() -> IFdkGateway:
+    listeners: List[IGatewayListener] = [StatsListener(_stats_store()), HierarchyListener(_hierarchy_store())]
+    store = _document_store()
+    if store is not None:
+        listeners.append(DocumentListener(store))
+    return fdk_gateway(listeners=listeners, index=_hierarchy_store(), documents=store)
+
+
 def _select_folder() -> Path:
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()
     # Make folder picker dialog appear on top of other windows
@@ -34,44 +76,200 @@ def _select_folder() -> Path:
     return Path(filedialog.askdirectory(master=root)).absolute()
 
 
-def _text(models: List[TModel], text: str, count: Optional[int] = None):
-    count = len(models) if count is None else count
-    model_count = str(len(models))
-    count_with_zeros = f'{count}'.zfill(len(model_count))
-    return f'{count_with_zeros}/{model_count}: {text}'
+_NODE_COLORS = {
+    OBJECT: '#268bd2',
+    PSET: '#2aa198',
+    PROPERTY: '#d33682',
+    AGGREGATE: '#93a1a1',
+}
+
+
+@st.cache_resource
+def _read_db() -> IFdkGateway:
+    # the memory-mapped catalog is shared by all sessions and server processes
+    if catalog_path.exists():
+        return columnar_gateway(catalog_path)
+    return _db()
+
+
+@st.cache_resource
+def _model_graph() -> ModelGraph:
+    read_db = _read_db()
+    return ModelGraph.from_models(objects=read_db.get_objects(lazy=True), property_sets=read_db.get_psets(lazy=True),
+                                  properties=read_db.get_properties())
+
+
+def _agraph_nodes(subgraphs: Iterable[SubGraph]) -> List['Node']:
+    from streamlit_agraph import Node
+
+    nodes = {}
+    for subgraph in subgraphs:
+        for node in subgraph.nodes:
+            if node.node_id in nodes:
+                continue
+            size = 25 if node.node_id == subgraph.root_id else 15
+            nodes[node.node_id] = Node(id=node.node_id, label=node.label, size=size,
+                                       color=_NODE_COLORS.get(node.kind))
+    return list(nodes.values())
+
+
+def _agraph_edges(subgraphs: Iterable[SubGraph]) -> List['Edge']:
+    from streamlit_agraph import Edge
+
+    edges = {}
+    for subgraph in subgraphs:
+        for edge in subgraph.edges:
+            edges[(edge.source, edge.target)] = Edge(source=edge.source, target=edge.target)
+    return list(edges.values())
+
+
+def show_graph(subgraphs: List[SubGraph]):
+    from streamlit_agraph import Config, agraph
 
+    agraph(nodes=_agraph_nodes(subgraphs), edges=_agraph_edges(subgraphs),
+           config=Config(width=750, height=950, directed=False, physics=True, hierarchical=False))
 
-def _grouped_models(models: Iterable[TModel], group_size: int) -> List[Iterable[TModel]]:
-    model_groups = []
-    group = []
-    for model in models:
-        group.append(model)
-        if len(group) == group_size:
-            model_groups.append(group)
-            group = []
-    if len(group) > 0:
-        model_groups.append(group)
-    return model_groups
 
+def _property_rows(properties: Iterable[Property]) -> List[dict]:
+    return [{'id': prop.fdk_id, 'name': prop.name, 'format': prop.format, 'unit': prop.unit} for prop in properties]
 
-def import_models(models: List[TModel], model_name: str, callback: Callable[[Iterable[TModel]], None], group_size: int = 25):
-    pregress = f'Import "{model_name}" in progress. Please wait.'
-    progress_bar = st.progress(0, text=pregress)
-    model_count = len(models)
-    index = 0
-    for group in _grouped_models(models, group_size):
-        callback(group)
-        index += 1
-        count = index * group_size
-        percent = min(count/model_count, 1)
-        progress_bar.progress(percent, text=_text(models, pregress, count))
-    progress_bar.progress(1.0, text=_text(models, pregress))
 
+def _paged(key: str, fetch: Callable[[Optional[str]], Page]) -> Page:
+    # keyset cursors of the visited pages, only the visible page is fetched
+    cursors = st.session_state.setdefault(f'{key}.cursors', [None])
+    page = fetch(cursors[-1])
+    col1, col2 = st.columns(2)
+    if col1.button('Previous', key=f'{key}.previous', disabled=len(cursors) == 1):
+        cursors.pop()
+        st.experimental_rerun()
+    if col2.button('Next', key=f'{key}.next', disabled=page.after is None):
+        cursors.append(page.after)
+        st.experimental_rerun()
+    return page
 
-def delete_models(model_name: str, callback: Callable[[], None]):
-    pregress = f'Delete "{model_name}" in progress. Please wait.'
-    st.progress(0, text=pregress)
-    callback()
+
+def browse_hierarchy():
+    read_db = _read_db()
+    departments = read_db.departments()
+    department = st.selectbox('Department:', list(departments), format_func=lambda key: f'{key} ({departments[key]})')
+    if department is None:
+        return
+    groups = read_db.groups(department)
+    group = st.selectbox('Group:', list(groups), format_func=lambda key: f'{key} ({groups[key]})')
+    if group is None:
+        return
+    objects = _paged(f'objects:{department}:{group}',
+                     lambda after: read_db.page_objects(after, page_size, department=department, group=group))
+    fdk_object = st.selectbox('FDK Object:', objects.items, format_func=lambda model: f'{model.fdk_id}: {model.name}')
+    if fdk_object is None:
+        return
+    if st.checkbox('Show object detail'):
+        detail = read_db.object_detail(fdk_object.fdk_id)
+        if detail is not None:
+            st.text(detail.description)
+            st.dataframe([{'property_set': pset.name, **row} for pset in detail.property_sets
+                          for row in _property_rows(pset.properties)])
+    psets = _paged(f'psets:{fdk_object.fdk_id}',
+                   lambda after: read_db.page_psets(after, page_size, object_id=fdk_object.fdk_id))
+    pset = st.selectbox('FDK Property Set:', psets.items, format_func=lambda model: f'{model.fdk_id}: {model.name}')
+    if pset is None:
+        return
+    properties = _paged(f'properties:{pset.fdk_id}',
+                        lambda after: read_db.page_properties(after, page_size, pset_id=pset.fdk_id))
+    st.dataframe(_property_rows(properties.items))
+
+
+def _chart(values: dict, label: str):
+    st.bar_chart([{label: key, 'count': count} for key, count in values.items()], x=label, y='count')
+
+
+def statistics_dashboard():
+    summary = _stats_store().summary()
+    if summary is None:
+        st.info('No statistics available yet, please import the FDK first.')
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric('FDK Objects', summary['counts']['objects'])
+    col2.metric('FDK Property Sets', summary['counts']['property_sets'])
+    col3.metric('FDK Properties', summary['counts']['properties'])
+    st.subheader('Properties per department')
+    _chart(summary['properties_per_department'], 'department')
+    st.subheader('Objects per department')
+    _chart(summary['objects_per_department'], 'department')
+    st.subheader('Most shared properties')
+    st.dataframe([{'property': fdk_id, 'objects': count} for fdk_id, count in summary['most_shared_properties']])
+    col1, col2 = st.columns(2)
+    col1.subheader('Units')
+    col1.dataframe([{'unit': unit, 'count': count} for unit, count in summary['units'].items()])
+    col2.subheader('Formats')
+    col2.dataframe([{'format': value, 'count': count} for value, count in summary['formats'].items()])
+
+
+def duplicate_properties():
+    st.subheader('Possible duplicate properties')
+    threshold = st.slider('Similarity threshold:', min_value=0.3, max_value=1.0, value=0.6, step=0.05)
+    if st.button('Find duplicates'):
+        from fdk.analysis.dedup import duplicate_report, find_duplicates
+
+        with metrics.timer('analysis.dedup'):
+            clusters = find_duplicates(_read_db().get_properties(), threshold=threshold)
+        if len(clusters) == 0:
+            st.info('No duplicate candidates found.')
+        else:
+            st.dataframe(duplicate_report(clusters))
+
+
+@st.cache_resource
+def _job_runner() -> JobRunner:
+    # one runner per server process, so every session sees the same import jobs
+    return JobRunner()
+
+
+def _import_job(path: Path) -> Callable[[Job], None]:
+    def run(job: Job):
+        metrics.reset()
+        _db().metrics.reset()
+        file_gw = fdk_import_gateway(path)
+        # an interrupted import of the same folder resumes from the journal
+        FdkImporter(_db(), progress=job.progress, cancelled=job.cancelled,
+                    journal=ImportJournal(journal_path)).run(file_gw)
+        job.progress('Export catalog', 0, 1)
+        export_catalog(catalog_path, file_gw)
+        _read_db.clear()
+        _model_graph.clear()
+    return run
+
+
+def import_jobs(count: int = 5) -> bool:
+    running = False
+    for job in _job_runner().jobs()[:count]:
+        status = job.status()
+        st.text(f'{status.key} ({status.state}, {status.elapsed:.0f} s)')
+        if status.state == SUCCEEDED:
+            st.success('Data saved!')
+        elif status.state == FAILED:
+            st.error(status.error)
+        elif not status.is_finished:
+            running = True
+            st.progress(status.percent, text=f'{status.done}/{status.total}: {status.stage}')
+            st.button('Cancel', key=f'cancel-{status.job_id}', on_click=job.cancel)
+        '---'
+    return running
+
+
+def metrics_panel(title: str, registry: MetricsRegistry):
+    snapshot = registry.snapshot()
+    st.subheader(title)
+    timings = [
+        {'name': name, 'calls': hist['count'], 'total [s]': hist['total'], 'mean [ms]': hist['mean'] * 1000,
+         'p95 [ms]': hist['p95'] * 1000, 'max [ms]': hist['max'] * 1000}
+        for name, hist in snapshot['histograms'].items()
+    ]
+    st.dataframe(sorted(timings, key=lambda row: row['total [s]'], reverse=True))
+    st.dataframe([{'name': name, 'value': value} for name, value in snapshot['counters'].items()])
+    for name, memory in snapshot['memory'].items():
+        st.text(f'{name}: allocated {memory["allocated"]} B, peak {memory["peak"]} B')
+    st.download_button('Download metrics', registry.to_json(), file_name='fdk-metrics.json', key=title)
 
 
 # --- HIDE STREAMLIT STYLE ---
@@ -88,11 +286,15 @@ def delete_models(model_name: str, callback: Callable[[], None]):
 # --- NAVIGATION MENU ---
 selected = option_menu(
     menu_title=None,
-    options=['Import', 'Visualization'],
-    icons=['pencil-fill', 'bar-chart-fill'],  # https://icons.getbootstrap.com/
+    options=['Import', 'Visualization', 'Statistics'],
+    icons=['pencil-fill', 'bar-chart-fill', 'clipboard-data'],  # https://icons.getbootstrap.com/
     orientation='horizontal',
 )
 
+show_metrics = st.sidebar.checkbox('Show metrics')
+metrics.trace_memory = st.sidebar.checkbox('Trace memory per stage')
+_db().metrics.count_bytes = st.sidebar.checkbox('Count request bytes')
+
 if selected == 'Import':
     st.header(f'FDK Import')
     col1, col2 = st.columns([1, 2])
@@ -102,87 +304,38 @@ if selected == 'Import':
         path = _select_folder()
         st.text_input('Selected:', path if path.exists() else 'Path does not exists')
         if path.exists():
-            file_gw = fdk_import_gateway(path)
-            '---'
-            delete_models('FDK Property', db.delete_properties)
-            delete_models('FDK Property Set', db.delete_psets)
-            delete_models('FDK Object', db.delete_objects)
-            '---'
-            import_models(file_gw.properties(), 'FDK Property', db.save_properties)
-            import_models(file_gw.psets(), 'FDK Property Set', db.save_psets)
-            import_models(file_gw.objects(), 'FDK Object', db.save_objects)
-            st.success('Data saved!')
+            _job_runner().submit(str(path), _import_job(path))
         clicked = not clicked
+    '---'
+    if import_jobs():
+        # clicking reruns the script, which redraws the progress without blocking the page in a sleep loop
+        st.button('Refresh progress')
 
 
 if selected == 'Visualization':
     st.header('Visualization')
-    with st.form('saved_periods'):
-        prop_name = st.selectbox('Select Property Names:', db.property_names())
-        submitted = st.form_submit_button('Property Overview')
-        if submitted:
-            # Get data from database
-            properties = db.properties_by_name(prop_name)
-            st.write(properties)
-            # st.write(sorted(properties, key=lambda prop: prop.fdk_id))
-            # comment = period_data.get('comment')
-            # expenses = period_data.get('expenses')
-            # incomes = period_data.get('incomes')
-
-            # # Create metrics
-            # total_income = sum(incomes.values())
-            # total_expense = sum(expenses.values())
-            # remaining_budget = total_income - total_expense
-            # col1, col2, col3 = st.columns(3)
-            # col1.metric('Total Income', f'{total_income} {currency}')
-            # col2.metric('Total Expense', f'{total_expense} {currency}')
-            # col3.metric('Remaining Budget', f'{remaining_budget} {currency}')
-            # st.text(f'Comment: {comment}')
-
-            # # Create sankey chart
-            # label = list(incomes.keys()) + ['Total Income'] + list(expenses.keys())
-            # source = list(range(len(incomes))) + [len(incomes)] * len(expenses)
-            # target = [len(incomes)] * len(incomes) + [label.index(expense)
-            #                                           for expense in expenses.keys()]
-            # value = list(incomes.values()) + list(expenses.values())
-
-            # # Data to dict, dict to sankey
-            # link = dict(source=source, target=target, value=value)
-            # node = dict(label=label, pad=20, thickness=30, color='#E694FF')
-            # data = go.Sankey(link=link, node=node)
-
-            # # Plot it!
-            # fig = go.Figure(data)
-            # fig.update_layout(margin=dict(l=0, r=0, t=5, b=5))
-            # st.plotly_chart(fig, use_container_width=True)
-            nodes = []
-            edges = []
-            nodes.append(Node(id="Spiderman",
-                              label="Peter Parker",
-                              size=25,
-                              shape="circularImage",
-                              image="http://marvel-force-chart.surge.sh/marvel_force_chart_img/top_spiderman.png")
-                         )  # includes **kwargs
-            nodes.append(Node(id="Captain_Marvel",
-                              size=25,
-                              shape="circularImage",
-                              image="http://marvel-force-chart.surge.sh/marvel_force_chart_img/top_captainmarvel.png")
-                         )
-            edges.append(Edge(source="Captain_Marvel",
-                              label="friend_of",
-                              target="Spiderman",
-                              # **kwargs
-                              )
-                         )
-
-            config = Config(width=750,
-                            height=950,
-                            directed=True,
-                            physics=True,
-                            hierarchical=False,
-                            # **kwargs
-                            )
-
-            return_value = agraph(nodes=nodes,
-                                  edges=edges,
-                                  config=config)
+    graph_tab, browse_tab = st.tabs(['Property Overview', 'Browse'])
+    with graph_tab:
+        with st.form('saved_periods'):
+            prop_name = st.selectbox('Select Property Names:', _read_db().property_names())
+            depth = st.slider('Graph depth:', min_value=1, max_value=4, value=2)
+            submitted = st.form_submit_button('Property Overview')
+            if submitted:
+                # Get data from database
+                metrics.reset()
+                _read_db().metrics.reset()
+                properties = _read_db().properties_by_name(prop_name)
+                st.dataframe(_property_rows(properties))
+                subgraphs = [_model_graph().extract(prop, max_depth=depth) for prop in properties]
+                show_graph(subgraphs)
+    with browse_tab:
+        browse_hierarchy()
+
+if selected == 'Statistics':
+    st.header('Statistics')
+    statistics_dashboard()
+    duplicate_properties()
+
+if show_metrics:
+    metrics_panel('Metrics of the last import or query', metrics)
+    metrics_panel('Requests of the database gateway', _db().metrics)
@@ -0,0 +1,70 @@
+import argparse
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from .generator import CatalogSpec, generate_catalog
+from .suite import (BenchmarkSuite, compare_reports, create_report,
+                    load_report, save_report)
+
+_REPORT_DIR = Path('.benchmarks')
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='FDK import and gateway benchmarks')
+    defaults = CatalogSpec()
+    parser.add_argument('--objects', type=int, default=defaults.objects)
+    parser.add_argument('--psets', type=int, default=defaults.psets)
+    parser.add_argument('--properties', type=int, default=defaults.properties)
+    parser.add_argument('--psets-per-object', type=int, default=defaults.psets_per_object)
+    parser.add_argument('--properties-per-pset', type=int, default=defaults.properties_per_pset)
+    parser.add_argument('--properties-per-object', type=int, default=defaults.properties_per_object)
+    parser.add_argument('--pset-sharing', type=float, default=defaults.pset_sharing)
+    parser.add_argument('--property-sharing', type=float, default=defaults.property_sharing)
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='simulated round trip latency of the in-process Deta base in seconds')
+    parser.add_argument('--source', type=Path, help='existing FDK folder instead of a generated catalog')
+    parser.add_argument('--output', type=Path, help='path of the JSON report')
+    parser.add_argument('--compare', type=Path, help='baseline report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown before a regression')
+    return parser
+
+
+def _spec(args: argparse.Namespace) -> CatalogSpec:
+    return CatalogSpec(objects=args.objects, psets=args.psets, properties=args.properties,
+                       psets_per_object=args.psets_per_object, properties_per_pset=args.properties_per_pset,
+                       properties_per_object=args.properties_per_object, pset_sharing=args.pset_sharing,
+                       property_sharing=args.property_sharing, seed=args.seed)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parser().parse_args(argv)
+    spec = _spec(args)
+    with tempfile.TemporaryDirectory(prefix='fdk-bench-') as temp_dir:
+        root = args.source or Path(temp_dir)
+        if args.source is None:
+            generate_catalog(root, spec)
+        results = BenchmarkSuite(root, args.repeat).run(args.latency)
+    report = create_report(results, spec, source=str(args.source or 'generated'), latency=args.latency)
+    output = args.output or _REPORT_DIR / f'report-{datetime.now():%Y%m%d-%H%M%S}.json'
+    save_report(report, output)
+    print(f'{"stage":<24}{"items":>8}{"median [ms]":>14}{"items/s":>14}')
+    for name, result in report['results'].items():
+        per_second = result['items_per_second'] or 0
+        print(f'{name:<24}{result["items"]:>8}{result["median"] * 1000:>14.2f}{per_second:>14.0f}')
+    print(f'Report saved to {output}')
+    if args.compare is None:
+        return 0
+    comparisons = compare_reports(load_report(args.compare), report, args.threshold)
+    for comparison in comparisons:
+        flag = 'REGRESSION' if comparison.regression else ''
+        print(f'{comparison.stage:<24}{comparison.ratio:>8.2f}x {flag}')
+    return 1 if any(comparison.regression for comparison in comparisons) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
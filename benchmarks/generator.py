@@ -0,0 +1,106 @@
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List
+
+from fdk.io.file import JsonHandler
+
+_UNITS = ['', 'mm', 'm', 'm2', 'm3', 'kg', 'kN', 'V', 'A', 'W', '°C', '%']
+_FORMATS = ['Text', 'Real', 'Integer', 'Boolean', 'Date', 'Label']
+_WORDS = ['Breite', 'Höhe', 'Länge', 'Material', 'Typ', 'Hersteller', 'Nummer', 'Klasse', 'Gewicht',
+          'Spannung', 'Strom', 'Leistung', 'Status', 'Datum', 'Farbe', 'Norm', 'Achse', 'Gleis']
+
+
+@dataclass(frozen=True)
+class CatalogSpec:
+    objects: int = 200
+    psets: int = 80
+    properties: int = 1500
+    psets_per_object: int = 4
+    properties_per_pset: int = 10
+    properties_per_object: int = 3
+    pset_sharing: float = 0.5
+    property_sharing: float = 0.5
+    departments: int = 5
+    groups_per_department: int = 4
+    description_words: int = 20
+    seed: int = 42
+
+
+def _name(rnd: random.Random, count: int) -> str:
+    return ' '.join(rnd.choice(_WORDS) for _ in range(count))
+
+
+def _pick(rnd: random.Random, ids: List[str], count: int, sharing: float) -> List[str]:
+    # with probability `sharing` a reference is drawn from the hot tenth of the pool
+    hot = ids[:max(1, len(ids) // 10)]
+    picked: Dict[str, None] = {}
+    for _ in range(min(count, len(ids)) * 4):
+        if len(picked) == min(count, len(ids)):
+            break
+        pool = hot if rnd.random() < sharing else ids
+        picked[rnd.choice(pool)] = None
+    return list(picked)
+
+
+class CatalogGenerator:
+
+    def __init__(self, spec: CatalogSpec) -> None:
+        self.spec = spec
+        self.rnd = random.Random(spec.seed)
+        self.properties = {f'PTY_{index}': self._property(index) for index in range(1, spec.properties + 1)}
+        property_ids = list(self.properties)
+        self.psets = {
+            f'PSET_{index}': (f'{_name(self.rnd, 2)} {index}',
+                              _pick(self.rnd, property_ids, spec.properties_per_pset, spec.property_sharing))
+            for index in range(1, spec.psets + 1)
+        }
+
+    def _property(self, index: int) -> Dict[str, Any]:
+        return {
+            'ID_PTY': f'PTY_{index}',
+            'name_PTY': f'{_name(self.rnd, 2)} [{self.rnd.choice(_UNITS) or "-"}]',
+            'format': self.rnd.choice(_FORMATS),
+            'unit': self.rnd.choice(_UNITS),
+            'description': _name(self.rnd, self.rnd.randint(0, self.spec.description_words)),
+            'example': str(self.rnd.randint(0, 1000))
+        }
+
+    def _pset(self, pset_id: str) -> Dict[str, Any]:
+        name, property_ids = self.psets[pset_id]
+        return {
+            'ID_PSET': pset_id,
+            'name_PSET': name,
+            'pty_ids': [self.properties[prop_id] for prop_id in property_ids]
+        }
+
+    def object_content(self, index: int) -> Dict[str, Any]:
+        spec = self.spec
+        department = index % spec.departments
+        group = (index // spec.departments) % spec.groups_per_department
+        pset_ids = _pick(self.rnd, list(self.psets), spec.psets_per_object, spec.pset_sharing)
+        property_ids = _pick(self.rnd, list(self.properties), spec.properties_per_object, spec.property_sharing)
+        return {
+            'ID_OBJ': f'OBJ_{index}',
+            'name_DE': f'{_name(self.rnd, 2)} {index}',
+            'name_SYS': f'Fachbereich {department}',
+            'name_OGRP': f'Gruppe {department}.{group}',
+            'description': _name(self.rnd, self.rnd.randint(0, spec.description_words)),
+            'psets': [self._pset(pset_id) for pset_id in pset_ids],
+            'properties': [self.properties[prop_id] for prop_id in property_ids]
+        }
+
+    def write(self, root: Path, handler: JsonHandler = JsonHandler()) -> List[Path]:
+        paths = []
+        for index in range(1, self.spec.objects + 1):
+            content = self.object_content(index)
+            folder = root / content['name_SYS'] / content['name_OGRP']
+            folder.mkdir(parents=True, exist_ok=True)
+            path = folder / f'{content["ID_OBJ"]}.json'
+            handler.write(path, content)
+            paths.append(path)
+        return paths
+
+
+def generate_catalog(root: Path, spec: CatalogSpec = CatalogSpec()) -> List[Path]:
+    return CatalogGenerator(spec).write(root)
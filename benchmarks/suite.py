@@ -0,0 +1,177 @@
+import json
+import platform
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from fdk.metrics import metrics
+from fdk.models.models import AFdkModel
+from fdk.storage.builder.json import AJsonBuilder
+from fdk.storage.db.deta import _as_db
+from fdk.storage.db.memory import MemoryDeta
+from fdk.storage.gateway import IFdkGateway, fdk_gateway
+from fdk.storage.json.gateway import JsonFdkGateway, fdk_import_gateway
+
+from .generator import CatalogSpec
+
+_GROUP_SIZE = 25
+_QUERY_SAMPLES = 50
+_JSON_STAGES = {'discovery': 'json.discover', 'parsing': 'json.parse', 'building': 'json.build',
+                'back_links': 'json.back_links'}
+
+
+@dataclass
+class StageResult:
+    name: str
+    items: int
+    timings: List[float] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        median = statistics.median(self.timings)
+        return {
+            'items': self.items,
+            'repeat': len(self.timings),
+            'min': min(self.timings),
+            'median': median,
+            'mean': statistics.fmean(self.timings),
+            'max': max(self.timings),
+            'stdev': statistics.stdev(self.timings) if len(self.timings) > 1 else 0.0,
+            'items_per_second': self.items / median if median > 0 else None,
+        }
+
+
+@dataclass
+class Comparison:
+    stage: str
+    baseline: float
+    current: float
+    ratio: float
+    regression: bool
+
+
+def _measure(name: str, items: int, repeat: int, run: Callable[[], Any],
+             setup: Optional[Callable[[], None]] = None) -> StageResult:
+    result = StageResult(name, items)
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        result.timings.append(time.perf_counter() - start)
+    return result
+
+
+def _groups(models: List[Any], group_size: int = _GROUP_SIZE) -> Iterable[List[Any]]:
+    for start in range(0, len(models), group_size):
+        yield models[start:start + group_size]
+
+
+def _sample(values: List[Any], count: int = _QUERY_SAMPLES) -> List[Any]:
+    step = max(1, len(values) // count)
+    return values[::step][:count]
+
+
+class BenchmarkSuite:
+
+    def __init__(self, root: Path, repeat: int = 5) -> None:
+        self.root = root
+        self.repeat = repeat
+        self.file_gw: JsonFdkGateway = fdk_import_gateway(root)
+        self.results: Dict[str, StageResult] = {}
+
+    def _add(self, result: StageResult) -> None:
+        self.results[result.name] = result
+
+    def _load(self, stages: Dict[str, StageResult]) -> None:
+        AJsonBuilder.clear_cache()
+        metrics.reset()
+        fdk_import_gateway(self.root).objects()
+        # the gateway times its own stages, a fresh one per repeat reads every file again
+        for name, stage in _JSON_STAGES.items():
+            histogram = metrics.histogram(stage)
+            stages[name].timings.append(0.0 if histogram is None else histogram.total)
+
+    def run_import(self) -> None:
+        files = self.file_gw.files()
+        objects = self.file_gw.objects()
+        stages = {name: StageResult(name, len(objects) if name == 'back_links' else len(files))
+                  for name in _JSON_STAGES}
+        self._add(_measure('loading', len(files), self.repeat, lambda: self._load(stages)))
+        for stage in stages.values():
+            self._add(stage)
+        models: List[AFdkModel] = [*self.file_gw.properties(), *self.file_gw.psets(), *objects]
+        self._add(_measure('serialization', len(models), self.repeat, lambda: [_as_db(model) for model in models]))
+
+    def _save(self, db: IFdkGateway) -> None:
+        for group in _groups(self.file_gw.properties()):
+            db.save_properties(group)
+        for group in _groups(self.file_gw.psets()):
+            db.save_psets(group)
+        for group in _groups(self.file_gw.objects()):
+            db.save_objects(group)
+
+    def run_gateway(self, latency: float = 0.0) -> None:
+        databases: List[IFdkGateway] = [fdk_gateway(MemoryDeta(latency).Base)]
+
+        def _setup() -> None:
+            databases[0] = fdk_gateway(MemoryDeta(latency).Base)
+
+        properties = self.file_gw.properties()
+        psets = self.file_gw.psets()
+        items = len(properties) + len(psets) + len(self.file_gw.objects())
+        self._add(_measure('gateway_write', items, self.repeat, lambda: self._save(databases[0]), _setup))
+        db = databases[0]
+        names = _sample(sorted(db.property_names()))
+        property_ids = [prop.fdk_id for prop in _sample(properties)]
+        pset_ids = [pset.fdk_id for pset in _sample(psets)]
+        self._add(_measure('gateway_names', 1, self.repeat, db.property_names))
+        self._add(_measure('gateway_by_name', len(names), self.repeat,
+                           lambda: [db.properties_by_name(name) for name in names]))
+        self._add(_measure('gateway_property_by_id', len(property_ids), self.repeat,
+                           lambda: db.properties.by_ids(property_ids)))
+        self._add(_measure('gateway_pset_by_id', len(pset_ids), self.repeat,
+                           lambda: db.property_sets.by_ids(pset_ids)))
+        self._add(_measure('gateway_all_properties', len(properties), self.repeat, db.get_properties))
+
+    def run(self, latency: float = 0.0) -> Dict[str, StageResult]:
+        self.run_import()
+        self.run_gateway(latency)
+        return self.results
+
+
+def create_report(results: Dict[str, StageResult], spec: CatalogSpec, **meta: Any) -> Dict[str, Any]:
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'spec': asdict(spec),
+            **meta
+        },
+        'results': {name: result.as_dict() for name, result in results.items()}
+    }
+
+
+def save_report(report: Dict[str, Any], path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=4), encoding='utf-8')
+    return path
+
+
+def load_report(path: Path) -> Dict[str, Any]:
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1,
+                    metric: str = 'median') -> List[Comparison]:
+    comparisons = []
+    for stage, result in current['results'].items():
+        base_result = baseline['results'].get(stage)
+        if base_result is None or base_result[metric] <= 0:
+            continue
+        ratio = result[metric] / base_result[metric]
+        comparisons.append(Comparison(stage, base_result[metric], result[metric], ratio, ratio > 1 + threshold))
+    return comparisons
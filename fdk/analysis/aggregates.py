@@ -0,0 +1,251 @@
+import heapq
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type
+
+import numpy as np
+
+from fdk.models.models import AFdkModel, FdkObject, Property, PropertySet
+from fdk.storage.columnar.catalog import ColumnarCatalog
+from fdk.storage.sections import OBJECTS, PROPERTIES, PSETS, SECTIONS
+
+
+def _array(catalog: ColumnarCatalog, name: str) -> np.ndarray:
+    return np.frombuffer(catalog.section(name), dtype=np.uint32)
+
+
+def _strings(catalog: ColumnarCatalog) -> List[str]:
+    offsets = np.frombuffer(catalog.section('strings.offsets'), dtype=np.uint32).tolist()
+    data = bytes(catalog.section('strings.data'))
+    return [data[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def _decoded(strings: List[str], indices: np.ndarray) -> List[str]:
+    return [strings[index] for index in indices.tolist()]
+
+
+def _counted(strings: List[str], indices: np.ndarray) -> Counter:
+    values, counts = np.unique(indices, return_counts=True)
+    return Counter(dict(zip(_decoded(strings, values), counts.tolist())))
+
+
+def _decrement(counter: Counter, key: Any, value: int = 1) -> None:
+    counter[key] -= value
+    if counter[key] <= 0:
+        del counter[key]
+
+
+class CatalogStats:
+
+    @classmethod
+    def from_models(cls, objects: Iterable[FdkObject] = (), property_sets: Iterable[PropertySet] = (),
+                    properties: Iterable[Property] = ()) -> 'CatalogStats':
+        stats = cls()
+        stats.upsert(properties)
+        stats.upsert(property_sets)
+        stats.upsert(objects)
+        return stats
+
+    @classmethod
+    def from_catalog(cls, catalog: ColumnarCatalog) -> 'CatalogStats':
+        # the counts are taken from the column and link arrays in bulk, only the state keyed by id is built per row
+        strings = _strings(catalog)
+        object_ids, property_ids = _array(catalog, 'objects.fdk_id'), _array(catalog, 'properties.fdk_id')
+        departments, groups = _array(catalog, 'objects.department'), _array(catalog, 'objects.group')
+        units, formats = _array(catalog, 'properties.unit'), _array(catalog, 'properties.format')
+        offsets = _array(catalog, 'properties.object_ids.offsets').astype(np.int64)
+        links = _array(catalog, 'properties.object_ids.values')
+        link_properties = np.repeat(np.arange(len(property_ids), dtype=np.int64), np.diff(offsets))
+        object_rows = np.full(len(strings), -1, dtype=np.int64)
+        object_rows[object_ids] = np.arange(len(object_ids))
+        link_objects = object_rows[links]
+        known = link_objects >= 0
+
+        stats = cls()
+        stats._objects = dict(zip(_decoded(strings, object_ids),
+                                  zip(_decoded(strings, departments), _decoded(strings, groups))))
+        linked_ids = _decoded(strings, links)
+        stats._properties = {
+            fdk_id: (unit, value_format, tuple(linked_ids[start:end]))
+            for fdk_id, unit, value_format, start, end in zip(
+                _decoded(strings, property_ids), _decoded(strings, units), _decoded(strings, formats),
+                offsets[:-1].tolist(), offsets[1:].tolist())
+        }
+        property_names = _decoded(strings, property_ids)
+        order = np.argsort(links, kind='stable')
+        linked, starts = np.unique(links[order], return_index=True)
+        for object_index, rows in zip(linked.tolist(), np.split(link_properties[order], starts[1:])):
+            stats._object_properties[strings[object_index]] = set(property_names[row] for row in rows.tolist())
+        for values, counters in ((departments, stats._department_properties), (groups, stats._group_properties)):
+            keys = values[link_objects[known]].astype(np.int64) * len(property_ids) + link_properties[known]
+            pairs, counts = np.unique(keys, return_counts=True)
+            for key, row, count in zip((pairs // len(property_ids)).tolist(), (pairs % len(property_ids)).tolist(),
+                                       counts.tolist()):
+                counters.setdefault(strings[key], Counter())[property_names[row]] = count
+        stats.objects_per_department = _counted(strings, departments)
+        stats.objects_per_group = _counted(strings, groups)
+        stats.units = _counted(strings, units)
+        stats.formats = _counted(strings, formats)
+        pset_usage = np.diff(_array(catalog, f'{PSETS}.object_ids.offsets').astype(np.int64))
+        stats._psets = dict(zip(_decoded(strings, _array(catalog, f'{PSETS}.fdk_id')), pset_usage.tolist()))
+        return stats
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Dict[str, Any]]) -> 'CatalogStats':
+        stats = cls()
+        for fdk_id, (unit, value_format, object_ids) in state.get(PROPERTIES, {}).items():
+            stats._add_property(fdk_id, unit, value_format, tuple(object_ids))
+        for fdk_id, (department, group) in state.get(OBJECTS, {}).items():
+            stats._add_object(fdk_id, department, group)
+        for fdk_id, usage in state.get(PSETS, {}).items():
+            stats._psets[fdk_id] = usage
+        stats.mark_clean()
+        return stats
+
+    def __init__(self) -> None:
+        self._properties: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {}
+        self._objects: Dict[str, Tuple[str, str]] = {}
+        self._psets: Dict[str, int] = {}
+        self._object_properties: Dict[str, Set[str]] = {}
+        self._department_properties: Dict[str, Counter] = {}
+        self._group_properties: Dict[str, Counter] = {}
+        self.objects_per_department: Counter = Counter()
+        self.objects_per_group: Counter = Counter()
+        self.units: Counter = Counter()
+        self.formats: Counter = Counter()
+        self.dirty: Dict[str, Set[str]] = {PROPERTIES: set(), OBJECTS: set(), PSETS: set()}
+
+    def _link(self, object_id: str, property_id: str, value: int) -> None:
+        if object_id not in self._objects:
+            return
+        department, group = self._objects[object_id]
+        for key, counters in ((department, self._department_properties), (group, self._group_properties)):
+            counter = counters.setdefault(key, Counter())
+            if value > 0:
+                counter[property_id] += value
+            else:
+                _decrement(counter, property_id, -value)
+
+    def _add_property(self, fdk_id: str, unit: str, value_format: str, object_ids: Tuple[str, ...]) -> None:
+        self._properties[fdk_id] = (unit, value_format, object_ids)
+        self.units[unit] += 1
+        self.formats[value_format] += 1
+        for object_id in object_ids:
+            self._object_properties.setdefault(object_id, set()).add(fdk_id)
+            self._link(object_id, fdk_id, 1)
+        self.dirty[PROPERTIES].add(fdk_id)
+
+    def _remove_property(self, fdk_id: str) -> None:
+        if fdk_id not in self._properties:
+            return
+        unit, value_format, object_ids = self._properties.pop(fdk_id)
+        _decrement(self.units, unit)
+        _decrement(self.formats, value_format)
+        for object_id in object_ids:
+            self._object_properties.get(object_id, set()).discard(fdk_id)
+            self._link(object_id, fdk_id, -1)
+        self.dirty[PROPERTIES].add(fdk_id)
+
+    def _add_object(self, fdk_id: str, department: str, group: str) -> None:
+        self._objects[fdk_id] = (department, group)
+        self.objects_per_department[department] += 1
+        self.objects_per_group[group] += 1
+        for property_id in self._object_properties.get(fdk_id, ()):
+            self._link(fdk_id, property_id, 1)
+        self.dirty[OBJECTS].add(fdk_id)
+
+    def _remove_object(self, fdk_id: str) -> None:
+        if fdk_id not in self._objects:
+            return
+        for property_id in self._object_properties.get(fdk_id, ()):
+            self._link(fdk_id, property_id, -1)
+        department, group = self._objects.pop(fdk_id)
+        _decrement(self.objects_per_department, department)
+        _decrement(self.objects_per_group, group)
+        self.dirty[OBJECTS].add(fdk_id)
+
+    def mark_clean(self) -> None:
+        for fdk_ids in self.dirty.values():
+            fdk_ids.clear()
+
+    def upsert_property(self, model: Property) -> None:
+        self._remove_property(model.fdk_id)
+        self._add_property(model.fdk_id, model.unit, model.format, tuple(model.object_ids))
+
+    def upsert_object(self, model: FdkObject) -> None:
+        self._remove_object(model.fdk_id)
+        self._add_object(model.fdk_id, model.department, model.group)
+
+    def upsert_pset(self, model: PropertySet) -> None:
+        self._psets[model.fdk_id] = len(model.object_ids)
+        self.dirty[PSETS].add(model.fdk_id)
+
+    def upsert(self, models: Iterable[AFdkModel]) -> None:
+        for model in models:
+            if isinstance(model, Property):
+                self.upsert_property(model)
+            elif isinstance(model, PropertySet):
+                self.upsert_pset(model)
+            elif isinstance(model, FdkObject):
+                self.upsert_object(model)
+
+    def remove(self, model_type: Type[AFdkModel], fdk_ids: Iterable[str]) -> None:
+        for fdk_id in fdk_ids:
+            if model_type is Property:
+                self._remove_property(fdk_id)
+            elif model_type is FdkObject:
+                self._remove_object(fdk_id)
+            elif fdk_id in self._psets:
+                del self._psets[fdk_id]
+                self.dirty[PSETS].add(fdk_id)
+
+    def clear(self, model_type: Type[AFdkModel]) -> None:
+        self.remove(model_type, list(self.ids(model_type)))
+
+    def ids(self, model_type: Type[AFdkModel]) -> Iterable[str]:
+        section = SECTIONS[model_type]
+        if section == PROPERTIES:
+            return self._properties.keys()
+        if section == OBJECTS:
+            return self._objects.keys()
+        return self._psets.keys()
+
+    def state_of(self, section: str, fdk_id: str) -> Optional[Any]:
+        if section == PROPERTIES:
+            value = self._properties.get(fdk_id)
+            return None if value is None else [value[0], value[1], list(value[2])]
+        if section == OBJECTS:
+            value = self._objects.get(fdk_id)
+            return None if value is None else list(value)
+        return self._psets.get(fdk_id)
+
+    def as_state(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            section: {fdk_id: self.state_of(section, fdk_id) for fdk_id in self.ids(model_type)}
+            for model_type, section in SECTIONS.items()
+        }
+
+    def properties_per_department(self) -> Dict[str, int]:
+        return {key: len(counter) for key, counter in sorted(self._department_properties.items()) if len(counter) > 0}
+
+    def properties_per_group(self) -> Dict[str, int]:
+        return {key: len(counter) for key, counter in sorted(self._group_properties.items()) if len(counter) > 0}
+
+    def most_shared_properties(self, count: int = 10) -> List[Tuple[str, int]]:
+        usage = ((fdk_id, len(state[2])) for fdk_id, state in self._properties.items())
+        return heapq.nlargest(count, usage, key=lambda item: (item[1], item[0]))
+
+    def most_shared_psets(self, count: int = 10) -> List[Tuple[str, int]]:
+        return heapq.nlargest(count, self._psets.items(), key=lambda item: (item[1], item[0]))
+
+    def summary(self, top: int = 10) -> Dict[str, Any]:
+        return {
+            'counts': {OBJECTS: len(self._objects), PSETS: len(self._psets), PROPERTIES: len(self._properties)},
+            'objects_per_department': dict(self.objects_per_department.most_common()),
+            'objects_per_group': dict(self.objects_per_group.most_common()),
+            'properties_per_department': self.properties_per_department(),
+            'properties_per_group': self.properties_per_group(),
+            'most_shared_properties': self.most_shared_properties(top),
+            'most_shared_psets': self.most_shared_psets(top),
+            'units': dict(self.units.most_common()),
+            'formats': dict(self.formats.most_common()),
+        }
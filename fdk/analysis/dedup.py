@@ -0,0 +1,174 @@
+import re
+import zlib
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Dict, FrozenSet, Iterable, List, Sequence, Set, Tuple
+
+import numpy as np
+
+from fdk.models.models import Property
+
+_PRIME = np.uint64(4294967311)
+_WORDS = re.compile(r'[^\w]+')
+_SUFFIX = re.compile(r'[\[\(\{][^\]\)\}]*[\]\)\}]')
+_SHINGLE = 3
+
+
+@dataclass(frozen=True)
+class DuplicateCluster:
+    property_ids: Tuple[str, ...]
+    names: Tuple[str, ...]
+    score: float
+    object_ids: Tuple[str, ...]
+    pset_ids: Tuple[str, ...]
+
+    @property
+    def size(self) -> int:
+        return len(self.property_ids)
+
+
+def normalize(value: str) -> str:
+    return ' '.join(word for word in _WORDS.split(_SUFFIX.sub(' ', value).lower()) if word != '')
+
+
+def blocking_key(model: Property) -> str:
+    # word order, bracketed suffixes and punctuation do not separate otherwise equal names
+    return ' '.join(sorted(set(normalize(model.name_clean or model.name).replace('_', ' ').split())))
+
+
+def features(model: Property) -> FrozenSet[str]:
+    name = normalize(model.name_clean or model.name)
+    padded = f' {name} '
+    tokens = {f'n:{padded[start:start + _SHINGLE]}' for start in range(max(1, len(padded) - _SHINGLE + 1))}
+    tokens.update(f'd:{word}' for word in normalize(model.description or '').split())
+    tokens.add(f'u:{normalize(model.unit or "")}')
+    tokens.add(f'f:{normalize(model.format or "")}')
+    return frozenset(tokens)
+
+
+def jaccard(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    union = len(first | second)
+    return len(first & second) / union if union > 0 else 0.0
+
+
+class MinHasher:
+
+    def __init__(self, num_perm: int = 64, seed: int = 1) -> None:
+        random = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = random.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = random.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, tokens: Iterable[str]) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(token.encode('utf-8')) for token in tokens), dtype=np.uint64)
+        if len(hashes) == 0:
+            return np.full(self.num_perm, int(_PRIME), dtype=np.uint64)
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+
+class _UnionFind:
+
+    def __init__(self) -> None:
+        self._parents: Dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        parent = self._parents.setdefault(item, item)
+        if parent != item:
+            parent = self._parents[item] = self.find(parent)
+        return parent
+
+    def union(self, first: int, second: int) -> None:
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self._parents[max(first, second)] = min(first, second)
+
+    def groups(self) -> List[List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for item in self._parents:
+            groups.setdefault(self.find(item), []).append(item)
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def _bucket_pairs(bucket: List[int], signatures: np.ndarray, max_block: int) -> Iterable[Tuple[int, int]]:
+    if len(bucket) <= max_block:
+        return combinations(bucket, 2)
+    # all pairs of an oversized bucket would be quadratic again, so only neighbours in signature order are compared
+    ordered = sorted(bucket, key=lambda index: signatures[index].tobytes())
+    return ((min(first, second), max(first, second)) for position, first in enumerate(ordered)
+            for second in ordered[position + 1:position + max_block])
+
+
+def _lsh_candidates(signatures: np.ndarray, bands: int, max_block: int) -> Set[Tuple[int, int]]:
+    rows = signatures.shape[1] // bands
+    candidates: Set[Tuple[int, int]] = set()
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        band_values = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for index in range(len(band_values)):
+            buckets.setdefault(band_values[index].tobytes(), []).append(index)
+        for bucket in buckets.values():
+            candidates.update(_bucket_pairs(bucket, signatures, max_block))
+    return candidates
+
+
+def _block_candidates(keys: Sequence[str], signatures: np.ndarray, max_block: int) -> Set[Tuple[int, int]]:
+    blocks: Dict[str, List[int]] = {}
+    for index, key in enumerate(keys):
+        if key != '':
+            blocks.setdefault(key, []).append(index)
+    candidates: Set[Tuple[int, int]] = set()
+    for block in blocks.values():
+        candidates.update(_bucket_pairs(block, signatures, max_block))
+    return candidates
+
+
+def find_duplicates(properties: Sequence[Property], threshold: float = 0.6, num_perm: int = 64, bands: int = 16,
+                    seed: int = 1, max_block: int = 50) -> List[DuplicateCluster]:
+    if num_perm % bands != 0:
+        raise ValueError(f'num_perm {num_perm} must be a multiple of bands {bands}')
+    if len(properties) < 2:
+        return []
+    token_sets = [features(model) for model in properties]
+    hasher = MinHasher(num_perm, seed)
+    signatures = np.vstack([hasher.signature(tokens) for tokens in token_sets])
+    candidates = _lsh_candidates(signatures, bands, max_block) | _block_candidates(
+        [blocking_key(model) for model in properties], signatures, max_block)
+    union_find = _UnionFind()
+    scores: Dict[Tuple[int, int], float] = {}
+    for first, second in candidates:
+        score = jaccard(token_sets[first], token_sets[second])
+        if score >= threshold:
+            scores[(first, second)] = score
+            union_find.union(first, second)
+    group_scores: Dict[int, List[float]] = {}
+    for (first, _), score in scores.items():
+        group_scores.setdefault(union_find.find(first), []).append(score)
+    clusters = []
+    for group in union_find.groups():
+        pair_scores = group_scores[union_find.find(group[0])]
+        models = [properties[index] for index in group]
+        clusters.append(DuplicateCluster(
+            property_ids=tuple(model.fdk_id for model in models),
+            names=tuple(sorted(set(model.name for model in models))),
+            score=sum(pair_scores) / len(pair_scores),
+            object_ids=tuple(sorted(set(fdk_id for model in models for fdk_id in model.object_ids))),
+            pset_ids=tuple(sorted(set(fdk_id for model in models for fdk_id in model.pset_ids))),
+        ))
+    return sorted(clusters, key=lambda cluster: (-len(cluster.object_ids), -cluster.size, -cluster.score,
+                                                 cluster.property_ids))
+
+
+def duplicate_report(clusters: Iterable[DuplicateCluster]) -> List[Dict[str, object]]:
+    return [
+        {
+            'rank': rank,
+            'properties': ', '.join(cluster.property_ids),
+            'names': ' | '.join(cluster.names),
+            'score': round(cluster.score, 3),
+            'objects': len(cluster.object_ids),
+            'property_sets': len(cluster.pset_ids),
+            'object_ids': ', '.join(cluster.object_ids),
+            'pset_ids': ', '.join(cluster.pset_ids),
+        }
+        for rank, cluster in enumerate(clusters, start=1)
+    ]
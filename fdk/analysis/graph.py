@@ -0,0 +1,175 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from fdk.models.lazy import is_loaded, reference_ids
+from fdk.models.models import AFdkModel, FdkObject, Property, PropertySet
+
+OBJECT = 'object'
+PSET = 'pset'
+PROPERTY = 'property'
+AGGREGATE = 'aggregate'
+
+_KIND_ORDER = {OBJECT: 0, PSET: 1, PROPERTY: 2}
+
+
+@dataclass(frozen=True)
+class GraphNode:
+    node_id: str
+    label: str
+    kind: str
+    depth: int = field(default=0, compare=False)
+    count: int = field(default=1, compare=False)
+
+
+@dataclass(frozen=True)
+class GraphEdge:
+    source: str
+    target: str
+
+
+@dataclass
+class SubGraph:
+    root_id: str
+    nodes: List[GraphNode] = field(default_factory=list)
+    edges: List[GraphEdge] = field(default_factory=list)
+    truncated: bool = False
+
+
+def _edge(source: str, target: str) -> Tuple[str, str]:
+    return (source, target) if source <= target else (target, source)
+
+
+class ModelGraph:
+
+    @classmethod
+    def from_models(cls, objects: Iterable[FdkObject] = (), property_sets: Iterable[PropertySet] = (),
+                    properties: Iterable[Property] = ()) -> 'ModelGraph':
+        graph = cls()
+        for model in objects:
+            graph.add_object(model)
+        for pset in property_sets:
+            graph.add_pset(pset)
+        for prop in properties:
+            graph.add_property(prop)
+        graph.freeze()
+        return graph
+
+    def __init__(self) -> None:
+        self._labels: Dict[str, str] = {}
+        self._kinds: Dict[str, str] = {}
+        self._links: Dict[str, Set[str]] = {}
+        self._adjacency: Dict[str, Tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    def __contains__(self, node_id: object) -> bool:
+        return node_id in self._kinds
+
+    def _add_node(self, node_id: str, kind: str, label: Optional[str] = None) -> None:
+        if label is not None or node_id not in self._labels:
+            self._labels[node_id] = label or node_id
+        self._kinds.setdefault(node_id, kind)
+        self._links.setdefault(node_id, set())
+
+    def _link(self, source: str, source_kind: str, target: str, target_kind: str) -> None:
+        self._add_node(source, source_kind)
+        self._add_node(target, target_kind)
+        self._links[source].add(target)
+        self._links[target].add(source)
+
+    def _add_references(self, source: str, source_kind: str, models: Sequence[AFdkModel], kind: str) -> None:
+        if is_loaded(models):
+            for model in models:
+                self._add_node(model.fdk_id, kind, model.name)
+        for fdk_id in reference_ids(models):
+            self._link(source, source_kind, fdk_id, kind)
+
+    def add_object(self, model: FdkObject) -> None:
+        self._add_node(model.fdk_id, OBJECT, model.name)
+        self._add_references(model.fdk_id, OBJECT, model.property_sets, PSET)
+        self._add_references(model.fdk_id, OBJECT, model.properties, PROPERTY)
+
+    def add_pset(self, model: PropertySet) -> None:
+        self._add_node(model.fdk_id, PSET, model.name)
+        self._add_references(model.fdk_id, PSET, model.properties, PROPERTY)
+        for object_id in model.object_ids:
+            self._link(object_id, OBJECT, model.fdk_id, PSET)
+
+    def add_property(self, model: Property) -> None:
+        self._add_node(model.fdk_id, PROPERTY, model.name)
+        for pset_id in model.pset_ids:
+            self._link(pset_id, PSET, model.fdk_id, PROPERTY)
+        if len(model.pset_ids) > 0:
+            # object_ids also lists the objects reached through a property set
+            return
+        for object_id in model.object_ids:
+            self._link(object_id, OBJECT, model.fdk_id, PROPERTY)
+
+    def _sort_key(self, node_id: str) -> Tuple[int, str]:
+        return _KIND_ORDER.get(self._kinds[node_id], len(_KIND_ORDER)), node_id
+
+    def freeze(self) -> None:
+        self._adjacency = {
+            node_id: tuple(sorted(links, key=self._sort_key))
+            for node_id, links in self._links.items()
+        }
+
+    def neighbours(self, node_id: str) -> Tuple[str, ...]:
+        if len(self._adjacency) != len(self._links):
+            self.freeze()
+        return self._adjacency.get(node_id, ())
+
+    def degree(self, node_id: str) -> int:
+        return len(self.neighbours(node_id))
+
+    def node(self, node_id: str, depth: int = 0) -> GraphNode:
+        return GraphNode(node_id, self._labels[node_id], self._kinds[node_id], depth)
+
+    def extract(self, root: Union[str, AFdkModel], max_depth: int = 2, max_nodes: int = 150,
+                max_edges: int = 300, hub_limit: int = 25) -> SubGraph:
+        root_id = root.fdk_id if isinstance(root, AFdkModel) else root
+        subgraph = SubGraph(root_id)
+        if root_id not in self._kinds:
+            return subgraph
+        depths = {root_id: 0}
+        subgraph.nodes.append(self.node(root_id))
+        edges: Set[Tuple[str, str]] = set()
+        queue = deque([root_id])
+        while len(queue) > 0:
+            node_id = queue.popleft()
+            depth = depths[node_id]
+            if depth >= max_depth:
+                continue
+            hidden = 0
+            shown = 0
+            for neighbour in self.neighbours(node_id):
+                edge = _edge(node_id, neighbour)
+                if edge in edges:
+                    continue
+                is_new = neighbour not in depths
+                # one node and one edge stay free for the aggregate of the hidden neighbours,
+                # and only newly reached neighbours count toward the hub limit
+                if len(subgraph.edges) + 1 >= max_edges or \
+                        (is_new and (shown >= hub_limit or len(subgraph.nodes) + 1 >= max_nodes)):
+                    if is_new:
+                        hidden += 1
+                    subgraph.truncated = True
+                    continue
+                if is_new:
+                    shown += 1
+                    depths[neighbour] = depth + 1
+                    subgraph.nodes.append(self.node(neighbour, depth + 1))
+                    queue.append(neighbour)
+                edges.add(edge)
+                subgraph.edges.append(GraphEdge(node_id, neighbour))
+            if hidden > 0 and len(subgraph.nodes) < max_nodes and len(subgraph.edges) < max_edges:
+                self._aggregate(subgraph, node_id, depth + 1, hidden)
+        return subgraph
+
+    def _aggregate(self, subgraph: SubGraph, node_id: str, depth: int, hidden: int) -> None:
+        aggregate_id = f'{node_id}#more'
+        label = f'+{hidden} more'
+        subgraph.nodes.append(GraphNode(aggregate_id, label, AGGREGATE, depth, hidden))
+        subgraph.edges.append(GraphEdge(node_id, aggregate_id))
@@ -0,0 +1,159 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from fdk.models.lazy import reference_ids
+from fdk.models.models import FdkObject, PropertySet
+from fdk.storage.columnar.catalog import ColumnarCatalog
+from fdk.storage.sections import PSETS
+
+JACCARD = 'jaccard'
+COSINE = 'cosine'
+
+_MAX_BLOCK_CELLS = 8_000_000
+
+
+@dataclass(frozen=True)
+class SimilarPair:
+    source: str
+    target: str
+    score: float
+    shared: int
+
+
+@dataclass(frozen=True)
+class IncidenceMatrix:
+    row_ids: Sequence[str]
+    column_ids: Sequence[str]
+    indptr: np.ndarray
+    indices: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows: Mapping[str, Iterable[str]]) -> 'IncidenceMatrix':
+        columns: Dict[str, int] = {}
+        indptr = [0]
+        indices: List[int] = []
+        for column_ids in rows.values():
+            row_columns = {columns.setdefault(column_id, len(columns)) for column_id in column_ids}
+            indices.extend(sorted(row_columns))
+            indptr.append(len(indices))
+        return cls(list(rows), list(columns), np.asarray(indptr, dtype=np.int64),
+                   np.asarray(indices, dtype=np.int32))
+
+    @classmethod
+    def from_objects(cls, objects: Iterable[FdkObject],
+                     property_sets: Optional[Iterable[PropertySet]] = None) -> 'IncidenceMatrix':
+        pset_properties = None
+        if property_sets is not None:
+            pset_properties = {pset.fdk_id: reference_ids(pset.properties) for pset in property_sets}
+        rows = {}
+        for model in objects:
+            property_ids = reference_ids(model.properties)
+            if pset_properties is None:
+                for pset in model.property_sets:
+                    property_ids.extend(reference_ids(pset.properties))
+            else:
+                for pset_id in reference_ids(model.property_sets):
+                    property_ids.extend(pset_properties.get(pset_id, []))
+            rows[model.fdk_id] = property_ids
+        return cls.from_rows(rows)
+
+    @classmethod
+    def from_psets(cls, property_sets: Iterable[PropertySet]) -> 'IncidenceMatrix':
+        return cls.from_rows({pset.fdk_id: reference_ids(pset.properties) for pset in property_sets})
+
+    @classmethod
+    def from_catalog_psets(cls, catalog: ColumnarCatalog) -> 'IncidenceMatrix':
+        # the CSR link arrays of the catalog already are the incidence matrix
+        psets, properties = catalog.property_sets, catalog.properties
+        return cls([psets.fdk_id(row) for row in range(len(psets))],
+                   [properties.fdk_id(row) for row in range(len(properties))],
+                   np.frombuffer(catalog.section(f'{PSETS}.properties.offsets'), dtype=np.uint32).astype(np.int64),
+                   np.frombuffer(catalog.section(f'{PSETS}.properties.values'), dtype=np.uint32).astype(np.int32))
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.row_ids), len(self.column_ids)
+
+    def row_sizes(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def transposed(self) -> 'IncidenceMatrix':
+        order = np.argsort(self.indices, kind='stable')
+        rows = np.repeat(np.arange(len(self.row_ids), dtype=np.int32), self.row_sizes())
+        counts = np.bincount(self.indices, minlength=len(self.column_ids))
+        indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        return IncidenceMatrix(self.column_ids, self.row_ids, indptr, rows[order])
+
+
+def _gather(indptr: np.ndarray, indices: np.ndarray, selected: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    lengths = indptr[selected + 1] - indptr[selected]
+    starts = np.repeat(indptr[selected], lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return lengths, indices[starts + offsets]
+
+
+def _intersections(matrix: IncidenceMatrix, columns: IncidenceMatrix, start: int, end: int) -> np.ndarray:
+    row_count = len(matrix.row_ids)
+    block = end - start
+    block_rows = np.repeat(np.arange(block), np.diff(matrix.indptr[start:end + 1]))
+    block_columns = matrix.indices[matrix.indptr[start]:matrix.indptr[end]]
+    lengths, targets = _gather(columns.indptr, columns.indices, block_columns)
+    sources = np.repeat(block_rows, lengths)
+    counts = np.bincount(sources * row_count + targets, minlength=block * row_count)
+    return counts.reshape(block, row_count)
+
+
+def _scores(shared: np.ndarray, sizes: np.ndarray, start: int, end: int, metric: str) -> np.ndarray:
+    block_sizes = sizes[start:end, None].astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if metric == JACCARD:
+            scores = shared / (block_sizes + sizes[None, :] - shared)
+        elif metric == COSINE:
+            scores = shared / np.sqrt(block_sizes * sizes[None, :])
+        else:
+            raise ValueError(f'Unknown similarity metric "{metric}", expected {JACCARD} or {COSINE}')
+    return np.nan_to_num(scores, nan=0.0, posinf=0.0)
+
+
+def top_k_similar(matrix: IncidenceMatrix, k: int = 10, metric: str = JACCARD, min_score: float = 0.0,
+                  block_size: int = 512) -> Dict[str, List[SimilarPair]]:
+    row_count = len(matrix.row_ids)
+    if row_count < 2 or k < 1:
+        return {row_id: [] for row_id in matrix.row_ids}
+    columns = matrix.transposed()
+    sizes = matrix.row_sizes()
+    block_size = max(1, min(block_size, _MAX_BLOCK_CELLS // row_count))
+    k = min(k, row_count - 1)
+    similar: Dict[str, List[SimilarPair]] = {}
+    for start in range(0, row_count, block_size):
+        end = min(start + block_size, row_count)
+        shared = _intersections(matrix, columns, start, end)
+        scores = _scores(shared, sizes, start, end, metric)
+        block_index = np.arange(end - start)
+        scores[block_index, block_index + start] = -1.0
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        for row in range(end - start):
+            pairs = []
+            for target in map(int, candidates[row]):
+                score = float(scores[row, target])
+                if score <= min_score or shared[row, target] == 0:
+                    continue
+                pairs.append(SimilarPair(matrix.row_ids[start + row], matrix.row_ids[target], score,
+                                         int(shared[row, target])))
+            similar[matrix.row_ids[start + row]] = pairs
+    return similar
+
+
+def most_similar_pairs(matrix: IncidenceMatrix, count: int = 50, metric: str = JACCARD,
+                       min_score: float = 0.0, block_size: int = 512) -> List[SimilarPair]:
+    pairs: Dict[Tuple[str, ...], SimilarPair] = {}
+    for row_pairs in top_k_similar(matrix, count, metric, min_score, block_size).values():
+        for pair in row_pairs:
+            key = tuple(sorted((pair.source, pair.target)))
+            pairs.setdefault(key, pair)
+    return sorted(pairs.values(), key=lambda pair: (-pair.score, -pair.shared, pair.source))[:count]
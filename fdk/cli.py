@@ -0,0 +1,138 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fdk.importer import FdkImporter
+from fdk.journal import ImportJournal
+from fdk.metrics import metrics
+from fdk.storage.batching import BatchPolicy
+from fdk.storage.gateway import IFdkGateway, IGatewayListener, fdk_gateway
+from fdk.storage.json.gateway import JsonFdkGateway, fdk_import_gateway
+
+DETA = 'deta'
+MEMORY = 'memory'
+
+_DETA_MAX_BATCH = 25
+_STAGES = ('json.discover', 'json.read', 'json.parse', 'json.build', 'import.scan', 'import.delete',
+           'import.write', 'import.export')
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='fdk', description='Import a FDK folder without the Streamlit app')
+    parser.add_argument('source', type=Path, help='FDK folder with the object JSON files')
+    parser.add_argument('--backend', choices=[DETA, MEMORY], default=DETA,
+                        help='target of the import, memory keeps everything in process')
+    parser.add_argument('--workers', type=int, default=1, help='threads that read and parse the JSON files')
+    parser.add_argument('--batch-size', type=int, default=_DETA_MAX_BATCH, help='maximum models per write request')
+    parser.add_argument('--dry-run', action='store_true', help='read and build the models without writing them')
+    parser.add_argument('--journal', type=Path, help='checkpoint journal, an interrupted import resumes from it')
+    parser.add_argument('--documents', action='store_true',
+                        help='also write a precomputed document per object for single read object details')
+    parser.add_argument('--catalog', type=Path, help='also export the columnar catalog to this path')
+    parser.add_argument('--metrics', type=Path, help='write the collected metrics as JSON to this path')
+    parser.add_argument('--count-bytes', action='store_true',
+                        help='also count the bytes sent and received per request, serializes every payload again')
+    parser.add_argument('--quiet', action='store_true', help='do not print the progress')
+    return parser
+
+
+def _gateway(backend: str, batch_size: int, documents: bool) -> IFdkGateway:
+    from fdk.storage.db.documents import DetaDocumentStore, DocumentListener
+
+    policy = BatchPolicy(max_items=batch_size)
+    if backend == MEMORY:
+        from fdk.storage.db.memory import MemoryDeta
+
+        db_factory = MemoryDeta().Base
+        store = DetaDocumentStore(db_factory=db_factory) if documents else None
+        return fdk_gateway(db_factory=db_factory, listeners=[] if store is None else [DocumentListener(store)],
+                           batch_policy=policy, documents=store, registry=metrics)
+    from fdk.storage.db.hierarchy import DetaHierarchyStore, HierarchyListener
+    from fdk.storage.db.stats import DetaStatsStore, StatsListener
+
+    hierarchy = DetaHierarchyStore()
+    listeners: List[IGatewayListener] = [StatsListener(DetaStatsStore()), HierarchyListener(hierarchy)]
+    store = DetaDocumentStore() if documents else None
+    if store is not None:
+        listeners.append(DocumentListener(store))
+    return fdk_gateway(listeners=listeners, batch_policy=policy, index=hierarchy, documents=store, registry=metrics)
+
+
+def _progress(quiet: bool):
+    last: Dict[str, Any] = {'stage': None, 'time': 0.0}
+
+    def report(stage: str, done: int, total: int) -> None:
+        now = time.perf_counter()
+        if quiet or (stage == last['stage'] and done < total and now - last['time'] < 1.0):
+            return
+        last.update(stage=stage, time=now)
+        print(f'{stage}: {done}/{total}', file=sys.stderr)
+    return report
+
+
+def _rate(count: float, seconds: float) -> float:
+    return count / seconds if seconds > 0 else 0.0
+
+
+def summary(file_gw: JsonFdkGateway, seconds: float) -> Dict[str, Any]:
+    snapshot = metrics.snapshot()
+    models = len(file_gw.objects()) + len(file_gw.psets()) + len(file_gw.properties())
+    files, size = metrics.counter('json.files'), metrics.counter('json.bytes')
+    return {
+        'seconds': seconds,
+        'files': files,
+        'models': models,
+        'bytes': size,
+        'files_per_second': _rate(files, seconds),
+        'models_per_second': _rate(models, seconds),
+        'bytes_per_second': _rate(size, seconds),
+        'stages': {name: snapshot['histograms'][name] for name in _STAGES if name in snapshot['histograms']},
+        'round_trips': sum(value for name, value in snapshot['counters'].items() if name.endswith('.round_trips')),
+    }
+
+
+def _print_summary(result: Dict[str, Any]) -> None:
+    print(f'{result["files"]:.0f} files, {result["models"]} models, {result["bytes"]:.0f} bytes '
+          f'in {result["seconds"]:.2f} s')
+    print(f'{result["files_per_second"]:.1f} files/s, {result["models_per_second"]:.1f} models/s, '
+          f'{result["bytes_per_second"] / 1024:.1f} KiB/s, {result["round_trips"]:.0f} round trips')
+    print(f'{"stage":<16}{"calls":>8}{"total [s]":>12}{"mean [ms]":>12}{"p95 [ms]":>12}')
+    for name, hist in result['stages'].items():
+        print(f'{name:<16}{hist["count"]:>8}{hist["total"]:>12.3f}{hist["mean"] * 1000:>12.2f}'
+              f'{hist["p95"] * 1000:>12.2f}')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if not args.source.is_dir():
+        parser.error(f'{args.source} is not a folder')
+    if args.backend == DETA and args.batch_size > _DETA_MAX_BATCH:
+        parser.error(f'Deta writes at most {_DETA_MAX_BATCH} items per request')
+    metrics.reset()
+    metrics.count_bytes = args.count_bytes
+    start = time.perf_counter()
+    file_gw = fdk_import_gateway(args.source.absolute(), workers=args.workers)
+    if args.dry_run:
+        with metrics.stage('import.scan'):
+            file_gw.objects()
+    else:
+        journal = None if args.journal is None else ImportJournal(args.journal)
+        FdkImporter(_gateway(args.backend, args.batch_size, args.documents), group_size=max(args.batch_size, 100),
+                    progress=_progress(args.quiet), journal=journal).run(file_gw)
+    if args.catalog is not None:
+        from fdk.storage.columnar.gateway import export_catalog
+
+        with metrics.timer('import.export'):
+            export_catalog(args.catalog, file_gw)
+    result = summary(file_gw, time.perf_counter() - start)
+    _print_summary(result)
+    if args.metrics is not None:
+        metrics.to_json(args.metrics)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from fdk.journal import Checkpoint, ImportJournal, file_digest, model_digest
+from fdk.metrics import metrics
+from fdk.models.models import AFdkModel, FdkObject, Property, PropertySet
+from fdk.storage.gateway import IFdkGateway
+from fdk.storage.json.gateway import JsonFdkGateway
+from fdk.storage.session import FdkSession
+
+ProgressCallback = Callable[[str, int, int], None]
+
+SCAN = 'Scan FDK files'
+DELETE = 'Delete "{}"'
+WRITE = 'Import "{}"'
+
+PROPERTY_NAME = 'FDK Property'
+PSET_NAME = 'FDK Property Set'
+OBJECT_NAME = 'FDK Object'
+
+_MODEL_TYPES: List[Tuple[str, Type[AFdkModel]]] = [
+    (PROPERTY_NAME, Property),
+    (PSET_NAME, PropertySet),
+    (OBJECT_NAME, FdkObject),
+]
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+def grouped_models(models: Iterable[AFdkModel], group_size: int) -> List[List[AFdkModel]]:
+    model_groups = []
+    group: List[AFdkModel] = []
+    for model in models:
+        group.append(model)
+        if len(group) == group_size:
+            model_groups.append(group)
+            group = []
+    if len(group) > 0:
+        model_groups.append(group)
+    return model_groups
+
+
+class FdkImporter:
+
+    def __init__(self, db: IFdkGateway, group_size: int = 100, progress: Optional[ProgressCallback] = None,
+                 cancelled: Optional[Callable[[], bool]] = None, journal: Optional[ImportJournal] = None) -> None:
+        self.db = db
+        self.session = FdkSession(db, max_pending=group_size)
+        self.group_size = group_size
+        self.progress = progress or (lambda stage, done, total: None)
+        self.cancelled = cancelled or (lambda: False)
+        self.journal = journal
+
+    def _check_cancelled(self) -> None:
+        if self.cancelled():
+            raise ImportCancelled()
+
+    def _models(self, file_gw: JsonFdkGateway) -> List[Tuple[str, Sequence[AFdkModel]]]:
+        return [
+            (PROPERTY_NAME, file_gw.properties()),
+            (PSET_NAME, file_gw.psets()),
+            (OBJECT_NAME, file_gw.objects()),
+        ]
+
+    def scan(self, file_gw: JsonFdkGateway) -> None:
+        self.progress(SCAN, 0, 1)
+        with metrics.stage('import.scan'):
+            file_gw.objects()
+        self.progress(SCAN, 1, 1)
+
+    def delete(self, checkpoint: Optional[Checkpoint] = None) -> None:
+        # referring models are cleared first, so listeners never see dangling references
+        for model_name, model_type in reversed(_MODEL_TYPES):
+            self._check_cancelled()
+            if checkpoint is not None and model_name in checkpoint.deleted:
+                continue
+            stage = DELETE.format(model_name)
+            self.progress(stage, 0, 1)
+            with metrics.stage('import.delete'):
+                self.session.clear(model_type)
+                # the listeners persist the cleared state before the journal skips this delete on a resume
+                self.session.commit()
+            if self.journal is not None:
+                self.journal.deleted(model_name)
+            self.progress(stage, 1, 1)
+
+    def write(self, models: Sequence[AFdkModel], model_name: str, digests: Optional[Dict[str, str]] = None,
+              skipped: int = 0) -> None:
+        stage = WRITE.format(model_name)
+        total = len(models) + skipped
+        done = skipped
+        self.progress(stage, done, total)
+        with metrics.stage('import.write'):
+            for group in grouped_models(models, self.group_size):
+                self._check_cancelled()
+                self.session.save_all(group)
+                self.session.flush()
+                if self.journal is not None and digests is not None:
+                    self.journal.committed(model_name, {model.fdk_id: digests[model.fdk_id] for model in group})
+                done += len(group)
+                self.progress(stage, done, total)
+
+    def _digests(self, file_gw: JsonFdkGateway, model_name: str,
+                 models: Sequence[AFdkModel]) -> Dict[str, str]:
+        if model_name != OBJECT_NAME:
+            return {model.fdk_id: model_digest(model) for model in models}
+        # an object is built from its file alone, so the file hash identifies its content
+        file_digests = {}
+        for model in models:
+            path = file_gw.source_of(model.fdk_id)
+            file_digests[model.fdk_id] = model_digest(model) if path is None else file_digest(path)
+        return file_digests
+
+    def _resume(self, model_name: str, models: Sequence[AFdkModel], digests: Dict[str, str],
+                checkpoint: Checkpoint) -> List[AFdkModel]:
+        committed = checkpoint.digests(model_name)
+        removed = [fdk_id for fdk_id in committed if fdk_id not in digests]
+        if len(removed) > 0 and self.journal is not None:
+            self.session.delete(dict(_MODEL_TYPES)[model_name], removed)
+            self.session.flush()
+            self.journal.removed(model_name, removed)
+        pending = [model for model in models if committed.get(model.fdk_id) != digests[model.fdk_id]]
+        unchanged = [model for model in models if committed.get(model.fdk_id) == digests[model.fdk_id]]
+        self.db.mark_saved(unchanged)
+        metrics.increment('import.skipped', len(unchanged))
+        return pending
+
+    def _checkpoint(self, source: str) -> Optional[Checkpoint]:
+        if self.journal is None:
+            return None
+        checkpoint = self.journal.resumable(source)
+        if checkpoint is None:
+            self.journal.begin(source)
+        return checkpoint
+
+    def run(self, file_gw: JsonFdkGateway) -> None:
+        self.scan(file_gw)
+        checkpoint = self._checkpoint(str(file_gw.path))
+        self.delete(checkpoint)
+        for model_name, models in self._models(file_gw):
+            self._check_cancelled()
+            digests = None if self.journal is None else self._digests(file_gw, model_name, models)
+            pending = models
+            if checkpoint is not None and digests is not None:
+                pending = self._resume(model_name, models, digests, checkpoint)
+            self.write(pending, model_name, digests, skipped=len(models) - len(pending))
+        self.session.commit()
+        if self.journal is not None:
+            self.journal.finish()
@@ -0,0 +1,166 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional
+
+PENDING = 'pending'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+_FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+@dataclass(frozen=True)
+class JobStatus:
+    job_id: str
+    key: str
+    state: str = PENDING
+    stage: str = ''
+    done: int = 0
+    total: int = 0
+    created: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.state in _FINISHED
+
+    @property
+    def percent(self) -> float:
+        if self.state == SUCCEEDED:
+            return 1.0
+        return min(self.done / self.total, 1.0) if self.total > 0 else 0.0
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class Job:
+
+    def __init__(self, key: str, target: Callable[['Job'], None]) -> None:
+        self.target = target
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._status = JobStatus(job_id=uuid.uuid4().hex, key=key, created=time.time())
+
+    @property
+    def job_id(self) -> str:
+        return self._status.job_id
+
+    @property
+    def key(self) -> str:
+        return self._status.key
+
+    def status(self) -> JobStatus:
+        with self._lock:
+            return self._status
+
+    def _update(self, **changes) -> None:
+        with self._lock:
+            self._status = replace(self._status, **changes)
+
+    def progress(self, stage: str, done: int, total: int) -> None:
+        self._update(stage=stage, done=done, total=total)
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def run(self) -> None:
+        if self.cancelled():
+            self._update(state=CANCELLED, finished=time.time())
+            return
+        self._update(state=RUNNING, started=time.time())
+        try:
+            self.target(self)
+        except Exception as error:
+            # targets stop on cancellation by raising, so that is not a failure
+            if self.cancelled():
+                self._update(state=CANCELLED, finished=time.time())
+                return
+            traceback.print_exc()
+            self._update(state=FAILED, finished=time.time(), error=f'{type(error).__name__}: {error}')
+        else:
+            state = CANCELLED if self.cancelled() else SUCCEEDED
+            self._update(state=state, finished=time.time())
+
+
+class JobRunner:
+
+    def __init__(self, max_workers: int = 1, history: int = 20) -> None:
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fdk-job')
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._futures: Dict[str, Future] = {}
+
+    def _active(self, key: str) -> Optional[Job]:
+        for job in self._jobs.values():
+            if job.key == key and not job.status().is_finished:
+                return job
+        return None
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.status().is_finished]
+        for job in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job.job_id]
+            self._futures.pop(job.job_id, None)
+
+    def submit(self, key: str, target: Callable[[Job], None]) -> Job:
+        # a second submit for the same key joins the running job instead of starting a duplicate
+        with self._lock:
+            job = self._active(key)
+            if job is not None:
+                return job
+            self._prune()
+            job = Job(key, target)
+            self._jobs[job.job_id] = job
+            self._futures[job.job_id] = self._executor.submit(job.run)
+            return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active(self, key: Optional[str] = None) -> List[Job]:
+        with self._lock:
+            return [job for job in self._jobs.values()
+                    if not job.status().is_finished and (key is None or job.key == key)]
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.status().created, reverse=True)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None or job.status().is_finished:
+            return False
+        job.cancel()
+        return True
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[JobStatus]:
+        with self._lock:
+            future = self._futures.get(job_id)
+            job = self._jobs.get(job_id)
+        if future is None or job is None:
+            return None
+        future.result(timeout)
+        return job.status()
+
+    def shutdown(self, cancel: bool = True) -> None:
+        if cancel:
+            for job in self.active():
+                job.cancel()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from fdk.models.lazy import reference_ids
+from fdk.models.models import AFdkModel
+
+_BEGIN = 'begin'
+_DELETED = 'deleted'
+_COMMITTED = 'committed'
+_REMOVED = 'removed'
+_FINISHED = 'finished'
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_digest(model: AFdkModel) -> str:
+    content = model.as_dict(with_reference=False)
+    for attr, value in model.as_ref_dict().items():
+        content[attr] = reference_ids(value)
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+@dataclass
+class Checkpoint:
+    source: str
+    deleted: Set[str] = field(default_factory=set)
+    committed: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    finished: bool = False
+
+    def digests(self, model_name: str) -> Dict[str, str]:
+        return self.committed.get(model_name, {})
+
+
+class ImportJournal:
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        # one fsynced line per record, a crash loses at most the batch that was written
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(record, separators=(',', ':')) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+
+    def records(self) -> List[Dict[str, Any]]:
+        if not self.path.exists():
+            return []
+        records = []
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return records
+
+    def checkpoint(self) -> Optional[Checkpoint]:
+        records = self.records()
+        if len(records) == 0 or records[0].get('event') != _BEGIN:
+            return None
+        checkpoint = Checkpoint(source=records[0]['source'])
+        for record in records[1:]:
+            event = record['event']
+            if event == _DELETED:
+                checkpoint.deleted.add(record['model'])
+            elif event == _COMMITTED:
+                checkpoint.committed.setdefault(record['model'], {}).update(record['digests'])
+            elif event == _REMOVED:
+                digests = checkpoint.committed.get(record['model'], {})
+                for fdk_id in record['ids']:
+                    digests.pop(fdk_id, None)
+            elif event == _FINISHED:
+                checkpoint.finished = True
+        return checkpoint
+
+    def resumable(self, source: str) -> Optional[Checkpoint]:
+        checkpoint = self.checkpoint()
+        if checkpoint is None or checkpoint.finished or checkpoint.source != source:
+            return None
+        return checkpoint
+
+    def begin(self, source: str) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            self.path.unlink()
+        self._append({'event': _BEGIN, 'source': source})
+
+    def deleted(self, model_name: str) -> None:
+        self._append({'event': _DELETED, 'model': model_name})
+
+    def committed(self, model_name: str, digests: Dict[str, str]) -> None:
+        self._append({'event': _COMMITTED, 'model': model_name, 'digests': digests})
+
+    def removed(self, model_name: str, fdk_ids: Iterable[str]) -> None:
+        self._append({'event': _REMOVED, 'model': model_name, 'ids': list(fdk_ids)})
+
+    def finish(self) -> None:
+        self._append({'event': _FINISHED})
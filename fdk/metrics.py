@@ -0,0 +1,165 @@
+import json
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+COUNT_BUCKETS: Tuple[float, ...] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+_TOP_ALLOCATIONS = 5
+
+TFunc = TypeVar('TFunc', bound=Callable[..., Any])
+
+
+@dataclass
+class Histogram:
+    bounds: Tuple[float, ...] = _BUCKETS
+    counts: List[int] = field(default_factory=list)
+    count: int = 0
+    total: float = 0.0
+    min: float = 0.0
+    max: float = 0.0
+
+    def __post_init__(self) -> None:
+        if len(self.counts) == 0:
+            self.counts = [0] * (len(self.bounds) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.min = value if self.count == 0 else min(self.min, value)
+        self.max = value if self.count == 0 else max(self.max, value)
+        self.count += 1
+        self.total += value
+
+    def quantile(self, quantile: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = quantile * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count > 0:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count > 0 else 0.0,
+            'min': self.min,
+            'max': self.max,
+            'p50': min(self.quantile(0.5), self.max),
+            'p95': min(self.quantile(0.95), self.max),
+            'buckets': {str(bound): count for bound, count in zip(self.bounds, self.counts) if count > 0},
+            'overflow': self.counts[-1],
+        }
+
+
+class MetricsRegistry:
+
+    def __init__(self, enabled: bool = True, trace_memory: bool = False, count_bytes: bool = False) -> None:
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.count_bytes = count_bytes
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._memory: Dict[str, Dict[str, Any]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float, bounds: Tuple[float, ...] = _BUCKETS) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(bounds)
+            self._histograms[name].observe(value)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: str) -> Callable[[TFunc], TFunc]:
+        def decorator(func: TFunc) -> TFunc:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper  # type: ignore
+        return decorator
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if not self.enabled or not self.trace_memory:
+            with self.timer(name):
+                yield
+            return
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        first = tracemalloc.take_snapshot()
+        try:
+            with self.timer(name):
+                yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().compare_to(first, 'lineno')[:_TOP_ALLOCATIONS]
+            if started:
+                tracemalloc.stop()
+            with self._lock:
+                self._memory[name] = {
+                    'allocated': current - before,
+                    'peak': peak - before,
+                    'top': [str(stat) for stat in top],
+                }
+
+    def counter(self, name: str) -> float:
+        return self._counters.get(name, 0)
+
+    def histogram(self, name: str) -> Optional[Histogram]:
+        return self._histograms.get(name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'counters': dict(sorted(self._counters.items())),
+                'histograms': {name: hist.as_dict() for name, hist in sorted(self._histograms.items())},
+                'memory': dict(self._memory),
+            }
+
+    def to_json(self, path: Optional[Path] = None) -> str:
+        content = json.dumps(self.snapshot(), indent=4)
+        if path is not None:
+            path.write_text(content, encoding='utf-8')
+        return content
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._memory.clear()
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,112 @@
+from collections.abc import MutableSequence
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+from fdk.models.models import is_model
+
+
+class LazyModels(MutableSequence):
+
+    def __init__(self, iterable: Iterable[Any] = (), loader: Optional[Callable[[], List[Any]]] = None,
+                 fdk_ids: Optional[List[str]] = None) -> None:
+        self._models = list(iterable)
+        self._loader = loader
+        self._fdk_ids = fdk_ids
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loader is None
+
+    @property
+    def fdk_ids(self) -> List[str]:
+        if not self.is_loaded and self._fdk_ids is not None:
+            return list(self._fdk_ids)
+        return [model.fdk_id for model in self._models]
+
+    @property
+    def models(self) -> List[Any]:
+        # not a list subclass, so no C fast path can read the models before they are loaded
+        return self.load()._models
+
+    def load(self) -> 'LazyModels':
+        if self._loader is not None:
+            loader, self._loader = self._loader, None
+            self._models.extend(loader())
+        return self
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.models)
+
+    def __reversed__(self) -> Iterator[Any]:
+        return reversed(self.models)
+
+    def __contains__(self, value: object) -> bool:
+        return value in self.models
+
+    def __getitem__(self, index: Any) -> Any:
+        return self.models[index]
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        self.models[index] = value
+
+    def __delitem__(self, index: Any) -> None:
+        del self.models[index]
+
+    def insert(self, index: int, value: Any) -> None:
+        self.models.insert(index, value)
+
+    def extend(self, values: Iterable[Any]) -> None:
+        self.models.extend(values)
+
+    def index(self, value: Any, *args: Any) -> int:
+        return self.models.index(value, *args)
+
+    def count(self, value: Any) -> int:
+        return self.models.count(value)
+
+    def sort(self, *, key: Optional[Callable[[Any], Any]] = None, reverse: bool = False) -> None:
+        self.models.sort(key=key, reverse=reverse)
+
+    def copy(self) -> List[Any]:
+        return list(self.models)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, LazyModels):
+            other = other.models
+        return isinstance(other, list) and self.models == other
+
+    def __add__(self, other: Any) -> List[Any]:
+        if not isinstance(other, (list, LazyModels)):
+            return NotImplemented
+        return self.models + list(other)
+
+    def __radd__(self, other: Any) -> List[Any]:
+        if not isinstance(other, list):
+            return NotImplemented
+        return other + self.models
+
+    def __mul__(self, times: int) -> List[Any]:
+        return self.models * times
+
+    __rmul__ = __mul__
+
+    def __repr__(self) -> str:
+        if not self.is_loaded:
+            return f'LazyModels(not loaded, {len(self._fdk_ids or [])} ids)'
+        return repr(self._models)
+
+    __hash__ = None  # type: ignore
+
+
+def is_loaded(value: Any) -> bool:
+    return not isinstance(value, LazyModels) or value.is_loaded
+
+
+def reference_ids(value: Any) -> List[str]:
+    if is_model(value):
+        return [value.fdk_id]
+    if isinstance(value, LazyModels):
+        return value.fdk_ids
+    return [model.fdk_id for model in value]
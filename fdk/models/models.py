@@ -1,5 +1,5 @@
 
-from dataclasses import asdict, dataclass, field
+from dataclasses import asdict, dataclass, field, fields
 from typing import Any, Dict, Iterable, List, TypeGuard, get_args, get_origin
 
 
@@ -34,11 +34,15 @@ class AFdkModel:
     name: str = field(hash=False)
 
     def as_dict(self, with_reference: bool):
-        attr_dict = asdict(self)
         if with_reference:
-            return attr_dict
-        for attr in self.ref_attrs():
-            attr_dict.pop(attr)
+            return asdict(self)
+        ref_attrs = self.ref_attrs()
+        attr_dict = {}
+        for attr in fields(self):
+            if attr.name in ref_attrs:
+                continue
+            value = getattr(self, attr.name)
+            attr_dict[attr.name] = list(value) if isinstance(value, list) else value
         return attr_dict
 
     def as_ref_dict(self) -> Dict[str, Any]:
@@ -0,0 +1,115 @@
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from fdk.metrics import COUNT_BUCKETS, MetricsRegistry, metrics
+
+Item = Dict[str, Any]
+
+_PAYLOAD_TOO_LARGE = 413
+_TOO_MANY_REQUESTS = 429
+
+
+@dataclass(frozen=True)
+class BatchPolicy:
+    max_items: int = 25
+    initial_items: int = 10
+    max_bytes: int = 1024 * 1024
+    min_items: int = 1
+    target_latency: float = 1.0
+    retries: int = 5
+    backoff: float = 0.2
+    max_backoff: float = 10.0
+
+
+def _status(error: Exception) -> int:
+    status = getattr(error, 'code', None)
+    return status if isinstance(status, int) else 0
+
+
+def is_size_error(error: Exception) -> bool:
+    return _status(error) == _PAYLOAD_TOO_LARGE
+
+
+def is_transient_error(error: Exception) -> bool:
+    status = _status(error)
+    if status != 0:
+        return status == _TOO_MANY_REQUESTS or status >= 500
+    return isinstance(error, (OSError, TimeoutError))
+
+
+def item_size(item: Item) -> int:
+    return len(json.dumps(item, default=str).encode('utf-8'))
+
+
+class BatchWriter:
+
+    def __init__(self, put_many: Callable[[List[Item]], Any], policy: BatchPolicy = BatchPolicy(),
+                 name: str = 'batch', sleep: Callable[[float], None] = time.sleep,
+                 registry: MetricsRegistry = metrics) -> None:
+        self.put_many = put_many
+        self.policy = policy
+        self.name = name
+        self.sleep = sleep
+        self.metrics = registry
+        # starts below the ceiling, so there is room to grow while requests stay fast
+        self.limit = max(policy.min_items, min(policy.initial_items, policy.max_items))
+
+    def pack(self, items: Iterable[Item]) -> Iterator[List[Item]]:
+        batch: List[Item] = []
+        batch_bytes = 0
+        for item in items:
+            size = item_size(item)
+            # the limit is read per item, so it follows the adjustments made while writing
+            if len(batch) > 0 and (len(batch) >= self.limit or batch_bytes + size > self.policy.max_bytes):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(item)
+            batch_bytes += size
+        if len(batch) > 0:
+            yield batch
+
+    def write(self, items: Iterable[Item]) -> int:
+        requests = 0
+        for batch in self.pack(items):
+            requests += self._send(batch)
+        return requests
+
+    def _adjust(self, latency: float) -> None:
+        # additive increase while requests stay below the target latency, multiplicative decrease above it
+        if latency > self.policy.target_latency:
+            self.limit = max(self.policy.min_items, self.limit // 2)
+        else:
+            self.limit = min(self.policy.max_items, self.limit + 1)
+        self.metrics.observe(f'{self.name}.limit', self.limit, COUNT_BUCKETS)
+
+    def _delay(self, attempt: int) -> float:
+        delay = min(self.policy.max_backoff, self.policy.backoff * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _split(self, batch: List[Item]) -> Tuple[List[Item], List[Item]]:
+        self.limit = max(self.policy.min_items, min(self.limit, len(batch)) // 2)
+        middle = len(batch) // 2
+        return batch[:middle], batch[middle:]
+
+    def _send(self, batch: List[Item]) -> int:
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                self.put_many(batch)
+            except Exception as error:
+                if is_size_error(error) and len(batch) > 1:
+                    self.metrics.increment(f'{self.name}.splits')
+                    first, second = self._split(batch)
+                    return self._send(first) + self._send(second)
+                if not is_transient_error(error) or attempt >= self.policy.retries:
+                    raise
+                self.metrics.increment(f'{self.name}.retries')
+                self.sleep(self._delay(attempt))
+                attempt += 1
+                continue
+            self._adjust(time.perf_counter() - start)
+            return attempt + 1
@@ -2,6 +2,7 @@
 from abc import abstractmethod
 from typing import Any, Dict, List, Optional, Tuple, Type
 
+from fdk.metrics import metrics
 from fdk.models.models import FdkObject, Property, PropertySet
 
 from .builder import IBuilder, TModel
@@ -9,13 +10,21 @@ from .builder import IBuilder, TModel
 
 class AJsonBuilder(IBuilder[TModel]):
     _models: Dict[str, TModel] = {}
+    cache_models = True
 
     @classmethod
     def _get_model(cls, model: TModel) -> TModel:
+        if not cls.cache_models:
+            return model
         if model.fdk_id not in cls._models:
             cls._models[model.fdk_id] = model
         return cls._models[model.fdk_id]
 
+    @classmethod
+    def clear_cache(cls) -> None:
+        # the dictionary is shared by all builders
+        cls._models.clear()
+
     @classmethod
     @abstractmethod
     def attribute_map(cls) -> Dict[str, str]:
@@ -60,6 +69,7 @@ class AJsonBuilder(IBuilder[TModel]):
         attributes = self._attributes(content)
         attributes.update(self._model_attributes(content))
         model = self.model_type(**attributes)
+        metrics.increment(f'builder.{self.model_type.__name__}.build')
         return self._get_model(model)
 
     def build_many(self, contents: List[Dict[str, Any]]) -> List[TModel]:
@@ -0,0 +1,423 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import groupby
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Type
+
+from fdk.models.lazy import LazyModels, reference_ids
+from fdk.models.models import AFdkModel, FdkObject, Property, PropertySet
+from fdk.storage.index import id_key
+from fdk.storage.query import CONTAINS, EQ, IN, PREFIX, Filter
+from fdk.storage.sections import OBJECTS, PROPERTIES, PSETS
+
+_MAGIC = b'FDKCOL01'
+_VERSION = 2
+_PREFIX = struct.Struct('<8sI4x')
+_ALIGN = 8
+_KEY = 'key'
+_INDEX = 'I'
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    model_type: Type[AFdkModel]
+    columns: Tuple[str, ...]
+    references: Dict[str, str] = field(default_factory=dict)
+    id_lists: Tuple[str, ...] = ()
+    sorted_columns: Tuple[str, ...] = ('name',)
+
+
+TABLES: Dict[str, TableSpec] = {
+    PROPERTIES: TableSpec(Property, ('fdk_id', 'name', 'name_clean', 'format', 'unit', 'description', 'example'),
+                          id_lists=('object_ids', 'pset_ids'), sorted_columns=('name', 'name_clean')),
+    PSETS: TableSpec(PropertySet, ('fdk_id', 'name'), {'properties': PROPERTIES}, ('object_ids',)),
+    OBJECTS: TableSpec(FdkObject, ('fdk_id', 'name', 'department', 'group', 'description'),
+                       {'properties': PROPERTIES, 'property_sets': PSETS}),
+}
+
+
+def _index_array(values: Iterable[int] = ()) -> array:
+    values = array(_INDEX, values)
+    if values.itemsize != 4:
+        raise RuntimeError(f'array typecode "{_INDEX}" is not 4 bytes on this platform')
+    return values
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class _StringTable:
+
+    def __init__(self) -> None:
+        self.indices: Dict[str, int] = {}
+        self.offsets = _index_array([0])
+        self.data = bytearray()
+
+    @staticmethod
+    def value(value: Any) -> str:
+        return '' if value is None else str(value)
+
+    def add(self, value: Any) -> int:
+        value = self.value(value)
+        if value not in self.indices:
+            self.indices[value] = len(self.indices)
+            self.data.extend(value.encode('utf-8'))
+            self.offsets.append(len(self.data))
+        return self.indices[value]
+
+
+class CatalogWriter:
+
+    def __init__(self) -> None:
+        self.strings = _StringTable()
+        self.sections: Dict[str, Tuple[str, bytes]] = {}
+        self.counts: Dict[str, int] = {}
+
+    def _add(self, name: str, values: array) -> None:
+        self.sections[name] = (values.typecode, values.tobytes())
+
+    def _add_table(self, table: str, models: Sequence[AFdkModel], rows: Dict[str, Dict[str, int]]) -> None:
+        spec = TABLES[table]
+        self.counts[table] = len(models)
+        for column in spec.columns:
+            self._add(f'{table}.{column}', _index_array(self.strings.add(getattr(model, column))
+                                                        for model in models))
+        for attr, target in spec.references.items():
+            target_rows = rows[target]
+            self._add_links(f'{table}.{attr}', ([target_rows[ref_id] for ref_id in reference_ids(getattr(model, attr))
+                                                 if ref_id in target_rows] for model in models))
+        for attr in spec.id_lists:
+            self._add_links(f'{table}.{attr}', ([self.strings.add(fdk_id) for fdk_id in getattr(model, attr)]
+                                                for model in models))
+        order = sorted(range(len(models)), key=lambda row: id_key(table, models[row].fdk_id))
+        self._add(f'{table}.order', _index_array(order))
+        for column in spec.sorted_columns:
+            self._add(f'{table}.{column}.sorted', _index_array(sorted(
+                range(len(models)), key=lambda row: self.strings.value(getattr(models[row], column)))))
+
+    def _add_hierarchy(self, objects: Sequence[FdkObject]) -> None:
+        def group_of(row: int) -> Tuple[str, str]:
+            return objects[row].department, objects[row].group
+
+        rows = sorted(range(len(objects)), key=lambda row: (*group_of(row), id_key(OBJECTS, objects[row].fdk_id)))
+        offsets, departments, groups = _index_array([0]), _index_array(), _index_array()
+        for (department, group), group_rows in groupby(rows, key=group_of):
+            departments.append(self.strings.add(department))
+            groups.append(self.strings.add(group))
+            offsets.append(offsets[-1] + len(list(group_rows)))
+        self._add(f'{OBJECTS}.hierarchy', _index_array(rows))
+        self._add(f'{OBJECTS}.groups.offsets', offsets)
+        self._add(f'{OBJECTS}.groups.department', departments)
+        self._add(f'{OBJECTS}.groups.group', groups)
+
+    def _add_links(self, name: str, links: Iterable[List[int]]) -> None:
+        offsets = _index_array([0])
+        values = _index_array()
+        for row_links in links:
+            values.extend(row_links)
+            offsets.append(len(values))
+        self._add(f'{name}.offsets', offsets)
+        self._add(f'{name}.values', values)
+
+    def write(self, path: Path, objects: Sequence[FdkObject], property_sets: Sequence[PropertySet],
+              properties: Sequence[Property]) -> Path:
+        models: Dict[str, Sequence[AFdkModel]] = {OBJECTS: objects, PSETS: property_sets, PROPERTIES: properties}
+        rows = {table: {model.fdk_id: row for row, model in enumerate(values)} for table, values in models.items()}
+        for table in TABLES:
+            self._add_table(table, models[table], rows)
+        self._add_hierarchy(objects)
+        self._add('strings.offsets', self.strings.offsets)
+        self.sections['strings.data'] = ('B', bytes(self.strings.data))
+        return self._write(path)
+
+    def _write(self, path: Path) -> Path:
+        layout: Dict[str, List[Any]] = {}
+        offset = 0
+        for name, (typecode, content) in self.sections.items():
+            layout[name] = [offset, len(content), typecode]
+            offset = _align(offset + len(content))
+        header = json.dumps({
+            'version': _VERSION,
+            'byteorder': sys.byteorder,
+            'counts': self.counts,
+            'sections': layout,
+        }).encode('utf-8')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f'{path.name}.tmp')
+        with open(temp_path, 'wb') as file:
+            file.write(_PREFIX.pack(_MAGIC, len(header)))
+            file.write(header)
+            start = _align(_PREFIX.size + len(header))
+            for name, (_, content) in self.sections.items():
+                file.seek(start + layout[name][0])
+                file.write(content)
+            file.truncate(start + offset)
+        # replacing keeps the old file alive for processes that still map it
+        os.replace(temp_path, path)
+        return path
+
+
+def write_catalog(path: Path, objects: Sequence[FdkObject], property_sets: Sequence[PropertySet],
+                  properties: Sequence[Property]) -> Path:
+    return CatalogWriter().write(path, objects, property_sets, properties)
+
+
+class ColumnarCatalog:
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = _PREFIX.unpack_from(self._mmap, 0)
+        if magic != _MAGIC:
+            raise ValueError(f'{path} is not a columnar FDK catalog')
+        header = json.loads(self._mmap[_PREFIX.size:_PREFIX.size + header_size].decode('utf-8'))
+        if header['version'] != _VERSION:
+            raise ValueError(f'{path} has catalog version {header["version"]}, export it again')
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f'{path} was written with {header["byteorder"]} endian byte order')
+        self.counts: Dict[str, int] = header['counts']
+        start = _align(_PREFIX.size + header_size)
+        self._view = memoryview(self._mmap)
+        self._sections: Dict[str, memoryview] = {}
+        for name, (offset, size, typecode) in header['sections'].items():
+            section = self._view[start + offset:start + offset + size]
+            self._sections[name] = section if typecode == 'B' else section.cast(typecode)
+        self._string_offsets = self._sections['strings.offsets']
+        self._string_data = self._sections['strings.data']
+        self.tables = {table: ModelTable(self, table) for table in TABLES}
+        self.index = CatalogIndex(self)
+
+    def section(self, name: str) -> memoryview:
+        return self._sections[name]
+
+    def string(self, index: int) -> str:
+        start, end = self._string_offsets[index], self._string_offsets[index + 1]
+        return str(self._string_data[start:end], 'utf-8')
+
+    def close(self) -> None:
+        self.tables.clear()
+        for section in self._sections.values():
+            section.release()
+        self._sections.clear()
+        self._view.release()
+        self._mmap.close()
+
+    @property
+    def objects(self) -> 'ModelTable':
+        return self.tables[OBJECTS]
+
+    @property
+    def property_sets(self) -> 'ModelTable':
+        return self.tables[PSETS]
+
+    @property
+    def properties(self) -> 'ModelTable':
+        return self.tables[PROPERTIES]
+
+
+def _page(table: 'ModelTable', rows: memoryview, after: Optional[str],
+          limit: int) -> Tuple[List[str], Optional[str]]:
+    start = 0
+    if after is not None:
+        start = bisect_right(rows, id_key(table.table, after), key=lambda row: id_key(table.table, table.fdk_id(row)))
+    page = [table.fdk_id(row) for row in rows[start:start + limit]]
+    return page, page[-1] if start + limit < len(rows) and len(page) > 0 else None
+
+
+class ModelTable:
+
+    def __init__(self, catalog: ColumnarCatalog, table: str) -> None:
+        self.catalog = catalog
+        self.table = table
+        self.spec = TABLES[table]
+        self._columns = {column: catalog.section(f'{table}.{column}') for column in self.spec.columns}
+        self._order = catalog.section(f'{table}.order')
+        self._sorted = {column: catalog.section(f'{table}.{column}.sorted') for column in self.spec.sorted_columns}
+
+    def __len__(self) -> int:
+        return self.catalog.counts[self.table]
+
+    def __iter__(self) -> Iterator[AFdkModel]:
+        return (self.row(row) for row in range(len(self)))
+
+    def value(self, row: int, column: str) -> str:
+        return self.catalog.string(self._columns[column][row])
+
+    def fdk_id(self, row: int) -> str:
+        return self.value(row, 'fdk_id')
+
+    def _links(self, row: int, attr: str) -> memoryview:
+        offsets = self.catalog.section(f'{self.table}.{attr}.offsets')
+        return self.catalog.section(f'{self.table}.{attr}.values')[offsets[row]:offsets[row + 1]]
+
+    def reference_rows(self, row: int, attr: str) -> List[int]:
+        return self._links(row, attr).tolist()
+
+    def id_list(self, row: int, attr: str) -> List[str]:
+        return [self.catalog.string(index) for index in self._links(row, attr)]
+
+    def _id_key(self, row: int) -> Tuple[Any, Any]:
+        return id_key(self.table, self.fdk_id(row))
+
+    def row_of(self, fdk_id: str) -> Optional[int]:
+        try:
+            key = id_key(self.table, fdk_id)
+        except ValueError:
+            return None
+        position = bisect_left(self._order, key, key=self._id_key)
+        if position < len(self._order) and self.fdk_id(self._order[position]) == fdk_id:
+            return self._order[position]
+        return None
+
+    def sorted_rows(self) -> List[int]:
+        return self._order.tolist()
+
+    def page(self, after: Optional[str] = None, limit: int = 50) -> Tuple[List[str], Optional[str]]:
+        return _page(self, self._order, after, limit)
+
+    def distinct_values(self, column: str) -> Set[str]:
+        return set(self.catalog.string(index) for index in set(self._columns[column]))
+
+    def rows_with(self, column: str, value: str, prefix: bool = False) -> List[int]:
+        rows = self._sorted[column]
+        start = bisect_left(rows, value, key=lambda row: self.value(row, column))
+        if prefix:
+            end = start
+            while end < len(rows) and self.value(rows[end], column).startswith(value):
+                end += 1
+        else:
+            end = bisect_right(rows, value, lo=start, key=lambda row: self.value(row, column))
+        return sorted(rows[start:end])
+
+    def _indexed_rows(self, query_filter: Filter) -> Optional[List[int]]:
+        attr = 'fdk_id' if query_filter.attr == _KEY else query_filter.attr
+        values = query_filter.value if query_filter.operator == IN else (query_filter.value,)
+        if query_filter.operator not in (EQ, IN, PREFIX) or not all(isinstance(value, str) for value in values):
+            return None
+        if attr == 'fdk_id' and query_filter.operator != PREFIX:
+            return sorted(set(row for row in map(self.row_of, values) if row is not None))
+        if attr not in self._sorted:
+            return None
+        return sorted(set(row for value in values
+                          for row in self.rows_with(attr, value, prefix=query_filter.operator == PREFIX)))
+
+    def _row_filter(self, query_filter: Filter) -> Callable[[int], bool]:
+        attr = 'fdk_id' if query_filter.attr == _KEY else query_filter.attr
+        # filters run once per distinct string, rows only look up their string table indices
+        if attr in self._columns:
+            column = self._columns[attr]
+            string_matches = lru_cache(maxsize=None)(
+                lambda index: query_filter.matches({query_filter.attr: self.catalog.string(index)}))
+            return lambda row: string_matches(column[row])
+        if query_filter.operator == CONTAINS and attr in self.spec.id_lists:
+            is_value = lru_cache(maxsize=None)(lambda index: self.catalog.string(index) == query_filter.value)
+            return lambda row: any(is_value(index) for index in self._links(row, attr))
+        if query_filter.operator == CONTAINS and attr in self.spec.references:
+            target_row = None
+            if isinstance(query_filter.value, str):
+                target_row = self.catalog.tables[self.spec.references[attr]].row_of(query_filter.value)
+            return lambda row: target_row is not None and target_row in self._links(row, attr)
+        return lambda row: query_filter.matches({query_filter.attr: self.attr_value(row, attr)})
+
+    def matching_rows(self, filters: Iterable[Filter]) -> List[int]:
+        filters = list(filters)
+        candidates: Optional[List[int]] = None
+        for query_filter in filters:
+            rows = self._indexed_rows(query_filter)
+            if rows is not None and (candidates is None or len(rows) < len(candidates)):
+                candidates = rows
+        row_filters = [self._row_filter(query_filter) for query_filter in filters]
+        return [row for row in (range(len(self)) if candidates is None else candidates)
+                if all(row_filter(row) for row_filter in row_filters)]
+
+    def attr_value(self, row: int, attr: str) -> Any:
+        if attr == _KEY:
+            attr = 'fdk_id'
+        if attr in self.spec.references:
+            target_table = self.catalog.tables[self.spec.references[attr]]
+            return [target_table.fdk_id(ref_row) for ref_row in self.reference_rows(row, attr)]
+        if attr in self.spec.id_lists:
+            return self.id_list(row, attr)
+        if attr in self._columns:
+            return self.value(row, attr)
+        return None
+
+    def attrs(self) -> Tuple[str, ...]:
+        return (_KEY, *self.spec.columns, *self.spec.references, *self.spec.id_lists)
+
+    def content(self, row: int, attrs: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        return {attr: self.attr_value(row, attr) for attr in (self.attrs() if attrs is None else attrs)}
+
+    def _references(self, row: int, attr: str, lazy: bool) -> Sequence[AFdkModel]:
+        target_table = self.catalog.tables[self.spec.references[attr]]
+        ref_rows = self.reference_rows(row, attr)
+        if not lazy:
+            return [target_table.row(ref_row, lazy=False) for ref_row in ref_rows]
+        return LazyModels(loader=lambda: [target_table.row(ref_row) for ref_row in ref_rows],
+                          fdk_ids=[target_table.fdk_id(ref_row) for ref_row in ref_rows])
+
+    def row(self, row: int, lazy: bool = True) -> AFdkModel:
+        attributes: Dict[str, Any] = {column: self.value(row, column) for column in self.spec.columns}
+        for attr in self.spec.references:
+            attributes[attr] = self._references(row, attr, lazy)
+        for attr in self.spec.id_lists:
+            attributes[attr] = self.id_list(row, attr)
+        return self.spec.model_type(**attributes)
+
+    def by_id(self, fdk_id: str, lazy: bool = True) -> Optional[AFdkModel]:
+        row = self.row_of(fdk_id)
+        return None if row is None else self.row(row, lazy)
+
+
+class CatalogIndex:
+
+    def __init__(self, catalog: ColumnarCatalog) -> None:
+        self.catalog = catalog
+        self._rows = catalog.section(f'{OBJECTS}.hierarchy')
+        self._offsets = catalog.section(f'{OBJECTS}.groups.offsets')
+        self._departments = catalog.section(f'{OBJECTS}.groups.department')
+        self._groups = catalog.section(f'{OBJECTS}.groups.group')
+
+    def _department(self, index: int) -> str:
+        return self.catalog.string(self._departments[index])
+
+    def _group(self, index: int) -> Tuple[str, str]:
+        return self._department(index), self.catalog.string(self._groups[index])
+
+    def _count(self, index: int) -> int:
+        return self._offsets[index + 1] - self._offsets[index]
+
+    def departments(self) -> Dict[str, int]:
+        departments: Dict[str, int] = {}
+        for index in range(len(self._groups)):
+            department = self._department(index)
+            departments[department] = departments.get(department, 0) + self._count(index)
+        return departments
+
+    def groups(self, department: str) -> Dict[str, int]:
+        groups: Dict[str, int] = {}
+        index = bisect_left(range(len(self._groups)), department, key=self._department)
+        while index < len(self._groups) and self._department(index) == department:
+            groups[self.catalog.string(self._groups[index])] = self._count(index)
+            index += 1
+        return groups
+
+    def objects(self, department: str, group: str, after: Optional[str] = None,
+                limit: int = 50) -> Tuple[List[str], Optional[str]]:
+        index = bisect_left(range(len(self._groups)), (department, group), key=self._group)
+        if index == len(self._groups) or self._group(index) != (department, group):
+            return [], None
+        rows = self._rows[self._offsets[index]:self._offsets[index + 1]]
+        return _page(self.catalog.objects, rows, after, limit)
+
+    def page(self, section: str, after: Optional[str] = None, limit: int = 50) -> Tuple[List[str], Optional[str]]:
+        return self.catalog.tables[section].page(after, limit)
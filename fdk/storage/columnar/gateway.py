@@ -0,0 +1,84 @@
+from pathlib import Path
+from typing import Any, Dict, Generic, Iterable, List, Optional, Set
+
+from fdk.models.models import FdkObject, Property, PropertySet
+from fdk.storage.builder.builder import TModel
+from fdk.storage.columnar.catalog import ColumnarCatalog, ModelTable, write_catalog
+from fdk.storage.gateway import FdkGateway, IFdkGateway, ReadOnlyGatewayError
+from fdk.storage.json.gateway import JsonFdkGateway
+from fdk.storage.query import Query
+
+_ROW = '#row'
+_READ_ONLY = 'The columnar catalog is read-only, write it with write_catalog'
+
+
+class ColumnarModelGateway(Generic[TModel]):
+
+    def __init__(self, table: ModelTable, name_column: str = 'name') -> None:
+        self.table = table
+        self.name_column = name_column
+
+    def create_or_update(self, model: TModel) -> None:
+        raise ReadOnlyGatewayError(_READ_ONLY)
+
+    def create_or_update_many(self, models: Iterable[TModel]) -> None:
+        raise ReadOnlyGatewayError(_READ_ONLY)
+
+    def delete_many(self, fdk_ids: Iterable[str]) -> None:
+        raise ReadOnlyGatewayError(_READ_ONLY)
+
+    def delete_all(self) -> None:
+        raise ReadOnlyGatewayError(_READ_ONLY)
+
+    def all_ids(self) -> List[str]:
+        return [self.table.fdk_id(row) for row in self.table.sorted_rows()]
+
+    def _models(self, rows: Iterable[int], lazy: bool, include: Iterable[str]) -> List[TModel]:
+        # reference lists load from the mapped file, so include only decides eager or lazy
+        eager = not lazy or len(list(include)) > 0
+        return [self.table.row(row, lazy=not eager) for row in rows]  # type: ignore
+
+    def by_id(self, fdk_id: str, lazy: bool = False, include: Iterable[str] = ()) -> Optional[TModel]:
+        models = self.by_ids([fdk_id], lazy, include)
+        return models[0] if len(models) > 0 else None
+
+    def by_ids(self, fdk_ids: Iterable[str], lazy: bool = False, include: Iterable[str] = ()) -> List[TModel]:
+        rows = [self.table.row_of(fdk_id) for fdk_id in dict.fromkeys(fdk_ids)]
+        return self._models([row for row in rows if row is not None], lazy, include)
+
+    def all_names(self) -> Set[str]:
+        return self.table.distinct_values(self.name_column)
+
+    def by_name(self, name: str, lazy: bool = False, include: Iterable[str] = ()) -> List[TModel]:
+        return self._models(self.table.rows_with(self.name_column, name), lazy, include)
+
+    def all_models(self, lazy: bool = False, include: Iterable[str] = ()) -> List[TModel]:
+        return self._models(range(len(self.table)), lazy, include)
+
+    def _query_contents(self, query: Query) -> List[Dict[str, Any]]:
+        # rows are ordered and limited on the order_by value alone, only the kept rows are decoded in full
+        attrs = () if query.order_by is None else (query.order_by,)
+        arranged = query.arrange({**self.table.content(row, attrs), _ROW: row}
+                                 for row in self.table.matching_rows(query.filters))
+        return [self.table.content(content[_ROW]) for content in arranged]
+
+    def query(self, query: Query, lazy: bool = False, include: Iterable[str] = ()) -> List[TModel]:
+        fdk_ids = [content['fdk_id'] for content in self._query_contents(query)]
+        return self.by_ids(fdk_ids, lazy, include)
+
+    def select(self, query: Query) -> List[Dict[str, Any]]:
+        return [query.project(content) for content in self._query_contents(query)]
+
+
+def columnar_gateway(path: Path) -> IFdkGateway:
+    catalog = ColumnarCatalog(path)
+    return FdkGateway(
+        objects=ColumnarModelGateway[FdkObject](catalog.objects),
+        property_sets=ColumnarModelGateway[PropertySet](catalog.property_sets),
+        properties=ColumnarModelGateway[Property](catalog.properties, name_column='name_clean'),
+        index=catalog.index
+    )
+
+
+def export_catalog(path: Path, gateway: JsonFdkGateway) -> Path:
+    return write_catalog(path, gateway.objects(), gateway.psets(), gateway.properties())
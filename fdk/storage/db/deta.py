@@ -5,23 +5,27 @@ from fdk.storage.builder.json import (AJsonFdkObjectBuilder,
 from fdk.storage.builder.builder import IBuilder, TModel
 from fdk.models.models import (AFdkModel, FdkObject, Property, PropertySet,
                                are_models, is_model)
-from deta import _Base, Deta
-import dotenv as env
-from typing import (Any, Dict, Generic, Iterable, List, Optional, Protocol,
-                    Set, Tuple)
+from fdk.models.lazy import LazyModels
+from fdk.storage.query import CONTAINS, EQ, IN, PREFIX, Query, QueryPlan
+from fdk.metrics import COUNT_BUCKETS, MetricsRegistry, metrics
+from fdk.storage.batching import BatchPolicy, BatchWriter
+from dataclasses import replace
+from functools import lru_cache, wraps
+import json
+from typing import (Any, Callable, Dict, Generic, Iterable, List, Optional,
+                    Protocol, Set, Tuple)
 from abc import ABC
 import os
 
 
-env.load_dotenv('.env')
-
-
 _KEY = 'key'
 _NAME = 'name'
 _CONTENT = 'content'
 _NAME_CLEAN = 'name_clean'
 _OBJECT_IDS = 'object_ids'
 _PSET_IDS = 'pset_ids'
+_MAX_OR_QUERIES = 25
+_QUERY_SUFFIX = {EQ: '', PREFIX: '?pfx', CONTAINS: '?contains'}
 
 
 def _get_key(content: Dict[str, Any]) -> str:
@@ -38,11 +42,37 @@ def _as_db(model: AFdkModel) -> Dict[str, Any]:
     for attr, value in model.as_ref_dict().items():
         if is_model(value):
             db_attr[attr] = value.fdk_id
+        elif isinstance(value, LazyModels):
+            db_attr[attr] = value.fdk_ids
         elif are_models(value):
             db_attr[attr] = [model.fdk_id for model in value]
     return db_attr
 
 
+def _query_plan(query: Query) -> QueryPlan:
+    native: List[Dict[str, Any]] = [{}]
+    local = []
+    for query_filter in query.filters:
+        attr, value = query_filter.attr, query_filter.value
+        if query_filter.operator == IN:
+            if len(value) == 0:
+                return QueryPlan(native=[], local=query)
+            if len(native) * len(value) > _MAX_OR_QUERIES or any(attr in sub_query for sub_query in native):
+                local.append(query_filter)
+                continue
+            native = [{**sub_query, attr: item} for sub_query in native for item in value]
+            continue
+        key = f'{attr}{_QUERY_SUFFIX[query_filter.operator]}'
+        if any(key in sub_query for sub_query in native):
+            local.append(query_filter)
+            continue
+        for sub_query in native:
+            sub_query[key] = value
+    local_query = replace(query, filters=tuple(local))
+    limit = query.limit if len(local) == 0 and query.order_by is None else None
+    return QueryPlan(native, local_query, limit)
+
+
 def _as_build_dict(content: Dict[str, Any]) -> Dict[str, Any]:
     # model_content = content.pop(_CONTENT)
     # content.update(model_content)
@@ -54,6 +84,8 @@ class IDetaBuilder(IBuilder[TModel], Protocol[TModel]):
 
 
 class PropertyBuilder(AJsonPropertyBuilder, IDetaBuilder[Property]):
+    # every read builds its own instances, the gateway attaches references to them
+    cache_models = False
 
     @ classmethod
     def attribute_map(cls) -> Dict[str, str]:
@@ -68,6 +100,7 @@ class PropertyBuilder(AJsonPropertyBuilder, IDetaBuilder[Property]):
 
 
 class PropertySetBuilder(IDetaBuilder[PropertySet], AJsonPropertySetBuilder):
+    cache_models = False
 
     @ classmethod
     def attribute_map(cls) -> Dict[str, str]:
@@ -84,6 +117,7 @@ class PropertySetBuilder(IDetaBuilder[PropertySet], AJsonPropertySetBuilder):
 
 
 class FdkObjectBuilder(IDetaBuilder[FdkObject], AJsonFdkObjectBuilder):
+    cache_models = False
 
     @ classmethod
     def attribute_map(cls) -> Dict[str, str]:
@@ -100,19 +134,130 @@ class FdkObjectBuilder(IDetaBuilder[FdkObject], AJsonFdkObjectBuilder):
         return super().build(_as_build_dict(content))
 
 
-def _get_deta_db(name: str) -> _Base:
+class IDetaBase(Protocol):
+
+    def get(self, key: str) -> Any:
+        ...
+
+    def put(self, data: Dict[str, Any]) -> Any:
+        ...
+
+    def put_many(self, items: List[Dict[str, Any]]) -> Any:
+        ...
+
+    def delete(self, key: str) -> Any:
+        ...
+
+    def fetch(self, query: Any = None, limit: int = 1000, last: Optional[str] = None) -> Any:
+        ...
+
+
+DbFactory = Callable[[str], IDetaBase]
+
+
+def _size(content: Any) -> int:
+    return len(json.dumps(content, default=str))
+
+
+class _MeasuredBase(IDetaBase):
+
+    def __init__(self, name: str, db_factory: DbFactory, registry: MetricsRegistry = metrics) -> None:
+        self.name = name
+        self.db_factory = db_factory
+        self.metrics = registry
+        self._db: Optional[IDetaBase] = None
+
+    @property
+    def db(self) -> IDetaBase:
+        # the backend client is created on first use, not when the gateway is built
+        if self._db is None:
+            self._db = self.db_factory(self.name)
+        return self._db
+
+    def _record(self, operation: str, sent: Any = None, received: Any = None) -> None:
+        prefix = f'deta.{self.name}'
+        self.metrics.increment(f'{prefix}.round_trips')
+        self.metrics.increment(f'{prefix}.{operation}.calls')
+        # serializing every payload again costs as much as the request itself, so byte counts are opt-in
+        if not self.metrics.enabled or not self.metrics.count_bytes:
+            return
+        if sent is not None:
+            self.metrics.increment(f'{prefix}.bytes_sent', _size(sent))
+        if received is not None:
+            self.metrics.increment(f'{prefix}.bytes_received', _size(received))
+
+    def get(self, key: str) -> Any:
+        with self.metrics.timer(f'deta.{self.name}.get'):
+            content = self.db.get(key)
+        self._record('get', received=content)
+        return content
+
+    def put(self, data: Dict[str, Any]) -> Any:
+        with self.metrics.timer(f'deta.{self.name}.put'):
+            result = self.db.put(data)
+        self._record('put', sent=data)
+        return result
+
+    def put_many(self, items: List[Dict[str, Any]]) -> Any:
+        with self.metrics.timer(f'deta.{self.name}.put_many'):
+            result = self.db.put_many(items)
+        self._record('put_many', sent=items)
+        self.metrics.observe(f'deta.{self.name}.batch_items', len(items), COUNT_BUCKETS)
+        return result
+
+    def delete(self, key: str) -> Any:
+        with self.metrics.timer(f'deta.{self.name}.delete'):
+            result = self.db.delete(key)
+        self._record('delete')
+        return result
+
+    def fetch(self, query: Any = None, limit: int = 1000, last: Optional[str] = None) -> Any:
+        with self.metrics.timer(f'deta.{self.name}.fetch'):
+            response = self.db.fetch(query, limit=limit, last=last)
+        self._record('fetch', sent=query, received=response.items)
+        self.metrics.observe(f'deta.{self.name}.fetch_items', len(response.items), COUNT_BUCKETS)
+        return response
+
+
+def _timed(operation: str):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self: 'AFdkGateway', *args, **kwargs):
+            with self.metrics.timer(f'gateway.{self.db_name}.{operation}'):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@lru_cache(maxsize=None)
+def _get_deta() -> Any:
+    import dotenv as env
+    from deta import Deta
+
+    env.load_dotenv('.env')
     deta_key = os.getenv('DETA_KEY')
     if deta_key is None:
         raise EnvironmentError('DETA_KEY not exists')
-    return Deta(project_key=deta_key).Base(name=name)
+    return Deta(project_key=deta_key)
+
+
+def _get_deta_db(name: str) -> IDetaBase:
+    return _get_deta().Base(name=name)
 
 
 class AFdkGateway(ABC, Generic[TModel]):
 
     def __init__(self, db_name: str, builder: IDetaBuilder[TModel],
-                 gateway_map: Dict[str, 'AFdkGateway'], fetch_limit: int = 1000) -> None:
+                 gateway_map: Dict[str, 'AFdkGateway'], fetch_limit: int = 1000,
+                 db_factory: Optional[DbFactory] = None, batch_policy: Optional[BatchPolicy] = None,
+                 registry: Optional[MetricsRegistry] = None) -> None:
         super().__init__()
-        self.db = _get_deta_db(db_name)
+        self.db_name = db_name
+        self.db_factory = db_factory or _get_deta_db
+        self.metrics = registry or metrics
+        self.db = _MeasuredBase(db_name, self.db_factory, self.metrics)
+        self.batches = BatchWriter(self.db.put_many, batch_policy or BatchPolicy(), name=f'batch.{db_name}',
+                                   registry=self.metrics)
         self.builder = builder
         self.gateways = gateway_map
         self.fetch_limit = fetch_limit
@@ -121,15 +266,25 @@ class AFdkGateway(ABC, Generic[TModel]):
         content = self.db.get(fdk_id)
         return content if isinstance(content, dict) else None
 
+    @_timed('create_or_update')
     def create_or_update(self, model: TModel) -> None:
         self.db.put(self._as_db_dict(model))
 
+    @_timed('create_or_update_many')
     def create_or_update_many(self, models: Iterable[TModel]) -> None:
-        self.db.put_many([self._as_db_dict(model) for model in models])
+        with self.metrics.timer(f'gateway.{self.db_name}.serialize'):
+            items = [self._as_db_dict(model) for model in models]
+        self.batches.write(items)
 
     def _as_db_dict(self, model: TModel) -> Dict[str, Any]:
         return _as_db(model)
 
+    @_timed('delete_many')
+    def delete_many(self, fdk_ids: Iterable[str]) -> None:
+        for fdk_id in dict.fromkeys(fdk_ids):
+            self.db.delete(fdk_id)
+
+    @_timed('delete_all')
     def delete_all(self) -> None:
         model_ids = self.all_ids()
         while len(model_ids) > 0:
@@ -137,97 +292,169 @@ class AFdkGateway(ABC, Generic[TModel]):
                 self.db.delete(model_id)
             model_ids = self.all_ids()
 
+    @_timed('all_ids')
     def all_ids(self) -> List[str]:
         contents = self.db.fetch(limit=self.fetch_limit).items
         return [_get_key(content) for content in contents]
 
-    def by_id(self, fdk_id: str) -> Optional[TModel]:
-        content = self._get_by(fdk_id)
-        if content is None:
-            return None
-        content = self._with_reference_content(content)
-        return self.builder.build(content)
-
-    def _with_reference_content(self, content: Dict[str, Any]) -> Dict[str, Any]:
-        for attr, gateway in self.gateways.items():
-            ref_content = content.get(attr)
-            if ref_content is None:
-                raise AttributeError(f'{attr} does not exist in {content}')
-            content[attr] = gateway.content_by_ids(ref_content)
-        return content
+    @_timed('by_id')
+    def by_id(self, fdk_id: str, lazy: bool = False, include: Iterable[str] = ()) -> Optional[TModel]:
+        models = self.by_ids([fdk_id], lazy, include)
+        return models[0] if len(models) > 0 else None
 
     def content_by_ids(self, fdk_ids: Iterable[str]) -> List[Dict[str, Any]]:
-        models = [self._get_by(fdk_id) for fdk_id in fdk_ids]
+        models = [self._get_by(fdk_id) for fdk_id in dict.fromkeys(fdk_ids)]
         return [model for model in models if model is not None]
 
-    def by_ids(self, fdk_ids: Iterable[str]) -> List[TModel]:
-        models = [self.by_id(fdk_id) for fdk_id in fdk_ids]
-        return [model for model in models if model is not None]
+    @_timed('by_ids')
+    def by_ids(self, fdk_ids: Iterable[str], lazy: bool = False, include: Iterable[str] = ()) -> List[TModel]:
+        return self._build_many(self.content_by_ids(fdk_ids), lazy, include)
 
+    @_timed('all_names')
     def all_names(self) -> Set[str]:
         contents = self.db.fetch(limit=self.fetch_limit).items
         return set([_get_name(content) for content in contents])
 
-    def by_name(self, name: str) -> List[TModel]:
+    @_timed('by_name')
+    def by_name(self, name: str, lazy: bool = False, include: Iterable[str] = ()) -> List[TModel]:
         contents = self.db.fetch({_NAME: name}, limit=self.fetch_limit).items
-        return self.builder.build_many(contents)
+        return self._build_many(contents, lazy, include)
 
-    def all_models(self) -> List[TModel]:
+    @_timed('all_models')
+    def all_models(self, lazy: bool = False, include: Iterable[str] = ()) -> List[TModel]:
         contents = self.db.fetch(limit=self.fetch_limit).items
-        return self.builder.build_many(contents)
+        return self._build_many(contents, lazy, include)
+
+    def _fetch_all(self, query: Optional[List[Dict[str, Any]]] = None,
+                   limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        contents: List[Dict[str, Any]] = []
+        last = None
+        while True:
+            page_limit = self.fetch_limit if limit is None else min(self.fetch_limit, limit - len(contents))
+            response = self.db.fetch(query, limit=page_limit, last=last)
+            contents.extend(response.items)
+            last = response.last
+            if last is None or (limit is not None and len(contents) >= limit):
+                return contents
+
+    def _query_contents(self, query: Query) -> List[Dict[str, Any]]:
+        plan = _query_plan(query)
+        if len(plan.native) == 0:
+            return []
+        native = plan.native if plan.native != [{}] else None
+        contents = self._fetch_all(native, plan.limit)
+        result = plan.local.apply(contents)
+        self.metrics.increment(f'gateway.{self.db_name}.query.fetched', len(contents))
+        self.metrics.increment(f'gateway.{self.db_name}.query.returned', len(result))
+        return result
+
+    @_timed('query')
+    def query(self, query: Query, lazy: bool = False, include: Iterable[str] = ()) -> List[TModel]:
+        return self._build_many(self._query_contents(query), lazy, include)
+
+    @_timed('select')
+    def select(self, query: Query) -> List[Dict[str, Any]]:
+        return [query.project(content) for content in self._query_contents(query)]
+
+    def _included(self, include: Iterable[str]) -> Dict[str, List[str]]:
+        included: Dict[str, List[str]] = {}
+        for path in include:
+            attr, _, nested = path.partition('.')
+            if attr not in self.gateways:
+                raise AttributeError(f'{attr} is not a reference of {self.db_name}')
+            included.setdefault(attr, [])
+            if nested != '':
+                included[attr].append(nested)
+        return included
+
+    def _load_references(self, contents: List[Dict[str, Any]], lazy: bool,
+                         included: Dict[str, List[str]]) -> Dict[str, Dict[str, AFdkModel]]:
+        references = {}
+        for attr, gateway in self.gateways.items():
+            if lazy and attr not in included:
+                continue
+            ref_ids = [ref_id for content in contents for ref_id in content.get(attr) or []]
+            models = gateway.by_ids(ref_ids, lazy, included.get(attr, []))
+            references[attr] = {model.fdk_id: model for model in models}
+        return references
+
+    def _lazy_references(self, gateway: 'AFdkGateway', ref_ids: List[str]) -> LazyModels:
+        def _load() -> List[AFdkModel]:
+            self.metrics.increment(f'gateway.{gateway.db_name}.lazy_loads')
+            return gateway.by_ids(ref_ids, lazy=True)
+        return LazyModels(loader=_load, fdk_ids=ref_ids)
+
+    def _build_many(self, contents: List[Dict[str, Any]], lazy: bool = False,
+                    include: Iterable[str] = ()) -> List[TModel]:
+        included = self._included(include)
+        references = self._load_references(contents, lazy, included)
+        models = []
+        with self.metrics.timer(f'gateway.{self.db_name}.build'):
+            for content in contents:
+                ref_ids = {attr: content.get(attr) or [] for attr in self.gateways}
+                content.update({attr: [] for attr in self.gateways})
+                model = self.builder.build(content)
+                for attr, gateway in self.gateways.items():
+                    if attr in references:
+                        loaded = references[attr]
+                        value = [loaded[ref_id] for ref_id in ref_ids[attr] if ref_id in loaded]
+                    else:
+                        value = self._lazy_references(gateway, ref_ids[attr])
+                    setattr(model, attr, value)
+                models.append(model)
+        return models
 
 
 class FdkPropertyGateway(AFdkGateway[Property]):
 
     def __init__(self, builder: Optional[IDetaBuilder[Property]] = None,
-                 gateway_map: Optional[Dict[str, 'AFdkGateway']] = None) -> None:
-        super().__init__('properties', builder or PropertyBuilder(), gateway_map or {}, fetch_limit=5000)
-
-    def _as_db_dict(self, model: Property) -> Dict[str, Any]:
-        db_dict = super()._as_db_dict(model)
-        db_dict[_OBJECT_IDS] = db_dict[_CONTENT].pop(_OBJECT_IDS)
-        db_dict[_PSET_IDS] = db_dict[_CONTENT].pop(_PSET_IDS)
-        db_dict[_NAME_CLEAN] = db_dict[_CONTENT].pop(_NAME_CLEAN)
-        return db_dict
+                 gateway_map: Optional[Dict[str, 'AFdkGateway']] = None,
+                 db_factory: Optional[DbFactory] = None, batch_policy: Optional[BatchPolicy] = None,
+                 registry: Optional[MetricsRegistry] = None) -> None:
+        super().__init__('properties', builder or PropertyBuilder(), gateway_map or {}, fetch_limit=5000,
+                         db_factory=db_factory, batch_policy=batch_policy, registry=registry)
 
     def all_names(self) -> Set[str]:
         contents = self.db.fetch(limit=self.fetch_limit).items
         return set([_get_name(content, _NAME_CLEAN) for content in contents])
 
-    def by_name(self, name: str) -> List[Property]:
+    def by_name(self, name: str, lazy: bool = False, include: Iterable[str] = ()) -> List[Property]:
         contents = self.db.fetch(query={_NAME_CLEAN: name}, limit=self.fetch_limit).items
-        return self.builder.build_many(contents)
+        return self._build_many(contents, lazy, include)
 
 
 class FdkPropertySetGateway(AFdkGateway[PropertySet]):
 
     @ classmethod
-    def gaeteways_map(cls) -> Dict[str, AFdkGateway]:
+    def gaeteways_map(cls, db_factory: Optional[DbFactory] = None,
+                      registry: Optional[MetricsRegistry] = None) -> Dict[str, AFdkGateway]:
         return {
-            'properties': FdkPropertyGateway(),
+            'properties': FdkPropertyGateway(db_factory=db_factory, registry=registry),
         }
 
     def __init__(self, builder: Optional[IDetaBuilder[PropertySet]] = None,
-                 gateway_map: Optional[Dict[str, 'AFdkGateway']] = None) -> None:
+                 gateway_map: Optional[Dict[str, 'AFdkGateway']] = None,
+                 db_factory: Optional[DbFactory] = None, batch_policy: Optional[BatchPolicy] = None,
+                 registry: Optional[MetricsRegistry] = None) -> None:
         super().__init__('property_sets', builder or PropertySetBuilder(),
-                         gateway_map or self.gaeteways_map())
-
-    def _as_db_dict(self, model: PropertySet) -> Dict[str, Any]:
-        db_dict = super()._as_db_dict(model)
-        db_dict[_OBJECT_IDS] = db_dict[_CONTENT].pop(_OBJECT_IDS)
-        return db_dict
+                         gateway_map or self.gaeteways_map(db_factory, registry), db_factory=db_factory,
+                         batch_policy=batch_policy, registry=registry)
 
 
 class FdkObjectGateway(AFdkGateway[FdkObject]):
 
     @ classmethod
-    def gaeteways_map(cls) -> Dict[str, AFdkGateway]:
+    def gaeteways_map(cls, db_factory: Optional[DbFactory] = None,
+                      registry: Optional[MetricsRegistry] = None) -> Dict[str, AFdkGateway]:
         return {
-            'properties': FdkPropertyGateway(),
-            'property_sets': FdkPropertySetGateway()
+            'properties': FdkPropertyGateway(db_factory=db_factory, registry=registry),
+            'property_sets': FdkPropertySetGateway(db_factory=db_factory, registry=registry)
         }
 
     def __init__(self, builder: Optional[IDetaBuilder[FdkObject]] = None,
-                 gateway_map: Optional[Dict[str, 'AFdkGateway']] = None) -> None:
+                 gateway_map: Optional[Dict[str, 'AFdkGateway']] = None,
+                 db_factory: Optional[DbFactory] = None, batch_policy: Optional[BatchPolicy] = None,
+                 registry: Optional[MetricsRegistry] = None) -> None:
         super().__init__('fdk_objects', builder or FdkObjectBuilder(),
-                         gateway_map or self.gaeteways_map(), fetch_limit=3000)
+                         gateway_map or self.gaeteways_map(db_factory, registry), fetch_limit=3000,
+                         db_factory=db_factory, batch_policy=batch_policy, registry=registry)
@@ -0,0 +1,231 @@
+import hashlib
+import json
+from typing import AbstractSet, Any, Dict, Iterable, List, Optional, Set, Type
+
+from fdk.metrics import metrics
+from fdk.models.lazy import is_loaded, reference_ids
+from fdk.models.models import AFdkModel, FdkObject, Property, PropertySet
+from fdk.storage.batching import BatchWriter
+from fdk.storage.db.deta import DbFactory, FdkObjectBuilder, IDetaBase, _get_deta_db
+
+DOCUMENT_VERSION = 1
+
+_KEY = 'key'
+_FDK_ID = 'fdk_id'
+_VERSION = 'version'
+_DIGEST = 'digest'
+_PROPERTIES = 'properties'
+_PROPERTY_SETS = 'property_sets'
+_PSET_IDS = 'pset_ids'
+_PROPERTY_IDS = 'property_ids'
+_BACK_LINKS = ('object_ids', 'pset_ids')
+_MAX_OR_QUERIES = 25
+_TYPES: List[Type[AFdkModel]] = [FdkObject, PropertySet, Property]
+
+
+def _model_type(model_type: Type[AFdkModel]) -> Type[AFdkModel]:
+    for known in _TYPES:
+        if issubclass(model_type, known):
+            return known
+    raise TypeError(f'{model_type.__name__} is not a FDK model type')
+
+
+def _embedded(model: AFdkModel) -> Dict[str, Any]:
+    # back-links of shared models would repeat the whole catalog in every document
+    content = model.as_dict(with_reference=False)
+    for attr in _BACK_LINKS:
+        content.pop(attr, None)
+    return content
+
+
+def _embedded_pset(model: PropertySet, content: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    pset = _embedded(model)
+    embedded = {} if content is None else {prop[_FDK_ID]: prop for prop in content[_PROPERTIES]}
+    property_ids = reference_ids(model.properties)
+    if not is_loaded(model.properties) and all(fdk_id in embedded for fdk_id in property_ids):
+        pset[_PROPERTIES] = [embedded[fdk_id] for fdk_id in property_ids]
+    else:
+        pset[_PROPERTIES] = [_embedded(prop) for prop in model.properties]
+    return pset
+
+
+def _seal(document: Dict[str, Any]) -> Dict[str, Any]:
+    psets = document[_PROPERTY_SETS]
+    document[_PSET_IDS] = [pset[_FDK_ID] for pset in psets]
+    document[_PROPERTY_IDS] = sorted(set(prop[_FDK_ID] for prop in document[_PROPERTIES]) |
+                                     set(prop[_FDK_ID] for pset in psets for prop in pset[_PROPERTIES]))
+    content = {attr: value for attr, value in document.items() if attr not in (_KEY, _VERSION, _DIGEST)}
+    document[_VERSION] = DOCUMENT_VERSION
+    document[_DIGEST] = hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return document
+
+
+def object_document(model: FdkObject) -> Dict[str, Any]:
+    document = _embedded(model)
+    document[_KEY] = model.fdk_id
+    document[_PROPERTIES] = [_embedded(prop) for prop in model.properties]
+    document[_PROPERTY_SETS] = [_embedded_pset(pset) for pset in model.property_sets]
+    return _seal(document)
+
+
+def patch_document(document: Dict[str, Any], psets: Dict[str, PropertySet], properties: Dict[str, Property],
+                   removed_psets: AbstractSet[str] = frozenset(),
+                   removed_properties: AbstractSet[str] = frozenset()) -> bool:
+    old_digest = document.get(_DIGEST)
+    document[_PROPERTY_SETS] = [
+        _embedded_pset(psets[pset[_FDK_ID]], pset) if pset[_FDK_ID] in psets else pset
+        for pset in document[_PROPERTY_SETS] if pset[_FDK_ID] not in removed_psets
+    ]
+    for container in [document] + document[_PROPERTY_SETS]:
+        container[_PROPERTIES] = [
+            _embedded(properties[prop[_FDK_ID]]) if prop[_FDK_ID] in properties else prop
+            for prop in container[_PROPERTIES] if prop[_FDK_ID] not in removed_properties
+        ]
+    return _seal(document)[_DIGEST] != old_digest
+
+
+def document_model(document: Dict[str, Any]) -> FdkObject:
+    return FdkObjectBuilder().build(document)
+
+
+class DetaDocumentStore:
+
+    def __init__(self, db_name: str = 'fdk_documents', db_factory: Optional[DbFactory] = None) -> None:
+        self.db_name = db_name
+        self.db_factory = db_factory or _get_deta_db
+        self._db: Optional[IDetaBase] = None
+        self._batches: Optional[BatchWriter] = None
+
+    @property
+    def db(self) -> IDetaBase:
+        if self._db is None:
+            self._db = self.db_factory(self.db_name)
+        return self._db
+
+    @property
+    def batches(self) -> BatchWriter:
+        if self._batches is None:
+            self._batches = BatchWriter(self.db.put_many, name=f'batch.{self.db_name}')
+        return self._batches
+
+    def document(self, fdk_id: str) -> Optional[Dict[str, Any]]:
+        content = self.db.get(fdk_id)
+        if not isinstance(content, dict) or content.get(_VERSION) != DOCUMENT_VERSION:
+            return None
+        return content
+
+    def object_detail(self, fdk_id: str) -> Optional[FdkObject]:
+        document = self.document(fdk_id)
+        return None if document is None else document_model(document)
+
+    def documents(self, fdk_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        documents = [self.document(fdk_id) for fdk_id in dict.fromkeys(fdk_ids)]
+        return [document for document in documents if document is not None]
+
+    def _fetch(self, query: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        contents: List[Dict[str, Any]] = []
+        last = None
+        while True:
+            response = self.db.fetch(query, limit=1000, last=last)
+            contents.extend(response.items)
+            last = response.last
+            if last is None:
+                return [content for content in contents if content.get(_VERSION) == DOCUMENT_VERSION]
+
+    def all_documents(self) -> List[Dict[str, Any]]:
+        return self._fetch()
+
+    def referencing(self, pset_ids: Iterable[str] = (), property_ids: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        queries = [{f'{_PSET_IDS}?contains': fdk_id} for fdk_id in pset_ids]
+        queries.extend({f'{_PROPERTY_IDS}?contains': fdk_id} for fdk_id in property_ids)
+        documents: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(queries), _MAX_OR_QUERIES):
+            for document in self._fetch(queries[start:start + _MAX_OR_QUERIES]):
+                documents[document[_KEY]] = document
+        return list(documents.values())
+
+    def write(self, documents: List[Dict[str, Any]]) -> None:
+        self.batches.write(documents)
+
+    def delete(self, fdk_ids: Iterable[str]) -> None:
+        for fdk_id in dict.fromkeys(fdk_ids):
+            self.db.delete(fdk_id)
+
+    def clear(self) -> None:
+        while True:
+            keys = [content[_KEY] for content in self.db.fetch(limit=1000).items]
+            if len(keys) == 0:
+                return
+            self.delete(keys)
+
+
+class DocumentListener:
+
+    def __init__(self, store: DetaDocumentStore) -> None:
+        self.store = store
+        self._saved: Dict[Type[AFdkModel], Dict[str, Any]] = {model_type: {} for model_type in _TYPES}
+        self._deleted: Dict[Type[AFdkModel], Set[str]] = {model_type: set() for model_type in _TYPES}
+        self._cleared: Set[Type[AFdkModel]] = set()
+        self._empty = False
+
+    def saved(self, models: Iterable[AFdkModel]) -> None:
+        for model in models:
+            model_type = _model_type(type(model))
+            self._deleted[model_type].discard(model.fdk_id)
+            self._saved[model_type][model.fdk_id] = model
+
+    def deleted(self, model_type: Type[AFdkModel], fdk_ids: Iterable[str]) -> None:
+        model_type = _model_type(model_type)
+        for fdk_id in fdk_ids:
+            self._saved[model_type].pop(fdk_id, None)
+            self._deleted[model_type].add(fdk_id)
+
+    def deleted_all(self, model_type: Type[AFdkModel]) -> None:
+        model_type = _model_type(model_type)
+        self._saved[model_type].clear()
+        self._deleted[model_type].clear()
+        self._cleared.add(model_type)
+
+    def _removed(self, model_type: Type[AFdkModel], documents: List[Dict[str, Any]], attr: str) -> Set[str]:
+        if model_type not in self._cleared:
+            return self._deleted[model_type]
+        return set(fdk_id for document in documents for fdk_id in document[attr]) - set(self._saved[model_type])
+
+    def _affected(self) -> List[Dict[str, Any]]:
+        # documents list the ids they embed, so one contains-query finds every document a shared model touches
+        if len(self._cleared - {FdkObject}) > 0:
+            documents = self.store.all_documents()
+        else:
+            documents = self.store.referencing(
+                sorted(self._deleted[PropertySet] | set(self._saved[PropertySet])),
+                sorted(self._deleted[Property] | set(self._saved[Property])))
+        skipped = set(self._saved[FdkObject]) | self._deleted[FdkObject]
+        return [document for document in documents if document[_KEY] not in skipped]
+
+    def flush(self) -> None:
+        if len(self._cleared) == 0 and not any(len(fdk_ids) > 0 for fdk_ids in self._deleted.values()) and \
+                not any(len(models) > 0 for models in self._saved.values()):
+            return
+        with metrics.timer('documents.flush'):
+            if FdkObject in self._cleared:
+                self.store.clear()
+                self._empty = True
+            # after the objects are cleared there is nothing to patch until the saved objects are built again
+            documents = [] if self._empty else self._affected()
+            if not self._empty:
+                self.store.delete(sorted(self._deleted[FdkObject]))
+            removed_psets = self._removed(PropertySet, documents, _PSET_IDS)
+            removed_properties = self._removed(Property, documents, _PROPERTY_IDS)
+            patched = [document for document in documents
+                       if patch_document(document, self._saved[PropertySet], self._saved[Property],
+                                         removed_psets, removed_properties)]
+            built = [object_document(model) for model in self._saved[FdkObject].values()]
+            self.store.write(built + patched)
+            self._empty = self._empty and len(built) == 0
+        metrics.increment('documents.built', len(built))
+        metrics.increment('documents.patched', len(patched))
+        metrics.increment('documents.deleted', len(self._deleted[FdkObject]))
+        for model_type in _TYPES:
+            self._saved[model_type].clear()
+            self._deleted[model_type].clear()
+        self._cleared.clear()
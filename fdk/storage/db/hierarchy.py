@@ -0,0 +1,153 @@
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from fdk.models.models import AFdkModel
+from fdk.storage.batching import BatchWriter
+from fdk.storage.db.deta import DbFactory, IDetaBase, _get_deta_db
+from fdk.storage.index import HierarchyIndex, id_key, keyset_page
+from fdk.storage.sections import OBJECTS, PROPERTIES, PSETS
+
+_KEY = 'key'
+_TREE = 'tree'
+_IDS = 'ids'
+_CHUNK_SIZE = 1000
+
+
+def _department_key(department: str) -> str:
+    return f'{_TREE}:{department}'
+
+
+def _chunk_key(section: str, chunk: int) -> str:
+    return f'{_IDS}:{section}:{chunk}'
+
+
+class DetaHierarchyStore:
+
+    def __init__(self, db_name: str = 'fdk_index', db_factory: Optional[DbFactory] = None,
+                 chunk_size: int = _CHUNK_SIZE) -> None:
+        self.db_name = db_name
+        self.db_factory = db_factory or _get_deta_db
+        self.chunk_size = chunk_size
+        self._db: Optional[IDetaBase] = None
+        self._batches: Optional[BatchWriter] = None
+
+    @property
+    def db(self) -> IDetaBase:
+        if self._db is None:
+            self._db = self.db_factory(self.db_name)
+        return self._db
+
+    @property
+    def batches(self) -> BatchWriter:
+        if self._batches is None:
+            self._batches = BatchWriter(self.db.put_many, name=f'batch.{self.db_name}')
+        return self._batches
+
+    def _value(self, key: str) -> Optional[Any]:
+        content = self.db.get(key)
+        return content.get('value') if isinstance(content, dict) else None
+
+    def departments(self) -> Dict[str, int]:
+        tree = self._value(_TREE) or {}
+        return {department: sum(groups.values()) for department, groups in sorted(tree.items())}
+
+    def groups(self, department: str) -> Dict[str, int]:
+        tree = self._value(_TREE) or {}
+        return dict(sorted(tree.get(department, {}).items()))
+
+    def group_ids(self, department: str, group: str) -> List[str]:
+        return (self._value(_department_key(department)) or {}).get(group, [])
+
+    def objects(self, department: str, group: str, after: Optional[str] = None,
+                limit: int = 50) -> Tuple[List[str], Optional[str]]:
+        return keyset_page(self.group_ids(department, group), OBJECTS, after, limit)
+
+    def page(self, section: str, after: Optional[str] = None, limit: int = 50) -> Tuple[List[str], Optional[str]]:
+        # the header holds the first id of every chunk, so a page costs the header and one or two chunks
+        header = self._value(f'{_IDS}:{section}')
+        if header is None or len(header['first']) == 0:
+            return [], None
+        first, chunk = header['first'], 0
+        if after is not None:
+            chunk = max(0, bisect_right(first, id_key(section, after), key=lambda fdk_id: id_key(section, fdk_id)) - 1)
+        fdk_ids: List[str] = []
+        page: List[str] = []
+        next_after = None
+        while chunk < len(first):
+            fdk_ids.extend(self._value(_chunk_key(section, chunk)) or [])
+            chunk += 1
+            page, next_after = keyset_page(fdk_ids, section, after, limit)
+            if len(page) >= limit:
+                break
+        if next_after is None and chunk < len(first) and len(page) > 0:
+            next_after = page[-1]
+        return page, next_after
+
+    def load(self) -> HierarchyIndex:
+        state: Dict[str, Any] = {OBJECTS: {}, PSETS: [], PROPERTIES: []}
+        last = None
+        while True:
+            response = self.db.fetch({f'{_KEY}?pfx': f'{_TREE}:'}, limit=1000, last=last)
+            for content in response.items:
+                state[OBJECTS][content[_KEY].split(':', 1)[1]] = content['value']
+            last = response.last
+            if last is None:
+                break
+        for section in (PSETS, PROPERTIES):
+            header = self._value(f'{_IDS}:{section}') or {'first': []}
+            for chunk in range(len(header['first'])):
+                state[section].extend(self._value(_chunk_key(section, chunk)) or [])
+        return HierarchyIndex.from_state(state)
+
+    def save(self, index: HierarchyIndex) -> None:
+        items: List[Dict[str, Any]] = []
+        deleted: List[str] = []
+        if len(index.dirty_departments) > 0:
+            items.append({_KEY: _TREE, 'value': {department: index.groups(department)
+                                                 for department in index.departments()}})
+        for department in index.dirty_departments:
+            groups = index.groups(department)
+            if len(groups) == 0:
+                deleted.append(_department_key(department))
+                continue
+            items.append({_KEY: _department_key(department),
+                          'value': {group: index.group_ids(department, group) for group in groups}})
+        for section in index.dirty_sections:
+            old_header = self._value(f'{_IDS}:{section}') or {'first': []}
+            fdk_ids = index.ids(section)
+            chunks = [fdk_ids[start:start + self.chunk_size] for start in range(0, len(fdk_ids), self.chunk_size)]
+            for chunk, chunk_ids in enumerate(chunks):
+                items.append({_KEY: _chunk_key(section, chunk), 'value': chunk_ids})
+            items.append({_KEY: f'{_IDS}:{section}', 'value': {'first': [chunk_ids[0] for chunk_ids in chunks],
+                                                                'count': len(fdk_ids)}})
+            deleted.extend(_chunk_key(section, chunk) for chunk in range(len(chunks), len(old_header['first'])))
+        self.batches.write(items)
+        for key in deleted:
+            self.db.delete(key)
+        index.mark_clean()
+
+
+class HierarchyListener:
+
+    def __init__(self, store: DetaHierarchyStore) -> None:
+        self.store = store
+        self._index: Optional[HierarchyIndex] = None
+
+    @property
+    def index(self) -> HierarchyIndex:
+        if self._index is None:
+            self._index = self.store.load()
+        return self._index
+
+    def saved(self, models: Iterable[AFdkModel]) -> None:
+        self.index.upsert(models)
+
+    def deleted(self, model_type: Type[AFdkModel], fdk_ids: Iterable[str]) -> None:
+        self.index.remove(model_type, fdk_ids)
+
+    def deleted_all(self, model_type: Type[AFdkModel]) -> None:
+        self.index.clear(model_type)
+
+    def flush(self) -> None:
+        if len(self.index.dirty_sections) > 0 or len(self.index.dirty_departments) > 0:
+            self.store.save(self.index)
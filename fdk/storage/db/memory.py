@@ -0,0 +1,150 @@
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+_KEY = 'key'
+_MAX_PUT_MANY = 25
+_OPERATORS = ('ne', 'lt', 'gt', 'lte', 'gte', 'pfx', 'r', 'contains', 'not_contains')
+
+
+@dataclass
+class FetchResponse:
+    count: int = 0
+    last: Optional[str] = None
+    items: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _split_query_key(query_key: str) -> Tuple[str, str]:
+    attr, _, operator = query_key.partition('?')
+    if operator != '' and operator not in _OPERATORS:
+        raise ValueError(f'Unknown query operator "{operator}" in "{query_key}"')
+    return attr, operator
+
+
+def _value_of(item: Dict[str, Any], attr: str) -> Any:
+    value: Any = item
+    for name in attr.split('.'):
+        if not isinstance(value, dict) or name not in value:
+            return None
+        value = value[name]
+    return value
+
+
+def _contains(value: Any, expected: Any) -> bool:
+    if isinstance(value, (str, list)):
+        return expected in value
+    return False
+
+
+def _compare(value: Any, operator: str, expected: Any) -> bool:
+    if operator == '':
+        return value == expected
+    if operator == 'ne':
+        return value != expected
+    if operator == 'contains':
+        return _contains(value, expected)
+    if operator == 'not_contains':
+        return not _contains(value, expected)
+    if value is None:
+        return False
+    if operator == 'pfx':
+        return isinstance(value, str) and value.startswith(expected)
+    if operator == 'r':
+        return expected[0] <= value <= expected[1]
+    if operator == 'lt':
+        return value < expected
+    if operator == 'gt':
+        return value > expected
+    if operator == 'lte':
+        return value <= expected
+    return value >= expected
+
+
+def _matches(item: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for query_key, expected in query.items():
+        attr, operator = _split_query_key(query_key)
+        if not _compare(_value_of(item, attr), operator, expected):
+            return False
+    return True
+
+
+def matches(item: Dict[str, Any], query: Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]) -> bool:
+    if query is None:
+        return True
+    if isinstance(query, dict):
+        return _matches(item, query)
+    return len(query) == 0 or any(_matches(item, sub_query) for sub_query in query)
+
+
+class MemoryBase:
+
+    def __init__(self, name: str, latency: float = 0.0) -> None:
+        self.name = name
+        self.latency = latency
+        self._items: Dict[str, str] = {}
+
+    def _round_trip(self) -> None:
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def _store(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        if _KEY not in data:
+            raise ValueError(f'Item without "{_KEY}" in base {self.name}')
+        key = str(data[_KEY])
+        self._items[key] = json.dumps(data)
+        return json.loads(self._items[key])
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        self._round_trip()
+        content = self._items.get(key)
+        return None if content is None else json.loads(content)
+
+    def put(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        self._round_trip()
+        return self._store(data)
+
+    def put_many(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if len(items) > _MAX_PUT_MANY:
+            raise ValueError(f'put_many supports at most {_MAX_PUT_MANY} items, got {len(items)}')
+        self._round_trip()
+        return {'processed': {'items': [self._store(item) for item in items]}}
+
+    def delete(self, key: str) -> None:
+        self._round_trip()
+        self._items.pop(key, None)
+
+    def fetch(self, query: Optional[Union[Dict[str, Any], List[Dict[str, Any]]]] = None,
+              limit: int = 1000, last: Optional[str] = None) -> FetchResponse:
+        self._round_trip()
+        response = FetchResponse()
+        for key in sorted(self._items):
+            if last is not None and key <= last:
+                continue
+            item = json.loads(self._items[key])
+            if not matches(item, query):
+                continue
+            if response.count == limit:
+                response.last = response.items[-1][_KEY]
+                break
+            response.items.append(item)
+            response.count += 1
+        return response
+
+    def keys(self) -> Iterable[str]:
+        return list(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class MemoryDeta:
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.bases: Dict[str, MemoryBase] = {}
+
+    def Base(self, name: str) -> MemoryBase:
+        if name not in self.bases:
+            self.bases[name] = MemoryBase(name, self.latency)
+        return self.bases[name]
@@ -0,0 +1,151 @@
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+from fdk.analysis.aggregates import CatalogStats
+from fdk.models.models import AFdkModel
+from fdk.storage.batching import BatchWriter, item_size
+from fdk.storage.db.deta import DbFactory, IDetaBase, _get_deta_db
+
+_KEY = 'key'
+_SUMMARY = 'summary'
+_STATE = 'state'
+_MAX_CHUNK_BYTES = 256 * 1024
+
+
+def _header_key(section: str) -> str:
+    return f'{_STATE}:{section}'
+
+
+def _chunk_key(section: str, chunk: int) -> str:
+    return f'{_STATE}:{section}:{chunk}'
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _chunks(section_state: Dict[str, Any], max_bytes: int) -> List[Dict[str, Any]]:
+    # packed by size in id order, so a single growing entry only moves the chunks after it
+    chunks: List[Dict[str, Any]] = []
+    chunk: Dict[str, Any] = {}
+    size = 0
+    for fdk_id in sorted(section_state):
+        entry_size = item_size({fdk_id: section_state[fdk_id]})
+        if len(chunk) > 0 and size + entry_size > max_bytes:
+            chunks.append(chunk)
+            chunk, size = {}, 0
+        chunk[fdk_id] = section_state[fdk_id]
+        size += entry_size
+    if len(chunk) > 0:
+        chunks.append(chunk)
+    return chunks
+
+
+class DetaStatsStore:
+
+    def __init__(self, db_name: str = 'fdk_stats', db_factory: Optional[DbFactory] = None,
+                 max_chunk_bytes: int = _MAX_CHUNK_BYTES) -> None:
+        self.db_name = db_name
+        self.db_factory = db_factory or _get_deta_db
+        self.max_chunk_bytes = max_chunk_bytes
+        self._db: Optional[IDetaBase] = None
+        self._batches: Optional[BatchWriter] = None
+        self._digests: Dict[str, List[str]] = {}
+
+    @property
+    def db(self) -> IDetaBase:
+        if self._db is None:
+            self._db = self.db_factory(self.db_name)
+        return self._db
+
+    @property
+    def batches(self) -> BatchWriter:
+        # one writer per store, so the batch size it learned carries over to the next save
+        if self._batches is None:
+            self._batches = BatchWriter(self.db.put_many, name=f'batch.{_STATE}')
+        return self._batches
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        content = self.db.get(_SUMMARY)
+        return content.get('value') if isinstance(content, dict) else None
+
+    def load(self) -> CatalogStats:
+        headers: Dict[str, Dict[str, Any]] = {}
+        chunks: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        last = None
+        while True:
+            response = self.db.fetch({f'{_KEY}?pfx': f'{_STATE}:'}, limit=1000, last=last)
+            for content in response.items:
+                parts = content[_KEY].split(':')
+                if len(parts) == 2:
+                    headers[parts[1]] = content['value']
+                else:
+                    chunks.setdefault(parts[1], {})[int(parts[2])] = content['value']
+            last = response.last
+            if last is None:
+                break
+        state: Dict[str, Dict[str, Any]] = {}
+        for section, section_chunks in chunks.items():
+            # chunks after the last one listed in the header are left over from a larger state
+            count = len(headers[section]['digests']) if section in headers else len(section_chunks)
+            for chunk in range(count):
+                state.setdefault(section, {}).update(section_chunks.get(chunk, {}))
+        self._digests = {section: header['digests'] for section, header in headers.items()}
+        for section, section_chunks in chunks.items():
+            # chunks written without a header are replaced and removed on the next save
+            self._digests.setdefault(section, [''] * (max(section_chunks) + 1))
+        return CatalogStats.from_state(state)
+
+    def _old_digests(self, section: str) -> List[str]:
+        if section not in self._digests:
+            content = self.db.get(_header_key(section))
+            self._digests[section] = content['value']['digests'] if isinstance(content, dict) else []
+        return self._digests[section]
+
+    def save(self, stats: CatalogStats) -> None:
+        items = [{_KEY: _SUMMARY, 'value': stats.summary()}]
+        deleted: List[str] = []
+        state = stats.as_state()
+        for section, fdk_ids in stats.dirty.items():
+            if len(fdk_ids) == 0:
+                continue
+            old_digests = self._old_digests(section)
+            chunks = _chunks(state[section], self.max_chunk_bytes)
+            digests = [_digest(chunk) for chunk in chunks]
+            for chunk, (value, digest) in enumerate(zip(chunks, digests)):
+                if chunk >= len(old_digests) or old_digests[chunk] != digest:
+                    items.append({_KEY: _chunk_key(section, chunk), 'value': value})
+            items.append({_KEY: _header_key(section), 'value': {'digests': digests, 'count': len(state[section])}})
+            deleted.extend(_chunk_key(section, chunk) for chunk in range(len(chunks), len(old_digests)))
+            self._digests[section] = digests
+        self.batches.write(items)
+        for key in deleted:
+            self.db.delete(key)
+        stats.mark_clean()
+
+
+class StatsListener:
+
+    def __init__(self, store: DetaStatsStore) -> None:
+        self.store = store
+        self._stats: Optional[CatalogStats] = None
+
+    @property
+    def stats(self) -> CatalogStats:
+        if self._stats is None:
+            self._stats = self.store.load()
+        return self._stats
+
+    def saved(self, models: Iterable[AFdkModel]) -> None:
+        self.stats.upsert(models)
+
+    def deleted(self, model_type: Type[AFdkModel], fdk_ids: Iterable[str]) -> None:
+        self.stats.remove(model_type, fdk_ids)
+
+    def deleted_all(self, model_type: Type[AFdkModel]) -> None:
+        self.stats.clear(model_type)
+
+    def flush(self) -> None:
+        if any(len(fdk_ids) > 0 for fdk_ids in self.stats.dirty.values()):
+            self.store.save(self.stats)
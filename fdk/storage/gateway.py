@@ -1,12 +1,24 @@
 
-from typing import Iterable, List, Optional, Protocol, Set, TypeVar
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Protocol, Set, Tuple, Type, TypeVar
 
+from fdk.metrics import MetricsRegistry, metrics
+from fdk.models.lazy import reference_ids
 from fdk.models.models import AFdkModel, FdkObject, Property, PropertySet
-from fdk.storage.db.deta import FdkObjectGateway, FdkPropertyGateway, FdkPropertySetGateway
+from fdk.storage.batching import BatchPolicy
+from fdk.storage.index import HierarchyIndex, id_key, keyset_page
+from fdk.storage.query import Page, Query
+from fdk.storage.sections import OBJECTS, PROPERTIES, PSETS
+
+if TYPE_CHECKING:
+    from fdk.storage.db.deta import DbFactory
 
 TModel = TypeVar('TModel', bound=AFdkModel)
 
 
+class ReadOnlyGatewayError(PermissionError):
+    pass
+
+
 class IModelGateway(Protocol[TModel]):
 
     def create_or_update(self, model: TModel) -> None:
@@ -18,29 +30,78 @@ class IModelGateway(Protocol[TModel]):
     def all_ids(self) -> List[str]:
         ...
 
-    def by_id(self, fdk_id: str) -> Optional[TModel]:
+    def by_id(self, fdk_id: str, lazy: bool = False, include: Iterable[str] = ()) -> Optional[TModel]:
         ...
 
-    def by_ids(self, fdk_ids: Iterable[str]) -> List[TModel]:
+    def by_ids(self, fdk_ids: Iterable[str], lazy: bool = False, include: Iterable[str] = ()) -> List[TModel]:
         ...
 
     def all_names(self) -> Set[str]:
         ...
 
-    def by_name(self, name: str) -> List[TModel]:
+    def by_name(self, name: str, lazy: bool = False, include: Iterable[str] = ()) -> List[TModel]:
+        ...
+
+    def all_models(self, lazy: bool = False, include: Iterable[str] = ()) -> List[TModel]:
+        ...
+
+    def query(self, query: Query, lazy: bool = False, include: Iterable[str] = ()) -> List[TModel]:
+        ...
+
+    def select(self, query: Query) -> List[Dict[str, Any]]:
         ...
 
-    def all_models(self) -> List[TModel]:
+    def delete_many(self, fdk_ids: Iterable[str]) -> None:
         ...
 
     def delete_all(self) -> None:
         ...
 
 
+# listeners only buffer saved and deleted models, they write to their stores when flush() is called,
+# which FdkSession.commit does, so edits and imports go through a session or call IFdkGateway.flush themselves
+class IGatewayListener(Protocol):
+
+    def saved(self, models: Iterable[AFdkModel]) -> None:
+        ...
+
+    def deleted(self, model_type: Type[AFdkModel], fdk_ids: Iterable[str]) -> None:
+        ...
+
+    def deleted_all(self, model_type: Type[AFdkModel]) -> None:
+        ...
+
+    def flush(self) -> None:
+        ...
+
+
+class IBrowseIndex(Protocol):
+
+    def departments(self) -> Dict[str, int]:
+        ...
+
+    def groups(self, department: str) -> Dict[str, int]:
+        ...
+
+    def objects(self, department: str, group: str, after: Optional[str] = None,
+                limit: int = 50) -> Tuple[List[str], Optional[str]]:
+        ...
+
+    def page(self, section: str, after: Optional[str] = None, limit: int = 50) -> Tuple[List[str], Optional[str]]:
+        ...
+
+
+class IObjectDocuments(Protocol):
+
+    def object_detail(self, fdk_id: str) -> Optional[FdkObject]:
+        ...
+
+
 class IFdkGateway(Protocol):
     properties: IModelGateway[Property]
     property_sets: IModelGateway[PropertySet]
     objects: IModelGateway[FdkObject]
+    metrics: MetricsRegistry
 
     def save_object(self, model: FdkObject) -> None:
         ...
@@ -48,10 +109,16 @@ class IFdkGateway(Protocol):
     def save_objects(self, models: Iterable[FdkObject]) -> None:
         ...
 
-    def get_objects(self) -> List[FdkObject]:
+    def get_objects(self, lazy: bool = False, include: Iterable[str] = ()) -> List[FdkObject]:
+        ...
+
+    def object_by_id(self, fdk_id: str, lazy: bool = False, include: Iterable[str] = ()) -> Optional[FdkObject]:
+        ...
+
+    def object_detail(self, fdk_id: str) -> Optional[FdkObject]:
         ...
 
-    def delete_objects(self) -> None:
+    def delete_objects(self, fdk_ids: Optional[Iterable[str]] = None) -> None:
         ...
 
     def save_pset(self, model: PropertySet) -> None:
@@ -60,10 +127,13 @@ class IFdkGateway(Protocol):
     def save_psets(self, models: Iterable[PropertySet]) -> None:
         ...
 
-    def get_psets(self) -> List[PropertySet]:
+    def get_psets(self, lazy: bool = False, include: Iterable[str] = ()) -> List[PropertySet]:
+        ...
+
+    def pset_by_id(self, fdk_id: str, lazy: bool = False, include: Iterable[str] = ()) -> Optional[PropertySet]:
         ...
 
-    def delete_psets(self) -> None:
+    def delete_psets(self, fdk_ids: Optional[Iterable[str]] = None) -> None:
         ...
 
     def save_property(self, model: Property) -> None:
@@ -75,7 +145,7 @@ class IFdkGateway(Protocol):
     def get_properties(self) -> List[Property]:
         ...
 
-    def delete_properties(self) -> None:
+    def delete_properties(self, fdk_ids: Optional[Iterable[str]] = None) -> None:
         ...
 
     def properties_by_name(self, name: Optional[str]) -> List[Property]:
@@ -84,51 +154,151 @@ class IFdkGateway(Protocol):
     def property_names(self) -> Set[str]:
         ...
 
+    def mark_saved(self, models: Iterable[AFdkModel]) -> None:
+        ...
+
+    def flush(self) -> None:
+        ...
+
+    def query_objects(self, query: Query, lazy: bool = False, include: Iterable[str] = ()) -> List[FdkObject]:
+        ...
+
+    def query_psets(self, query: Query, lazy: bool = False, include: Iterable[str] = ()) -> List[PropertySet]:
+        ...
+
+    def query_properties(self, query: Query) -> List[Property]:
+        ...
+
+    def departments(self) -> Dict[str, int]:
+        ...
+
+    def groups(self, department: str) -> Dict[str, int]:
+        ...
+
+    def page_objects(self, after: Optional[str] = None, limit: int = 50, department: Optional[str] = None,
+                     group: Optional[str] = None) -> Page[FdkObject]:
+        ...
+
+    def page_psets(self, after: Optional[str] = None, limit: int = 50,
+                   object_id: Optional[str] = None) -> Page[PropertySet]:
+        ...
+
+    def page_properties(self, after: Optional[str] = None, limit: int = 50,
+                        pset_id: Optional[str] = None) -> Page[Property]:
+        ...
+
 
 class FdkGateway(IFdkGateway):
     def __init__(self, objects: IModelGateway[FdkObject],
                  property_sets: IModelGateway[PropertySet],
-                 properties: IModelGateway[Property]) -> None:
+                 properties: IModelGateway[Property],
+                 listeners: Iterable[IGatewayListener] = (), index: Optional[IBrowseIndex] = None,
+                 documents: Optional[IObjectDocuments] = None, registry: Optional[MetricsRegistry] = None) -> None:
         super().__init__()
         self.properties = properties
         self.property_sets = property_sets
         self.objects = objects
+        self.metrics = registry or metrics
+        self.listeners = list(listeners)
+        self._index = index
+        self.documents = documents
+
+    @property
+    def index(self) -> IBrowseIndex:
+        # without a precomputed index the ids are read once and kept for the following pages
+        if self._index is None:
+            self._index = HierarchyIndex.from_models(self.get_objects(lazy=True), self.get_psets(lazy=True),
+                                                     self.get_properties())
+        return self._index
+
+    def _saved(self, models: List[TModel]) -> None:
+        for listener in self.listeners:
+            listener.saved(models)
+
+    def _deleted(self, model_type: Type[AFdkModel], fdk_ids: List[str]) -> None:
+        for listener in self.listeners:
+            listener.deleted(model_type, fdk_ids)
+
+    def _deleted_all(self, model_type: Type[AFdkModel]) -> None:
+        for listener in self.listeners:
+            listener.deleted_all(model_type)
+
+    def _delete(self, gateway: IModelGateway[TModel], model_type: Type[TModel],
+                fdk_ids: Optional[Iterable[str]]) -> None:
+        if fdk_ids is None:
+            gateway.delete_all()
+            self._deleted_all(model_type)
+            return
+        fdk_ids = list(fdk_ids)
+        gateway.delete_many(fdk_ids)
+        self._deleted(model_type, fdk_ids)
+
+    def mark_saved(self, models: Iterable[AFdkModel]) -> None:
+        self._saved(list(models))
+
+    def flush(self) -> None:
+        for listener in self.listeners:
+            listener.flush()
 
     def save_object(self, model: FdkObject) -> None:
         self.objects.create_or_update(model)
+        self._saved([model])
 
     def save_objects(self, models: Iterable[FdkObject]) -> None:
+        models = list(models)
         self.objects.create_or_update_many(models)
+        self._saved(models)
+
+    def get_objects(self, lazy: bool = False, include: Iterable[str] = ()) -> List[FdkObject]:
+        return self.objects.all_models(lazy, include)
 
-    def get_objects(self) -> List[FdkObject]:
-        return self.objects.all_models()
+    def object_by_id(self, fdk_id: str, lazy: bool = False, include: Iterable[str] = ()) -> Optional[FdkObject]:
+        return self.objects.by_id(fdk_id, lazy, include)
 
-    def delete_objects(self) -> None:
-        self.objects.delete_all()
+    def object_detail(self, fdk_id: str) -> Optional[FdkObject]:
+        # a precomputed document is a single read, missing or outdated ones fall back to the references
+        if self.documents is not None:
+            model = self.documents.object_detail(fdk_id)
+            self.metrics.increment('documents.hits' if model is not None else 'documents.misses')
+            if model is not None:
+                return model
+        return self.objects.by_id(fdk_id)
+
+    def delete_objects(self, fdk_ids: Optional[Iterable[str]] = None) -> None:
+        self._delete(self.objects, FdkObject, fdk_ids)
 
     def save_pset(self, model: PropertySet) -> None:
         self.property_sets.create_or_update(model)
+        self._saved([model])
 
     def save_psets(self, models: Iterable[PropertySet]) -> None:
+        models = list(models)
         self.property_sets.create_or_update_many(models)
+        self._saved(models)
+
+    def get_psets(self, lazy: bool = False, include: Iterable[str] = ()) -> List[PropertySet]:
+        return self.property_sets.all_models(lazy, include)
 
-    def get_psets(self) -> List[PropertySet]:
-        return self.property_sets.all_models()
+    def pset_by_id(self, fdk_id: str, lazy: bool = False, include: Iterable[str] = ()) -> Optional[PropertySet]:
+        return self.property_sets.by_id(fdk_id, lazy, include)
 
-    def delete_psets(self) -> None:
-        self.property_sets.delete_all()
+    def delete_psets(self, fdk_ids: Optional[Iterable[str]] = None) -> None:
+        self._delete(self.property_sets, PropertySet, fdk_ids)
 
     def save_property(self, model: Property) -> None:
         self.properties.create_or_update(model)
+        self._saved([model])
 
     def save_properties(self, models: Iterable[Property]) -> None:
+        models = list(models)
         self.properties.create_or_update_many(models)
+        self._saved(models)
 
     def get_properties(self) -> List[Property]:
         return self.properties.all_models()
 
-    def delete_properties(self) -> None:
-        self.properties.delete_all()
+    def delete_properties(self, fdk_ids: Optional[Iterable[str]] = None) -> None:
+        self._delete(self.properties, Property, fdk_ids)
 
     def properties_by_name(self, name: Optional[str]) -> List[Property]:
         if name is None:
@@ -138,10 +308,71 @@ class FdkGateway(IFdkGateway):
     def property_names(self) -> List[str]:
         return sorted(self.properties.all_names())
 
-
-def fdk_gateway() -> IFdkGateway:
+    def query_objects(self, query: Query, lazy: bool = False, include: Iterable[str] = ()) -> List[FdkObject]:
+        return self.objects.query(query, lazy, include)
+
+    def query_psets(self, query: Query, lazy: bool = False, include: Iterable[str] = ()) -> List[PropertySet]:
+        return self.property_sets.query(query, lazy, include)
+
+    def query_properties(self, query: Query) -> List[Property]:
+        return self.properties.query(query)
+
+    def departments(self) -> Dict[str, int]:
+        return self.index.departments()
+
+    def groups(self, department: str) -> Dict[str, int]:
+        return self.index.groups(department)
+
+    def _page(self, gateway: IModelGateway[TModel], fdk_ids: List[str], after: Optional[str]) -> Page[TModel]:
+        return Page(gateway.by_ids(fdk_ids, lazy=True), after)
+
+    def _children(self, fdk_ids: List[str], section: str, after: Optional[str],
+                  limit: int) -> Tuple[List[str], Optional[str]]:
+        return keyset_page(sorted(fdk_ids, key=lambda fdk_id: id_key(section, fdk_id)), section, after, limit)
+
+    def page_objects(self, after: Optional[str] = None, limit: int = 50, department: Optional[str] = None,
+                     group: Optional[str] = None) -> Page[FdkObject]:
+        if department is not None and group is not None:
+            fdk_ids, next_after = self.index.objects(department, group, after, limit)
+        else:
+            fdk_ids, next_after = self.index.page(OBJECTS, after, limit)
+        return self._page(self.objects, fdk_ids, next_after)
+
+    def page_psets(self, after: Optional[str] = None, limit: int = 50,
+                   object_id: Optional[str] = None) -> Page[PropertySet]:
+        if object_id is None:
+            fdk_ids, next_after = self.index.page(PSETS, after, limit)
+        else:
+            model = self.objects.by_id(object_id, lazy=True)
+            pset_ids = [] if model is None else reference_ids(model.property_sets)
+            fdk_ids, next_after = self._children(pset_ids, PSETS, after, limit)
+        return self._page(self.property_sets, fdk_ids, next_after)
+
+    def page_properties(self, after: Optional[str] = None, limit: int = 50,
+                        pset_id: Optional[str] = None) -> Page[Property]:
+        if pset_id is None:
+            fdk_ids, next_after = self.index.page(PROPERTIES, after, limit)
+        else:
+            model = self.property_sets.by_id(pset_id, lazy=True)
+            property_ids = [] if model is None else reference_ids(model.properties)
+            fdk_ids, next_after = self._children(property_ids, PROPERTIES, after, limit)
+        return self._page(self.properties, fdk_ids, next_after)
+
+
+def fdk_gateway(db_factory: Optional['DbFactory'] = None, listeners: Iterable[IGatewayListener] = (),
+                batch_policy: Optional[BatchPolicy] = None, index: Optional[IBrowseIndex] = None,
+                documents: Optional[IObjectDocuments] = None,
+                registry: Optional[MetricsRegistry] = None) -> IFdkGateway:
+    from fdk.storage.db.deta import FdkObjectGateway, FdkPropertyGateway, FdkPropertySetGateway
+
+    # every gateway counts its own requests, so gateways used side by side don't mix their numbers
+    registry = registry or MetricsRegistry()
     return FdkGateway(
-        objects=FdkObjectGateway(),
-        property_sets=FdkPropertySetGateway(),
-        properties=FdkPropertyGateway()
+        objects=FdkObjectGateway(db_factory=db_factory, batch_policy=batch_policy, registry=registry),
+        property_sets=FdkPropertySetGateway(db_factory=db_factory, batch_policy=batch_policy, registry=registry),
+        properties=FdkPropertyGateway(db_factory=db_factory, batch_policy=batch_policy, registry=registry),
+        listeners=listeners,
+        index=index,
+        documents=documents,
+        registry=registry
     )
@@ -0,0 +1,162 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type
+
+from fdk.models.models import AFdkModel, FdkObject, Property, PropertySet
+from fdk.storage.json.gateway import sort_key
+from fdk.storage.sections import OBJECTS, PROPERTIES, PSETS, SECTIONS
+
+_NUMBER_FIRST = {PROPERTIES: True, PSETS: True, OBJECTS: False}
+
+
+def id_key(section: str, fdk_id: str) -> Tuple[Any, Any]:
+    return sort_key(fdk_id, _NUMBER_FIRST[section])
+
+
+def keyset_page(fdk_ids: List[str], section: str, after: Optional[str], limit: int) -> Tuple[List[str], Optional[str]]:
+    start = 0
+    if after is not None:
+        start = bisect_right(fdk_ids, id_key(section, after), key=lambda fdk_id: id_key(section, fdk_id))
+    page = fdk_ids[start:start + limit]
+    return page, page[-1] if start + limit < len(fdk_ids) and len(page) > 0 else None
+
+
+class SortedIds:
+
+    def __init__(self, section: str, fdk_ids: Iterable[str] = ()) -> None:
+        self.section = section
+        self._ids = sorted(set(fdk_ids), key=self._key)
+
+    def _key(self, fdk_id: str) -> Tuple[Any, Any]:
+        return id_key(self.section, fdk_id)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def _index(self, fdk_id: str) -> int:
+        index = bisect_left(self._ids, self._key(fdk_id), key=self._key)
+        return index if index < len(self._ids) and self._ids[index] == fdk_id else -1
+
+    def __contains__(self, fdk_id: object) -> bool:
+        return isinstance(fdk_id, str) and self._index(fdk_id) >= 0
+
+    def add(self, fdk_id: str) -> bool:
+        if fdk_id in self:
+            return False
+        insort(self._ids, fdk_id, key=self._key)
+        return True
+
+    def remove(self, fdk_id: str) -> bool:
+        index = self._index(fdk_id)
+        if index < 0:
+            return False
+        del self._ids[index]
+        return True
+
+    def page(self, after: Optional[str] = None, limit: int = 50) -> Tuple[List[str], Optional[str]]:
+        return keyset_page(self._ids, self.section, after, limit)
+
+    def as_list(self) -> List[str]:
+        return list(self._ids)
+
+
+class HierarchyIndex:
+
+    @classmethod
+    def from_models(cls, objects: Iterable[FdkObject] = (), property_sets: Iterable[PropertySet] = (),
+                    properties: Iterable[Property] = ()) -> 'HierarchyIndex':
+        index = cls()
+        index.upsert(properties)
+        index.upsert(property_sets)
+        index.upsert(objects)
+        return index
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'HierarchyIndex':
+        index = cls()
+        for department, groups in state.get(OBJECTS, {}).items():
+            for group, fdk_ids in groups.items():
+                for fdk_id in fdk_ids:
+                    index._add_object(fdk_id, department, group)
+        index._ids[PSETS] = SortedIds(PSETS, state.get(PSETS, []))
+        index._ids[PROPERTIES] = SortedIds(PROPERTIES, state.get(PROPERTIES, []))
+        index.mark_clean()
+        return index
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, SortedIds] = {section: SortedIds(section) for section in SECTIONS.values()}
+        self._objects: Dict[str, Tuple[str, str]] = {}
+        self._tree: Dict[str, Dict[str, SortedIds]] = {}
+        self.dirty_sections: Set[str] = set()
+        self.dirty_departments: Set[str] = set()
+
+    def _add_object(self, fdk_id: str, department: str, group: str) -> None:
+        self._objects[fdk_id] = (department, group)
+        self._tree.setdefault(department, {}).setdefault(group, SortedIds(OBJECTS)).add(fdk_id)
+        self._ids[OBJECTS].add(fdk_id)
+        self.dirty_sections.add(OBJECTS)
+        self.dirty_departments.add(department)
+
+    def _remove_object(self, fdk_id: str) -> None:
+        if fdk_id not in self._objects:
+            return
+        department, group = self._objects.pop(fdk_id)
+        groups = self._tree[department]
+        groups[group].remove(fdk_id)
+        if len(groups[group]) == 0:
+            del groups[group]
+        if len(groups) == 0:
+            del self._tree[department]
+        self._ids[OBJECTS].remove(fdk_id)
+        self.dirty_sections.add(OBJECTS)
+        self.dirty_departments.add(department)
+
+    def upsert(self, models: Iterable[AFdkModel]) -> None:
+        for model in models:
+            if isinstance(model, FdkObject):
+                if self._objects.get(model.fdk_id) != (model.department, model.group):
+                    self._remove_object(model.fdk_id)
+                    self._add_object(model.fdk_id, model.department, model.group)
+                continue
+            section = SECTIONS[type(model)]
+            if self._ids[section].add(model.fdk_id):
+                self.dirty_sections.add(section)
+
+    def remove(self, model_type: Type[AFdkModel], fdk_ids: Iterable[str]) -> None:
+        section = SECTIONS[model_type]
+        for fdk_id in fdk_ids:
+            if section == OBJECTS:
+                self._remove_object(fdk_id)
+            elif self._ids[section].remove(fdk_id):
+                self.dirty_sections.add(section)
+
+    def clear(self, model_type: Type[AFdkModel]) -> None:
+        self.remove(model_type, self._ids[SECTIONS[model_type]].as_list())
+
+    def mark_clean(self) -> None:
+        self.dirty_sections.clear()
+        self.dirty_departments.clear()
+
+    def ids(self, section: str) -> List[str]:
+        return self._ids[section].as_list()
+
+    def page(self, section: str, after: Optional[str] = None, limit: int = 50) -> Tuple[List[str], Optional[str]]:
+        return self._ids[section].page(after, limit)
+
+    def departments(self) -> Dict[str, int]:
+        return {department: sum(len(fdk_ids) for fdk_ids in groups.values())
+                for department, groups in sorted(self._tree.items())}
+
+    def groups(self, department: str) -> Dict[str, int]:
+        return {group: len(fdk_ids) for group, fdk_ids in sorted(self._tree.get(department, {}).items())}
+
+    def group_ids(self, department: str, group: str) -> List[str]:
+        fdk_ids = self._tree.get(department, {}).get(group)
+        return [] if fdk_ids is None else fdk_ids.as_list()
+
+    def objects(self, department: str, group: str, after: Optional[str] = None,
+                limit: int = 50) -> Tuple[List[str], Optional[str]]:
+        fdk_ids = self._tree.get(department, {}).get(group)
+        return ([], None) if fdk_ids is None else fdk_ids.page(after, limit)
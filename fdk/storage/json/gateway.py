@@ -1,8 +1,10 @@
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from fdk.io.file import JsonHandler
+from fdk.metrics import metrics
 from fdk.models.models import AFdkModel, FdkObject, Property, PropertySet
 from fdk.storage.builder.builder import IBuilder
 from fdk.storage.builder.json import (AJsonFdkObjectBuilder,
@@ -103,24 +105,38 @@ class JsonFdkFactory():
         self.handler = handler
         self.builder = builder
 
+    def read(self, path: Path) -> Dict[str, Any]:
+        with metrics.timer('json.parse'):
+            return self.handler.read(path)
+
+    def build(self, content: Dict[str, Any]) -> FdkObject:
+        with metrics.timer('json.build'):
+            return self.builder.build(content)
+
     def create(self, path: Path) -> FdkObject:
-        content = self.handler.read(path)
-        return self.builder.build(content)
+        return self.build(self.read(path))
 
 
-def _sort_model(model: AFdkModel, number_first: bool):
-    splitted = model.fdk_id.split('_')
+def sort_key(fdk_id: str, number_first: bool) -> Tuple[Any, Any]:
+    splitted = fdk_id.split('_')
     if number_first:
         return int(splitted[-1]), '_'.join(splitted[:-1]),
     return '_'.join(splitted[:-1]), int(splitted[-1]),
 
 
+def _sort_model(model: AFdkModel, number_first: bool):
+    return sort_key(model.fdk_id, number_first)
+
+
 class JsonFdkGateway():
 
-    def __init__(self, path: Path, factory: JsonFdkFactory) -> None:
+    def __init__(self, path: Path, factory: JsonFdkFactory, workers: int = 1) -> None:
         self.path = path
         self.factory = factory
+        self.workers = workers
         self._objects: List[FdkObject] = []
+        self._files: List[Path] = []
+        self._sources: Dict[str, Path] = {}
 
     def _get_files(self, current: Path) -> List[Path]:
         files = []
@@ -134,11 +150,27 @@ class JsonFdkGateway():
     def _read_files(self) -> None:
         if len(self._objects) > 0:
             return
-        for path in self._get_files(self.path):
-            model = self.factory.create(path)
-            self._update_property_sets(model.property_sets, model)
-            self._update_properties(model.properties, model)
-            self._objects.append(model)
+        with metrics.stage('json.discover'):
+            self._files = self._get_files(self.path)
+        metrics.increment('json.files', len(self._files))
+        metrics.increment('json.bytes', sum(path.stat().st_size for path in self._files))
+        with metrics.stage('json.read'):
+            for path, content in zip(self._files, self._contents()):
+                model = self.factory.build(content)
+                self._sources[model.fdk_id] = path
+                with metrics.timer('json.back_links'):
+                    self._update_property_sets(model.property_sets, model)
+                    self._update_properties(model.properties, model)
+                self._objects.append(model)
+
+    def _contents(self) -> Iterator[Dict[str, Any]]:
+        if self.workers <= 1:
+            return (self.factory.read(path) for path in self._files)
+        # only reading and parsing run in parallel, building shares the model cache and stays sequential
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='fdk-read')
+        contents = executor.map(self.factory.read, self._files)
+        executor.shutdown(wait=False)
+        return contents
 
     def _update_property_sets(self, property_sets: Iterable[PropertySet], model: FdkObject) -> None:
         for pset in property_sets:
@@ -155,6 +187,14 @@ class JsonFdkGateway():
             if pset.fdk_id not in prop.pset_ids:
                 prop.pset_ids.append(pset.fdk_id)
 
+    def files(self) -> List[Path]:
+        self._read_files()
+        return list(self._files)
+
+    def source_of(self, fdk_id: str) -> Optional[Path]:
+        self._read_files()
+        return self._sources.get(fdk_id)
+
     def objects(self) -> List[FdkObject]:
         self._read_files()
         return sorted(self._objects, key=lambda model: _sort_model(model, number_first=False))
@@ -179,5 +219,5 @@ class JsonFdkGateway():
         return sorted(properties.values(), key=lambda model: _sort_model(model, number_first=True))
 
 
-def fdk_import_gateway(path: Path, factory: JsonFdkFactory = JsonFdkFactory()) -> JsonFdkGateway:
-    return JsonFdkGateway(path=path, factory=factory)
+def fdk_import_gateway(path: Path, factory: JsonFdkFactory = JsonFdkFactory(), workers: int = 1) -> JsonFdkGateway:
+    return JsonFdkGateway(path=path, factory=factory, workers=workers)
@@ -0,0 +1,99 @@
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+EQ = 'eq'
+IN = 'in'
+PREFIX = 'prefix'
+CONTAINS = 'contains'
+
+_OPERATORS = (EQ, IN, PREFIX, CONTAINS)
+
+T = TypeVar('T')
+
+
+@dataclass(frozen=True)
+class Filter:
+    attr: str
+    operator: str
+    value: Any
+
+    def __post_init__(self) -> None:
+        if self.operator not in _OPERATORS:
+            raise ValueError(f'Unknown filter operator "{self.operator}", expected one of {_OPERATORS}')
+        if self.operator == IN:
+            object.__setattr__(self, 'value', tuple(self.value))
+
+    def matches(self, content: Dict[str, Any]) -> bool:
+        value = content.get(self.attr)
+        if self.operator == EQ:
+            return value == self.value
+        if self.operator == IN:
+            return value in self.value
+        if self.operator == PREFIX:
+            return isinstance(value, str) and value.startswith(self.value)
+        return isinstance(value, (list, tuple)) and self.value in value
+
+
+@dataclass(frozen=True)
+class Query:
+    filters: Tuple[Filter, ...] = ()
+    fields: Optional[Tuple[str, ...]] = None
+    order_by: Optional[str] = None
+    descending: bool = False
+    limit: Optional[int] = None
+
+    def where(self, attr: str, operator: str, value: Any) -> 'Query':
+        return replace(self, filters=self.filters + (Filter(attr, operator, value),))
+
+    def eq(self, attr: str, value: Any) -> 'Query':
+        return self.where(attr, EQ, value)
+
+    def is_in(self, attr: str, values: Iterable[Any]) -> 'Query':
+        return self.where(attr, IN, values)
+
+    def prefix(self, attr: str, value: str) -> 'Query':
+        return self.where(attr, PREFIX, value)
+
+    def contains(self, attr: str, value: Any) -> 'Query':
+        return self.where(attr, CONTAINS, value)
+
+    def select(self, *fields: str) -> 'Query':
+        return replace(self, fields=tuple(fields))
+
+    def ordered(self, attr: str, descending: bool = False) -> 'Query':
+        return replace(self, order_by=attr, descending=descending)
+
+    def take(self, limit: Optional[int]) -> 'Query':
+        return replace(self, limit=limit)
+
+    def matches(self, content: Dict[str, Any]) -> bool:
+        return all(query_filter.matches(content) for query_filter in self.filters)
+
+    def project(self, content: Dict[str, Any]) -> Dict[str, Any]:
+        if self.fields is None:
+            return content
+        return {attr: content.get(attr) for attr in self.fields}
+
+    def arrange(self, contents: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        arranged = list(contents)
+        if self.order_by is not None:
+            order_by = self.order_by
+            arranged.sort(key=lambda content: (content.get(order_by) is None, content.get(order_by)),
+                          reverse=self.descending)
+        return arranged if self.limit is None else arranged[:self.limit]
+
+    def apply(self, contents: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self.arrange(content for content in contents if self.matches(content))
+
+
+@dataclass
+class QueryPlan:
+    native: List[Dict[str, Any]] = field(default_factory=lambda: [{}])
+    local: Query = Query()
+    limit: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Page(Generic[T]):
+    items: List[T]
+    after: Optional[str] = None
@@ -0,0 +1,9 @@
+from typing import Dict, Type
+
+from fdk.models.models import AFdkModel, FdkObject, Property, PropertySet
+
+OBJECTS = 'objects'
+PSETS = 'property_sets'
+PROPERTIES = 'properties'
+
+SECTIONS: Dict[Type[AFdkModel], str] = {Property: PROPERTIES, FdkObject: OBJECTS, PropertySet: PSETS}
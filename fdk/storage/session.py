@@ -0,0 +1,109 @@
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Type
+
+from fdk.metrics import metrics
+from fdk.models.models import AFdkModel, FdkObject, Property, PropertySet
+from fdk.storage.gateway import IFdkGateway
+
+_ORDER: List[Type[AFdkModel]] = [Property, PropertySet, FdkObject]
+
+
+def _model_type(model_type: Type[AFdkModel]) -> Type[AFdkModel]:
+    for known in _ORDER:
+        if issubclass(model_type, known):
+            return known
+    raise TypeError(f'{model_type.__name__} is not a FDK model type')
+
+
+class FdkSession:
+
+    def __init__(self, db: IFdkGateway, max_pending: int = 500) -> None:
+        self.db = db
+        self.max_pending = max_pending
+        self._upserts: Dict[Type[AFdkModel], Dict[str, AFdkModel]] = {model_type: {} for model_type in _ORDER}
+        self._deletes: Dict[Type[AFdkModel], Set[str]] = {model_type: set() for model_type in _ORDER}
+        self._cleared: Set[Type[AFdkModel]] = set()
+
+    def __enter__(self) -> 'FdkSession':
+        return self
+
+    def __exit__(self, error_type, error, traceback) -> None:
+        if error_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def _writers(self, model_type: Type[AFdkModel]) -> Tuple[Callable[[Iterable], None],
+                                                              Callable[[Optional[Iterable[str]]], None]]:
+        if model_type is Property:
+            return self.db.save_properties, self.db.delete_properties
+        if model_type is PropertySet:
+            return self.db.save_psets, self.db.delete_psets
+        return self.db.save_objects, self.db.delete_objects
+
+    def __len__(self) -> int:
+        return sum(len(models) for models in self._upserts.values()) + \
+            sum(len(fdk_ids) for fdk_ids in self._deletes.values()) + len(self._cleared)
+
+    def pending(self, model_type: Type[AFdkModel]) -> Tuple[List[str], List[str]]:
+        model_type = _model_type(model_type)
+        return list(self._upserts[model_type]), sorted(self._deletes[model_type])
+
+    def save(self, model: AFdkModel) -> None:
+        model_type = _model_type(type(model))
+        if model.fdk_id in self._upserts[model_type]:
+            metrics.increment('session.superseded')
+        self._deletes[model_type].discard(model.fdk_id)
+        self._upserts[model_type][model.fdk_id] = model
+        self._auto_flush()
+
+    def save_all(self, models: Iterable[AFdkModel]) -> None:
+        for model in models:
+            self.save(model)
+
+    def delete(self, model_type: Type[AFdkModel], fdk_ids: Iterable[str]) -> None:
+        model_type = _model_type(model_type)
+        for fdk_id in fdk_ids:
+            if self._upserts[model_type].pop(fdk_id, None) is not None:
+                metrics.increment('session.superseded')
+            self._deletes[model_type].add(fdk_id)
+        self._auto_flush()
+
+    def clear(self, model_type: Type[AFdkModel]) -> None:
+        model_type = _model_type(model_type)
+        self._upserts[model_type].clear()
+        self._deletes[model_type].clear()
+        self._cleared.add(model_type)
+        self._auto_flush()
+
+    def _auto_flush(self) -> None:
+        if len(self) >= self.max_pending:
+            metrics.increment('session.auto_flushes')
+            self.flush()
+
+    def flush(self) -> None:
+        # referring models are deleted first and written last, so references never dangle in between
+        for model_type in reversed(_ORDER):
+            fdk_ids = self._deletes[model_type]
+            if model_type in self._cleared:
+                self._writers(model_type)[1](None)
+            elif len(fdk_ids) > 0:
+                self._writers(model_type)[1](sorted(fdk_ids))
+            fdk_ids.clear()
+        self._cleared.clear()
+        for model_type in _ORDER:
+            models = self._upserts[model_type]
+            if len(models) > 0:
+                self._writers(model_type)[0](list(models.values()))
+                models.clear()
+
+    def commit(self) -> None:
+        with metrics.timer('session.commit'):
+            self.flush()
+            self.db.flush()
+
+    def rollback(self) -> None:
+        for models in self._upserts.values():
+            models.clear()
+        for fdk_ids in self._deletes.values():
+            fdk_ids.clear()
+        self._cleared.clear()
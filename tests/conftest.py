@@ -0,0 +1,25 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from benchmarks.generator import CatalogSpec, generate_catalog
+from fdk.storage.db.memory import MemoryDeta
+from fdk.storage.json.gateway import JsonFdkGateway, fdk_import_gateway
+
+_SPEC = CatalogSpec(objects=40, psets=15, properties=120, departments=3, groups_per_department=2)
+
+
+@pytest.fixture
+def catalog_paths(tmp_path: Path) -> List[Path]:
+    return generate_catalog(tmp_path / 'catalog', _SPEC)
+
+
+@pytest.fixture
+def file_gw(tmp_path: Path, catalog_paths: List[Path]) -> JsonFdkGateway:
+    return fdk_import_gateway(tmp_path / 'catalog')
+
+
+@pytest.fixture
+def deta() -> MemoryDeta:
+    return MemoryDeta()
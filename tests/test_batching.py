@@ -0,0 +1,96 @@
+from typing import Any, Dict, List
+
+import pytest
+
+from fdk.storage.batching import BatchPolicy, BatchWriter
+
+
+class _StatusError(Exception):
+
+    def __init__(self, code: int) -> None:
+        super().__init__(f'status {code}')
+        self.code = code
+
+
+def _items(count: int) -> List[Dict[str, Any]]:
+    return [{'key': str(index), 'value': index} for index in range(count)]
+
+
+def _sent_keys(batches: List[List[Dict[str, Any]]]) -> List[str]:
+    return [item['key'] for batch in batches for item in batch]
+
+
+def test_writer_grows_from_initial_size():
+    batches: List[List[Dict[str, Any]]] = []
+    writer = BatchWriter(batches.append, BatchPolicy(max_items=12, initial_items=4))
+    assert writer.limit == 4
+    writer.write(_items(80))
+    assert [len(batch) for batch in batches][:4] == [4, 5, 6, 7]
+    assert max(len(batch) for batch in batches) == 12
+    assert _sent_keys(batches) == [str(index) for index in range(80)]
+
+
+def test_writer_shrinks_on_slow_requests():
+    batches: List[List[Dict[str, Any]]] = []
+    writer = BatchWriter(batches.append, BatchPolicy(max_items=25, initial_items=16, target_latency=0.0))
+    writer.write(_items(31))
+    assert [len(batch) for batch in batches] == [16, 8, 4, 2, 1]
+
+
+def test_writer_respects_byte_limit():
+    batches: List[List[Dict[str, Any]]] = []
+    items = [{'key': str(index), 'value': 'x' * 100} for index in range(10)]
+    BatchWriter(batches.append, BatchPolicy(max_bytes=300)).write(items)
+    assert all(len(batch) <= 2 for batch in batches)
+    assert _sent_keys(batches) == [item['key'] for item in items]
+
+
+def test_writer_splits_oversized_batches():
+    batches: List[List[Dict[str, Any]]] = []
+
+    def put_many(batch: List[Dict[str, Any]]) -> None:
+        if len(batch) > 3:
+            raise _StatusError(413)
+        batches.append(batch)
+
+    writer = BatchWriter(put_many, BatchPolicy(initial_items=10))
+    assert writer.write(_items(10)) == len(batches)
+    assert all(len(batch) <= 3 for batch in batches)
+    assert _sent_keys(batches) == [str(index) for index in range(10)]
+    assert writer.limit < 10
+
+
+def test_writer_retries_transient_errors():
+    failures = [_StatusError(429), _StatusError(503)]
+    batches: List[List[Dict[str, Any]]] = []
+    delays: List[float] = []
+
+    def put_many(batch: List[Dict[str, Any]]) -> None:
+        if len(failures) > 0:
+            raise failures.pop(0)
+        batches.append(batch)
+
+    writer = BatchWriter(put_many, BatchPolicy(initial_items=5, backoff=0.1), sleep=delays.append)
+    assert writer.write(_items(5)) == 3
+    assert len(delays) == 2 and delays[0] <= 0.1 < delays[1] <= 0.2
+    assert _sent_keys(batches) == [str(index) for index in range(5)]
+
+
+def test_writer_gives_up_after_retries():
+    def put_many(batch: List[Dict[str, Any]]) -> None:
+        raise _StatusError(500)
+
+    with pytest.raises(_StatusError):
+        BatchWriter(put_many, BatchPolicy(retries=2), sleep=lambda delay: None).write(_items(3))
+
+
+def test_writer_does_not_retry_client_errors():
+    calls: List[int] = []
+
+    def put_many(batch: List[Dict[str, Any]]) -> None:
+        calls.append(len(batch))
+        raise _StatusError(400)
+
+    with pytest.raises(_StatusError):
+        BatchWriter(put_many, sleep=lambda delay: None).write(_items(3))
+    assert calls == [3]
@@ -0,0 +1,98 @@
+import json
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+from fdk import cli
+from fdk.metrics import metrics
+from fdk.storage.columnar.catalog import ColumnarCatalog
+from fdk.storage.json.gateway import JsonFdkGateway, fdk_import_gateway
+
+
+@pytest.fixture
+def source(tmp_path: Path, catalog_paths: List[Path]) -> Path:
+    return tmp_path / 'catalog'
+
+
+@pytest.fixture
+def workers(monkeypatch: pytest.MonkeyPatch) -> List[int]:
+    used: List[int] = []
+
+    def import_gateway(path: Path, workers: int = 1, **kwargs: Any) -> JsonFdkGateway:
+        used.append(workers)
+        return fdk_import_gateway(path, workers=workers, **kwargs)
+
+    monkeypatch.setattr(cli, 'fdk_import_gateway', import_gateway)
+    return used
+
+
+def _round_trips() -> float:
+    return sum(value for name, value in metrics.snapshot()['counters'].items() if name.endswith('.round_trips'))
+
+
+def test_parser_defaults(source: Path):
+    args = cli._parser().parse_args([str(source)])
+    assert (args.backend, args.workers, args.batch_size) == (cli.DETA, 1, 25)
+    assert not args.dry_run and not args.documents and args.catalog is None and args.journal is None
+
+
+def test_parser_rejects_unknown_backend(source: Path, capsys: pytest.CaptureFixture):
+    with pytest.raises(SystemExit):
+        cli._parser().parse_args([str(source), '--backend', 'sqlite'])
+    assert 'invalid choice' in capsys.readouterr().err
+
+
+def test_import_into_memory(source: Path, tmp_path: Path, file_gw: JsonFdkGateway, workers: List[int],
+                            capsys: pytest.CaptureFixture):
+    metrics_path = tmp_path / 'metrics.json'
+    assert cli.main([str(source), '--backend', cli.MEMORY, '--workers', '3', '--batch-size', '40', '--documents',
+                     '--journal', str(tmp_path / 'journal.json'), '--metrics', str(metrics_path), '--quiet']) == 0
+    models = len(file_gw.objects()) + len(file_gw.psets()) + len(file_gw.properties())
+    assert workers == [3]
+    assert f'{models} models' in capsys.readouterr().out
+    assert _round_trips() > 0
+    assert metrics.counter('deta.fdk_objects.put_many.calls') > 0
+    assert (tmp_path / 'journal.json').exists()
+    written = json.loads(metrics_path.read_text(encoding='utf-8'))
+    assert 'import.write' in written['histograms']
+
+
+def test_dry_run_writes_nothing(source: Path, workers: List[int], capsys: pytest.CaptureFixture):
+    assert cli.main([str(source), '--backend', cli.MEMORY, '--dry-run']) == 0
+    assert workers == [1]
+    assert _round_trips() == 0
+    assert metrics.histogram('import.scan') is not None
+    assert metrics.histogram('import.write') is None
+    assert 'round trips' in capsys.readouterr().out
+
+
+def test_catalog_export(source: Path, tmp_path: Path, file_gw: JsonFdkGateway):
+    path = tmp_path / 'export' / 'catalog.fdkc'
+    assert cli.main([str(source), '--dry-run', '--catalog', str(path), '--quiet']) == 0
+    catalog = ColumnarCatalog(path)
+    assert catalog.counts == {'properties': len(file_gw.properties()), 'property_sets': len(file_gw.psets()),
+                              'objects': len(file_gw.objects())}
+    catalog.close()
+    assert metrics.histogram('import.export') is not None
+
+
+@pytest.mark.parametrize('argv,message', [
+    (['--batch-size', '26'], 'at most 25 items'),
+    (['--backend', cli.DETA, '--batch-size', '100', '--dry-run'], 'at most 25 items'),
+])
+def test_deta_batch_size_is_limited(source: Path, argv: List[str], message: str, capsys: pytest.CaptureFixture):
+    with pytest.raises(SystemExit) as error:
+        cli.main([str(source), *argv])
+    assert error.value.code == 2
+    assert message in capsys.readouterr().err
+
+
+def test_memory_batch_size_is_not_limited(source: Path):
+    assert cli.main([str(source), '--backend', cli.MEMORY, '--batch-size', '100', '--quiet']) == 0
+
+
+def test_source_must_be_a_folder(tmp_path: Path, capsys: pytest.CaptureFixture):
+    with pytest.raises(SystemExit):
+        cli.main([str(tmp_path / 'missing')])
+    assert 'is not a folder' in capsys.readouterr().err
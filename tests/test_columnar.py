@@ -0,0 +1,110 @@
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+import pytest
+
+from fdk.models.models import AFdkModel
+from fdk.storage.columnar.catalog import ColumnarCatalog, write_catalog
+from fdk.storage.columnar.gateway import columnar_gateway, export_catalog
+from fdk.storage.gateway import IFdkGateway, IModelGateway, ReadOnlyGatewayError
+from fdk.storage.json.gateway import JsonFdkGateway
+from fdk.storage.query import Query
+
+
+@pytest.fixture
+def catalog_db(tmp_path: Path, file_gw: JsonFdkGateway) -> IFdkGateway:
+    return columnar_gateway(export_catalog(tmp_path / 'catalog.fdkc', file_gw))
+
+
+def _contents(models: Sequence[AFdkModel]) -> List[Dict[str, Any]]:
+    return [{'key': model.fdk_id, **model.as_dict(with_reference=False)} for model in models]
+
+
+def _expected(query: Query, models: Sequence[AFdkModel]) -> List[str]:
+    return [content['fdk_id'] for content in query.apply(_contents(models))]
+
+
+@pytest.mark.parametrize('query', [
+    Query().eq('unit', 'mm'),
+    Query().prefix('name', 'Breite'),
+    Query().prefix('name_clean', 'b').eq('format', 'Real'),
+    Query().is_in('format', ['Real', 'Integer']).eq('unit', 'kg'),
+    Query().is_in('key', ['PTY_3', 'PTY_17', 'PTY_9999']),
+    Query().eq('fdk_id', 'PTY_5'),
+    Query().contains('object_ids', 'OBJ_1'),
+    Query().eq('unit', None),
+    Query().prefix('name', 'B').ordered('fdk_id', descending=True).take(4),
+    Query().ordered('unit').take(7),
+])
+def test_property_query_matches_local_filtering(catalog_db: IFdkGateway, file_gw: JsonFdkGateway, query: Query):
+    fdk_ids = [model.fdk_id for model in catalog_db.query_properties(query)]
+    expected = _expected(query, file_gw.properties())
+    if query.order_by is None:
+        assert sorted(fdk_ids) == sorted(expected)
+    else:
+        assert fdk_ids == expected
+
+
+def test_reference_query(catalog_db: IFdkGateway, file_gw: JsonFdkGateway):
+    pset = max(file_gw.psets(), key=lambda model: len(model.properties))
+    prop_id = pset.properties[0].fdk_id
+    fdk_ids = [model.fdk_id for model in catalog_db.query_psets(Query().contains('properties', prop_id))]
+    assert sorted(fdk_ids) == sorted(model.fdk_id for model in file_gw.psets()
+                                     if prop_id in [prop.fdk_id for prop in model.properties])
+    assert catalog_db.query_psets(Query().contains('properties', 'PTY_unknown')) == []
+
+
+def test_select_projects_fields(catalog_db: IFdkGateway):
+    rows = catalog_db.properties.select(Query().eq('unit', 'kg').select('fdk_id', 'unit'))
+    assert len(rows) > 0
+    assert all(set(row) == {'fdk_id', 'unit'} and row['unit'] == 'kg' for row in rows)
+
+
+@pytest.mark.parametrize('section', ['objects', 'property_sets', 'properties'])
+def test_names(catalog_db: IFdkGateway, file_gw: JsonFdkGateway, section: str):
+    gateway: IModelGateway = getattr(catalog_db, section)
+    models: List[AFdkModel] = {'objects': file_gw.objects, 'property_sets': file_gw.psets,
+                               'properties': file_gw.properties}[section]()
+    name_column = 'name_clean' if section == 'properties' else 'name'
+    names = [getattr(model, name_column) for model in models]
+    assert gateway.all_names() == set(names)
+    for name in names[::7]:
+        expected = [model.fdk_id for model in models if getattr(model, name_column) == name]
+        assert sorted(model.fdk_id for model in gateway.by_name(name)) == sorted(expected)
+    assert gateway.by_name('no such name') == []
+
+
+def test_catalog_round_trip(tmp_path: Path, file_gw: JsonFdkGateway):
+    catalog = ColumnarCatalog(write_catalog(tmp_path / 'catalog.fdkc', file_gw.objects(), file_gw.psets(),
+                                            file_gw.properties()))
+    tables = [(catalog.objects, file_gw.objects()), (catalog.property_sets, file_gw.psets()),
+              (catalog.properties, file_gw.properties())]
+    for table, models in tables:
+        assert len(table) == len(models)
+        for model in models:
+            row = table.row_of(model.fdk_id)
+            assert row is not None and table.fdk_id(row) == model.fdk_id
+            assert table.value(row, 'name') == model.name
+            loaded = table.row(row, lazy=False)
+            assert loaded == model
+            assert loaded.as_dict(with_reference=False) == model.as_dict(with_reference=False)
+            for attr in table.spec.references:
+                assert [ref.fdk_id for ref in getattr(loaded, attr)] == [ref.fdk_id for ref in getattr(model, attr)]
+        assert table.row_of('PTY_unknown') is None
+        assert table.row_of('malformed') is None
+    objects = catalog.objects
+    catalog.close()
+    assert catalog.tables == {}
+    with pytest.raises(ValueError):
+        objects.fdk_id(0)
+
+
+@pytest.mark.parametrize('write', [
+    lambda db: db.save_object(db.get_objects()[0]),
+    lambda db: db.save_psets(db.get_psets()[:2]),
+    lambda db: db.delete_properties(['PTY_1']),
+    lambda db: db.properties.delete_all(),
+])
+def test_writes_are_rejected(catalog_db: IFdkGateway, write: Callable[[IFdkGateway], None]):
+    with pytest.raises(ReadOnlyGatewayError):
+        write(catalog_db)
@@ -0,0 +1,67 @@
+import random
+import string
+from typing import List, Sequence
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from fdk.analysis.dedup import (MinHasher, blocking_key, duplicate_report,  # noqa: E402
+                                features, find_duplicates, jaccard)
+from fdk.models.models import Property  # noqa: E402
+
+
+def _property(fdk_id: str, name: str, unit: str = 'mm', object_ids: Sequence[str] = ()) -> Property:
+    return Property(fdk_id=fdk_id, name=name, name_clean=name, format='Real', unit=unit, description='',
+                    example='', object_ids=list(object_ids))
+
+
+def _distinct(count: int) -> List[Property]:
+    rnd = random.Random(7)
+    return [_property(f'PTY_{index}', ''.join(rnd.choice(string.ascii_lowercase) for _ in range(12)))
+            for index in range(count)]
+
+
+def test_blocking_key_ignores_order_case_and_suffix():
+    assert blocking_key(_property('1', 'Breite Gleis [mm]')) == blocking_key(_property('2', 'gleis, BREITE'))
+
+
+def test_signatures_estimate_jaccard():
+    first, second = features(_property('1', 'Nennspannung Fahrleitung')), \
+        features(_property('2', 'Nennspannung der Fahrleitung'))
+    hasher = MinHasher(num_perm=256)
+    estimate = float(np.mean(hasher.signature(first) == hasher.signature(second)))
+    assert estimate == pytest.approx(jaccard(first, second), abs=0.1)
+
+
+def test_finds_near_duplicates():
+    properties = _distinct(200) + [
+        _property('DUP_1', 'Nennspannung Fahrleitung', object_ids=['OBJ_1']),
+        _property('DUP_2', 'Nennspannung Fahrleitungen', object_ids=['OBJ_2']),
+        _property('DUP_3', 'Fahrleitung Nennspannung [V]', object_ids=['OBJ_1', 'OBJ_3']),
+    ]
+    clusters = find_duplicates(properties, threshold=0.6)
+    assert [cluster.property_ids for cluster in clusters] == [('DUP_1', 'DUP_2', 'DUP_3')]
+    cluster = clusters[0]
+    assert cluster.object_ids == ('OBJ_1', 'OBJ_2', 'OBJ_3')
+    assert 0.6 <= cluster.score <= 1.0
+    report = duplicate_report(clusters)
+    assert report[0]['rank'] == 1 and report[0]['objects'] == 3
+
+
+def test_units_separate_candidates():
+    properties = [_property('1', 'Länge Weiche', unit='mm'), _property('2', 'Länge Weiche', unit='m')]
+    assert find_duplicates(properties, threshold=0.95) == []
+    assert len(find_duplicates(properties, threshold=0.6)) == 1
+
+
+def test_oversized_buckets_are_capped():
+    copies = [_property(f'PTY_{index}', 'Breite Gleis') for index in range(300)]
+    clusters = find_duplicates(copies + _distinct(50), max_block=10)
+    assert len(clusters) == 1
+    assert set(clusters[0].property_ids) == set(model.fdk_id for model in copies)
+
+
+def test_rejects_uneven_bands():
+    with pytest.raises(ValueError):
+        find_duplicates(_distinct(3), num_perm=64, bands=10)
@@ -0,0 +1,112 @@
+from dataclasses import replace
+from typing import Any, Callable, List
+
+import pytest
+
+from fdk.importer import FdkImporter
+from fdk.models.models import FdkObject, Property
+from fdk.storage.db.documents import DetaDocumentStore, DocumentListener, object_document
+from fdk.storage.db.memory import MemoryDeta
+from fdk.storage.gateway import IFdkGateway, fdk_gateway
+from fdk.storage.json.gateway import JsonFdkGateway
+
+
+@pytest.fixture
+def store(deta: MemoryDeta) -> DetaDocumentStore:
+    return DetaDocumentStore(db_factory=deta.Base)
+
+
+@pytest.fixture
+def db(file_gw: JsonFdkGateway, deta: MemoryDeta, store: DetaDocumentStore) -> IFdkGateway:
+    db = fdk_gateway(deta.Base, listeners=[DocumentListener(store)], documents=store)
+    FdkImporter(db).run(file_gw)
+    return db
+
+
+def _assert_consistent(db: IFdkGateway, store: DetaDocumentStore) -> None:
+    objects = db.get_objects()
+    assert set(document['key'] for document in store.all_documents()) == set(model.fdk_id for model in objects)
+    for model in objects:
+        document = store.document(model.fdk_id)
+        assert document is not None
+        assert document['digest'] == object_document(model)['digest'], model.fdk_id
+
+
+def _counted(calls: List[str], name: str, operation: Callable[..., Any]) -> Callable[..., Any]:
+    def count(*args, **kwargs) -> Any:
+        calls.append(name)
+        return operation(*args, **kwargs)
+    return count
+
+
+def _shared_property(db: IFdkGateway) -> Property:
+    return max(db.get_properties(), key=lambda prop: len(prop.object_ids))
+
+
+def test_import_writes_consistent_documents(db: IFdkGateway, store: DetaDocumentStore):
+    _assert_consistent(db, store)
+
+
+def test_object_detail_reads_the_document(db: IFdkGateway, file_gw: JsonFdkGateway):
+    model = file_gw.objects()[0]
+    detail = db.object_detail(model.fdk_id)
+    assert isinstance(detail, FdkObject)
+    assert detail.name == model.name and detail.department == model.department
+    assert sorted(prop.fdk_id for prop in detail.properties) == sorted(prop.fdk_id for prop in model.properties)
+    assert sorted(pset.fdk_id for pset in detail.property_sets) == \
+        sorted(pset.fdk_id for pset in model.property_sets)
+    assert db.metrics.counter('documents.hits') == 1
+
+
+def test_documents_follow_property_update(db: IFdkGateway, store: DetaDocumentStore):
+    prop = _shared_property(db)
+    db.save_property(replace(prop, unit='furlong'))
+    db.flush()
+    _assert_consistent(db, store)
+    for fdk_id in prop.object_ids:
+        detail = db.object_detail(fdk_id)
+        assert detail is not None
+        units = [item.unit for item in detail.properties if item.fdk_id == prop.fdk_id]
+        units.extend(item.unit for pset in detail.property_sets for item in pset.properties
+                     if item.fdk_id == prop.fdk_id)
+        assert len(units) > 0 and set(units) == {'furlong'}
+
+
+def test_update_reads_documents_with_one_query(db: IFdkGateway, store: DetaDocumentStore,
+                                               monkeypatch: pytest.MonkeyPatch):
+    calls: List[str] = []
+    for name in ('get', 'fetch'):
+        monkeypatch.setattr(store.db, name, _counted(calls, name, getattr(store.db, name)))
+    db.save_property(replace(_shared_property(db), unit='furlong'))
+    db.flush()
+    assert calls == ['fetch']
+
+
+def test_documents_follow_pset_update(db: IFdkGateway, store: DetaDocumentStore):
+    pset = max(db.get_psets(), key=lambda model: len(model.object_ids))
+    db.save_pset(replace(pset, name='Renamed', properties=pset.properties[1:]))
+    db.flush()
+    _assert_consistent(db, store)
+    detail = db.object_detail(pset.object_ids[0])
+    assert detail is not None
+    renamed = [model for model in detail.property_sets if model.fdk_id == pset.fdk_id]
+    assert [model.name for model in renamed] == ['Renamed']
+    assert len(renamed[0].properties) == len(pset.properties) - 1
+
+
+def test_documents_follow_deletes(db: IFdkGateway, store: DetaDocumentStore):
+    prop = _shared_property(db)
+    removed = db.get_objects()[0].fdk_id
+    db.delete_properties([prop.fdk_id])
+    db.delete_objects([removed])
+    db.flush()
+    assert store.document(removed) is None
+    for document in store.all_documents():
+        assert prop.fdk_id not in document['property_ids']
+
+
+def test_reimport_rebuilds_documents(db: IFdkGateway, store: DetaDocumentStore, file_gw: JsonFdkGateway):
+    db.save_property(replace(_shared_property(db), unit='furlong'))
+    FdkImporter(db).run(file_gw)
+    _assert_consistent(db, store)
+    assert all(prop.unit != 'furlong' for prop in db.get_properties())
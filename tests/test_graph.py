@@ -0,0 +1,73 @@
+from typing import List
+
+import pytest
+
+from fdk.analysis.graph import AGGREGATE, ModelGraph, SubGraph
+from fdk.models.models import FdkObject, Property, PropertySet
+
+
+def _property(index: int, pset_ids: List[str]) -> Property:
+    return Property(f'PTY_{index}', f'Property {index}', f'property {index}', 'Real', 'mm', '', '',
+                    pset_ids=pset_ids)
+
+
+def _hub_graph(size: int = 30) -> ModelGraph:
+    properties = [_property(index, ['PSET_1']) for index in range(1, size + 1)]
+    pset = PropertySet('PSET_1', 'Hub', properties, object_ids=['OBJ_1'])
+    chain = PropertySet('PSET_2', 'Chain', [properties[0]], object_ids=['OBJ_2'])
+    objects = [FdkObject('OBJ_1', 'Wall', 'Building', 'Walls', property_sets=[pset]),
+               FdkObject('OBJ_2', 'Door', 'Building', 'Doors', property_sets=[chain])]
+    properties[0].pset_ids.append('PSET_2')
+    return ModelGraph.from_models(objects, [pset, chain], properties)
+
+
+def _assert_consistent(subgraph: SubGraph) -> None:
+    node_ids = [node.node_id for node in subgraph.nodes]
+    assert len(node_ids) == len(set(node_ids))
+    assert all(edge.source in node_ids and edge.target in node_ids for edge in subgraph.edges)
+
+
+def test_depth_limit():
+    graph = _hub_graph()
+    for max_depth, expected in [(0, {'OBJ_2'}), (1, {'OBJ_2', 'PSET_2'}), (2, {'OBJ_2', 'PSET_2', 'PTY_1'})]:
+        subgraph = graph.extract('OBJ_2', max_depth=max_depth)
+        assert set(node.node_id for node in subgraph.nodes) == expected
+        assert max(node.depth for node in subgraph.nodes) == max_depth
+        _assert_consistent(subgraph)
+    subgraph = graph.extract('OBJ_2', max_depth=3)
+    assert set(node.node_id for node in subgraph.nodes if node.depth == 3) == {'PSET_1'}
+
+
+def test_unknown_root_is_empty():
+    assert ModelGraph().extract('PTY_1').nodes == []
+
+
+def test_hub_limit_ignores_the_parent():
+    subgraph = _hub_graph().extract('PTY_1', max_depth=2, hub_limit=5)
+    hub_edges = [edge for edge in subgraph.edges if edge.source == 'PSET_1']
+    shown = [edge.target for edge in hub_edges if not edge.target.endswith('#more')]
+    assert len(shown) == 5
+    assert 'PTY_1' not in shown
+    aggregate = next(node for node in subgraph.nodes if node.node_id == 'PSET_1#more')
+    assert aggregate.kind == AGGREGATE and aggregate.depth == 2
+    # the hub links OBJ_1 and 30 properties, PTY_1 is the parent
+    assert aggregate.count == 30 - 5
+    assert subgraph.truncated
+    _assert_consistent(subgraph)
+
+
+@pytest.mark.parametrize('max_nodes,max_edges', [(1, 300), (2, 300), (6, 300), (12, 300), (150, 2), (150, 7),
+                                                 (9, 9)])
+def test_caps_include_aggregates(max_nodes: int, max_edges: int):
+    subgraph = _hub_graph().extract('PTY_1', max_depth=3, max_nodes=max_nodes, max_edges=max_edges)
+    assert len(subgraph.nodes) <= max_nodes
+    assert len(subgraph.edges) <= max_edges
+    assert subgraph.truncated
+    _assert_consistent(subgraph)
+
+
+def test_small_graph_is_complete():
+    subgraph = _hub_graph(size=4).extract('OBJ_1', max_depth=4)
+    assert not subgraph.truncated
+    assert all(node.kind != AGGREGATE for node in subgraph.nodes)
+    assert len(subgraph.nodes) == 8
@@ -0,0 +1,104 @@
+import threading
+import time
+from typing import Callable, Iterator, List
+
+import pytest
+
+from fdk.jobs import CANCELLED, FAILED, PENDING, RUNNING, SUCCEEDED, Job, JobRunner
+
+_TIMEOUT = 5
+
+
+@pytest.fixture
+def runner() -> Iterator[JobRunner]:
+    runner = JobRunner(max_workers=1)
+    yield runner
+    runner.shutdown()
+
+
+def _blocking(release: threading.Event, states: List[str]) -> Callable[[Job], None]:
+    def run(job: Job) -> None:
+        states.append(job.status().state)
+        job.progress('Work', 1, 4)
+        release.wait(_TIMEOUT)
+    return run
+
+
+def test_submit_joins_the_active_job_of_a_key(runner: JobRunner):
+    release = threading.Event()
+    job = runner.submit('folder', _blocking(release, []))
+    assert runner.submit('folder', _blocking(release, [])) is job
+    other = runner.submit('other folder', _blocking(release, []))
+    assert other is not job
+    assert [active.key for active in runner.active()] == ['folder', 'other folder']
+    release.set()
+    runner.wait(job.job_id, _TIMEOUT)
+    runner.wait(other.job_id, _TIMEOUT)
+    again = runner.submit('folder', _blocking(release, []))
+    assert again is not job
+    runner.wait(again.job_id, _TIMEOUT)
+
+
+def test_status_transitions(runner: JobRunner):
+    release = threading.Event()
+    states: List[str] = []
+    first = runner.submit('first', _blocking(release, states))
+    second = runner.submit('second', _blocking(release, states))
+    assert second.status().state == PENDING
+    assert second.status().elapsed == 0.0
+    release.set()
+    status = runner.wait(second.job_id, _TIMEOUT)
+    assert states == [RUNNING, RUNNING]
+    assert status is not None and status.state == SUCCEEDED and status.is_finished
+    assert status.stage == 'Work' and status.percent == 1.0
+    assert status.started is not None and status.finished is not None and status.finished >= status.started
+    assert first.status().state == SUCCEEDED
+    assert runner.active() == []
+    assert set(runner.jobs()) == {first, second}
+
+
+def test_failures_are_captured(runner: JobRunner):
+    def fail(job: Job) -> None:
+        job.progress('Parse', 2, 4)
+        raise ValueError('broken file')
+
+    job = runner.submit('folder', fail)
+    status = runner.wait(job.job_id, _TIMEOUT)
+    assert status is not None and status.state == FAILED
+    assert status.error == 'ValueError: broken file'
+    assert status.percent == 0.5
+
+
+def test_cancel_running_and_pending_jobs(runner: JobRunner):
+    started = threading.Event()
+    ran: List[str] = []
+
+    def until_cancelled(job: Job) -> None:
+        started.set()
+        while not job.cancelled():
+            time.sleep(0.01)
+        raise RuntimeError('stopped')
+
+    running = runner.submit('running', until_cancelled)
+    pending = runner.submit('pending', lambda job: ran.append(job.key))
+    assert started.wait(_TIMEOUT)
+    assert runner.cancel(pending.job_id)
+    assert runner.cancel(running.job_id)
+    running_status = runner.wait(running.job_id, _TIMEOUT)
+    pending_status = runner.wait(pending.job_id, _TIMEOUT)
+    assert running_status is not None and running_status.state == CANCELLED and running_status.error is None
+    assert pending_status is not None and pending_status.state == CANCELLED
+    assert ran == []
+    assert not runner.cancel(running.job_id)
+    assert not runner.cancel('unknown')
+
+
+def test_history_is_pruned():
+    runner = JobRunner(history=2)
+    jobs = [runner.submit(f'folder {index}', lambda job: None) for index in range(4)]
+    for job in jobs:
+        runner.wait(job.job_id, _TIMEOUT)
+    runner.submit('folder 4', lambda job: None)
+    runner.shutdown(cancel=False)
+    assert runner.get(jobs[0].job_id) is None and runner.get(jobs[1].job_id) is None
+    assert set(job.key for job in runner.jobs()) == {'folder 2', 'folder 3', 'folder 4'}
@@ -0,0 +1,76 @@
+from pathlib import Path
+from typing import Callable, Iterable, List
+
+import pytest
+
+from fdk.importer import OBJECT_NAME, PROPERTY_NAME, PSET_NAME, FdkImporter
+from fdk.journal import ImportJournal
+from fdk.models.models import AFdkModel
+from fdk.storage.db.memory import MemoryDeta
+from fdk.storage.gateway import IFdkGateway, fdk_gateway
+from fdk.storage.json.gateway import JsonFdkGateway
+
+_SAVES = ('save_properties', 'save_psets', 'save_objects')
+
+
+class _ImportFailed(Exception):
+    pass
+
+
+def _recording(save: Callable[..., None], written: List[str],
+               fail_after: int = -1) -> Callable[[Iterable[AFdkModel]], None]:
+    def record(models: Iterable[AFdkModel]) -> None:
+        models = list(models)
+        if 0 <= fail_after <= len(written):
+            raise _ImportFailed()
+        save(models)
+        written.extend(model.fdk_id for model in models)
+    return record
+
+
+def _record_saves(db: IFdkGateway, monkeypatch: pytest.MonkeyPatch, written: List[str]) -> None:
+    for name in _SAVES:
+        monkeypatch.setattr(db, name, _recording(getattr(db, name), written))
+
+
+def test_import_resumes_after_failure(tmp_path: Path, file_gw: JsonFdkGateway, deta: MemoryDeta,
+                                      monkeypatch: pytest.MonkeyPatch):
+    db = fdk_gateway(deta.Base)
+    journal = ImportJournal(tmp_path / 'journal.jsonl')
+    committed: List[str] = []
+    monkeypatch.setattr(db, 'save_objects', _recording(db.save_objects, committed, fail_after=10))
+    with pytest.raises(_ImportFailed):
+        FdkImporter(db, group_size=10, journal=journal).run(file_gw)
+    checkpoint = journal.checkpoint()
+    assert checkpoint is not None and not checkpoint.finished
+    assert checkpoint.deleted == {OBJECT_NAME, PSET_NAME, PROPERTY_NAME}
+    assert set(checkpoint.digests(OBJECT_NAME)) == set(committed)
+
+    monkeypatch.undo()
+    resumed: List[str] = []
+    deletes: List[str] = []
+    _record_saves(db, monkeypatch, resumed)
+    monkeypatch.setattr(db, 'delete_objects', lambda fdk_ids=None: deletes.append(OBJECT_NAME))
+    FdkImporter(db, group_size=10, journal=journal).run(file_gw)
+
+    object_ids = set(model.fdk_id for model in file_gw.objects())
+    assert deletes == []
+    assert set(resumed) == object_ids - set(committed)
+    assert set(deta.Base('fdk_objects').keys()) == object_ids
+    checkpoint = journal.checkpoint()
+    assert checkpoint is not None and checkpoint.finished
+
+
+def test_import_after_finished_journal_starts_over(tmp_path: Path, file_gw: JsonFdkGateway, deta: MemoryDeta,
+                                                   monkeypatch: pytest.MonkeyPatch):
+    db = fdk_gateway(deta.Base)
+    journal = ImportJournal(tmp_path / 'journal.jsonl')
+    FdkImporter(db, journal=journal).run(file_gw)
+    assert journal.resumable(str(file_gw.path)) is None
+
+    written: List[str] = []
+    _record_saves(db, monkeypatch, written)
+    FdkImporter(db, journal=journal).run(file_gw)
+    events = [record['event'] for record in journal.records()]
+    assert events.count('begin') == 1 and events[-1] == 'finished'
+    assert len(written) == len(file_gw.objects()) + len(file_gw.psets()) + len(file_gw.properties())
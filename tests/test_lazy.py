@@ -0,0 +1,123 @@
+import json
+from typing import Dict, List
+
+import pytest
+
+from fdk.importer import FdkImporter
+from fdk.models.lazy import LazyModels, is_loaded, reference_ids
+from fdk.models.models import FdkObject
+from fdk.storage.db.memory import MemoryDeta
+from fdk.storage.gateway import IFdkGateway, fdk_gateway
+from fdk.storage.json.gateway import JsonFdkGateway
+
+_BASES = {'objects': 'fdk_objects', 'psets': 'property_sets', 'properties': 'properties'}
+
+
+def _lazy(values: List[str], loads: List[int]) -> LazyModels:
+    def load() -> List[str]:
+        loads.append(1)
+        return list(values)
+    return LazyModels(loader=load, fdk_ids=values)
+
+
+@pytest.mark.parametrize('operation,expected', [
+    (lambda lazy: ['x'] + lazy, ['x', 'a', 'b']),
+    (lambda lazy: lazy + ['x'], ['a', 'b', 'x']),
+    (lambda lazy: [*lazy], ['a', 'b']),
+    (lambda lazy: list(reversed(lazy)), ['b', 'a']),
+    (lambda lazy: ','.join(lazy), 'a,b'),
+    (lambda lazy: tuple(lazy), ('a', 'b')),
+    (lambda lazy: lazy * 2, ['a', 'b', 'a', 'b']),
+    (lambda lazy: lazy == ['a', 'b'], True),
+    (lambda lazy: 'b' in lazy, True),
+    (lambda lazy: lazy[-1], 'b'),
+    (lambda lazy: len(lazy), 2),
+    (lambda lazy: bool(lazy), True),
+])
+def test_every_read_path_loads(operation, expected):
+    loads: List[int] = []
+    lazy = _lazy(['a', 'b'], loads)
+    assert lazy.fdk_ids == ['a', 'b'] and not lazy.is_loaded
+    assert operation(lazy) == expected
+    assert loads == [1] and lazy.is_loaded
+
+
+def test_unloaded_models_are_not_serialized_silently():
+    lazy = _lazy(['a', 'b'], [])
+    with pytest.raises(TypeError):
+        json.dumps(lazy)
+    assert json.dumps(list(lazy)) == '["a", "b"]'
+
+
+def test_writes_load_first():
+    loads: List[int] = []
+    lazy = _lazy(['a', 'b'], loads)
+    lazy.append('c')
+    lazy += ['d']
+    lazy.insert(0, 'z')
+    lazy.remove('a')
+    lazy.sort()
+    assert lazy == ['b', 'c', 'd', 'z']
+    assert loads == [1]
+
+
+@pytest.fixture
+def db(file_gw: JsonFdkGateway, deta: MemoryDeta) -> IFdkGateway:
+    db = fdk_gateway(deta.Base)
+    FdkImporter(db).run(file_gw)
+    return db
+
+
+def _model(db: IFdkGateway) -> FdkObject:
+    return max(db.get_objects(), key=lambda model: len(model.property_sets))
+
+
+def _gets(db: IFdkGateway) -> Dict[str, int]:
+    return {name: int(db.metrics.counter(f'deta.{base}.get.calls')) for name, base in _BASES.items()}
+
+
+def test_lazy_loads_one_level_on_access(db: IFdkGateway):
+    expected = _model(db)
+    db.metrics.reset()
+    model = db.objects.by_id(expected.fdk_id, lazy=True)
+    assert model is not None
+    assert _gets(db) == {'objects': 1, 'psets': 0, 'properties': 0}
+    assert not is_loaded(model.property_sets) and not is_loaded(model.properties)
+    assert reference_ids(model.property_sets) == reference_ids(expected.property_sets)
+    assert _gets(db)['psets'] == 0
+    psets = list(model.property_sets)
+    assert _gets(db) == {'objects': 1, 'psets': len(psets), 'properties': 0}
+    assert db.metrics.counter('gateway.property_sets.lazy_loads') == 1
+    assert all(not is_loaded(pset.properties) for pset in psets)
+    assert [prop.fdk_id for prop in psets[0].properties] == reference_ids(expected.property_sets[0].properties)
+    assert _gets(db)['properties'] == len(psets[0].properties)
+
+
+def test_include_prefetches_each_level_once(db: IFdkGateway):
+    expected = _model(db)
+    property_ids = set(fdk_id for pset in expected.property_sets for fdk_id in reference_ids(pset.properties))
+    db.metrics.reset()
+    model = db.objects.by_id(expected.fdk_id, lazy=True, include=['property_sets.properties'])
+    assert model is not None
+    assert _gets(db) == {'objects': 1, 'psets': len(expected.property_sets), 'properties': len(property_ids)}
+    assert is_loaded(model.property_sets) and not is_loaded(model.properties)
+    assert all(is_loaded(pset.properties) for pset in model.property_sets)
+    assert _gets(db)['properties'] == len(property_ids)
+    assert db.metrics.counter('gateway.property_sets.lazy_loads') == 0
+
+
+def test_eager_loads_everything(db: IFdkGateway):
+    expected = _model(db)
+    db.metrics.reset()
+    model = db.objects.by_id(expected.fdk_id)
+    assert model is not None
+    assert is_loaded(model.property_sets) and is_loaded(model.properties)
+    assert all(is_loaded(pset.properties) for pset in model.property_sets)
+    gets = _gets(db)
+    assert gets['objects'] == 1 and gets['psets'] == len(expected.property_sets)
+    assert db.metrics.counter('gateway.properties.lazy_loads') == 0
+
+
+def test_unknown_include_is_rejected(db: IFdkGateway):
+    with pytest.raises(AttributeError):
+        db.objects.by_id(_model(db).fdk_id, lazy=True, include=['unknown'])
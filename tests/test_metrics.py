@@ -0,0 +1,113 @@
+import json
+import threading
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from fdk.metrics import COUNT_BUCKETS, Histogram, MetricsRegistry
+
+
+def test_counters_aggregate():
+    registry = MetricsRegistry()
+    registry.increment('requests')
+    registry.increment('requests', 4)
+    registry.increment('bytes', 2.5)
+    assert registry.counter('requests') == 5
+    assert registry.counter('bytes') == 2.5
+    assert registry.counter('unknown') == 0
+    registry.reset()
+    assert registry.counter('requests') == 0
+
+
+def test_counters_are_thread_safe():
+    registry = MetricsRegistry()
+    threads = [threading.Thread(target=lambda: [registry.increment('calls') for _ in range(1000)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.counter('calls') == 4000
+
+
+def test_histograms_aggregate():
+    registry = MetricsRegistry()
+    for value in [1, 3, 3, 8, 700, 9000]:
+        registry.observe('batch', value, COUNT_BUCKETS)
+    histogram = registry.histogram('batch')
+    assert histogram is not None
+    assert (histogram.count, histogram.total, histogram.min, histogram.max) == (6, 9715, 1, 9000)
+    summary = histogram.as_dict()
+    assert summary['mean'] == pytest.approx(9715 / 6)
+    assert summary['buckets'] == {'1': 1, '5': 2, '10': 1, '1000': 1}
+    assert summary['overflow'] == 1
+    assert summary['p50'] == 5
+    assert summary['p95'] == 9000
+
+
+def test_empty_histogram():
+    assert Histogram().as_dict()['mean'] == 0.0
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_timer_and_disabled_registry():
+    registry = MetricsRegistry()
+
+    @registry.timed('work')
+    def work() -> int:
+        return 42
+
+    assert work() == 42
+    with registry.timer('work'):
+        pass
+    histogram = registry.histogram('work')
+    assert histogram is not None and histogram.count == 2
+    disabled = MetricsRegistry(enabled=False)
+    disabled.increment('requests')
+    with disabled.stage('import'):
+        pass
+    assert disabled.snapshot() == {'counters': {}, 'histograms': {}, 'memory': {}}
+
+
+@pytest.mark.parametrize('tracing', [False, True])
+def test_stage_reports_peak_and_restores_tracing(tracing: bool):
+    registry = MetricsRegistry(trace_memory=True)
+    if tracing:
+        tracemalloc.start()
+    try:
+        with registry.stage('import'):
+            block = bytearray(4 * 1024 * 1024)
+            del block
+        assert tracemalloc.is_tracing() == tracing
+    finally:
+        tracemalloc.stop()
+    memory = registry.snapshot()['memory']['import']
+    assert memory['peak'] >= 4 * 1024 * 1024
+    assert memory['allocated'] < memory['peak']
+    assert len(memory['top']) <= 5
+    histogram = registry.histogram('import')
+    assert histogram is not None and histogram.count == 1
+
+
+def test_stage_without_tracing_only_times():
+    registry = MetricsRegistry()
+    with registry.stage('import'):
+        pass
+    assert registry.snapshot()['memory'] == {}
+    assert not tracemalloc.is_tracing()
+
+
+def test_to_json(tmp_path: Path):
+    registry = MetricsRegistry()
+    registry.increment('requests', 3)
+    registry.observe('latency', 0.003)
+    path = tmp_path / 'metrics.json'
+    content = registry.to_json(path)
+    assert path.read_text(encoding='utf-8') == content
+    written = json.loads(content)
+    assert set(written) == {'counters', 'histograms', 'memory'}
+    assert written['counters'] == {'requests': 3}
+    assert set(written['histograms']['latency']) == {'count', 'total', 'mean', 'min', 'max', 'p50', 'p95',
+                                                     'buckets', 'overflow'}
+    assert written['histograms']['latency']['buckets'] == {'0.005': 1}
@@ -0,0 +1,89 @@
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import pytest
+
+from fdk.importer import FdkImporter
+from fdk.storage.columnar.gateway import columnar_gateway, export_catalog
+from fdk.storage.db.hierarchy import DetaHierarchyStore, HierarchyListener
+from fdk.storage.db.memory import MemoryDeta
+from fdk.storage.gateway import IFdkGateway, fdk_gateway
+from fdk.storage.index import id_key, keyset_page
+from fdk.storage.json.gateway import JsonFdkGateway
+from fdk.storage.query import Page
+from fdk.storage.sections import OBJECTS, PROPERTIES, PSETS
+
+
+def _all_pages(page: Callable[[Optional[str]], Page]) -> List[str]:
+    fdk_ids: List[str] = []
+    after = None
+    while True:
+        result = page(after)
+        fdk_ids.extend(model.fdk_id for model in result.items)
+        if result.after is None:
+            return fdk_ids
+        assert result.after == fdk_ids[-1]
+        after = result.after
+
+
+def _sorted(section: str, fdk_ids: List[str]) -> List[str]:
+    return sorted(fdk_ids, key=lambda fdk_id: id_key(section, fdk_id))
+
+
+@pytest.fixture(params=['store', 'models', 'catalog'])
+def db(request: pytest.FixtureRequest, tmp_path: Path, file_gw: JsonFdkGateway, deta: MemoryDeta) -> IFdkGateway:
+    if request.param == 'catalog':
+        return columnar_gateway(export_catalog(tmp_path / 'catalog.fdkc', file_gw))
+    if request.param == 'models':
+        db = fdk_gateway(deta.Base)
+    else:
+        store = DetaHierarchyStore(db_factory=deta.Base, chunk_size=4)
+        db = fdk_gateway(deta.Base, listeners=[HierarchyListener(store)], index=store)
+    FdkImporter(db).run(file_gw)
+    return db
+
+
+def test_keyset_page_orders_numbers_naturally():
+    fdk_ids = _sorted(PROPERTIES, ['PTY_10', 'PTY_2', 'PTY_1', 'PTY_21', 'PTY_3'])
+    assert fdk_ids == ['PTY_1', 'PTY_2', 'PTY_3', 'PTY_10', 'PTY_21']
+    assert keyset_page(fdk_ids, PROPERTIES, None, 2) == (['PTY_1', 'PTY_2'], 'PTY_2')
+    assert keyset_page(fdk_ids, PROPERTIES, 'PTY_3', 2) == (['PTY_10', 'PTY_21'], None)
+    assert keyset_page(fdk_ids, PROPERTIES, 'PTY_4', 2) == (['PTY_10', 'PTY_21'], None)
+
+
+@pytest.mark.parametrize('limit', [1, 3, 7, 100])
+def test_pages_cover_every_model_once(db: IFdkGateway, file_gw: JsonFdkGateway, limit: int):
+    sections = [
+        (OBJECTS, db.page_objects, file_gw.objects()),
+        (PSETS, db.page_psets, file_gw.psets()),
+        (PROPERTIES, db.page_properties, file_gw.properties()),
+    ]
+    for section, page, models in sections:
+        fdk_ids = _all_pages(lambda after: page(after=after, limit=limit))
+        assert fdk_ids == _sorted(section, [model.fdk_id for model in models])
+
+
+def test_group_pages(db: IFdkGateway, file_gw: JsonFdkGateway):
+    for department in db.departments():
+        for group, count in db.groups(department).items():
+            fdk_ids = _all_pages(lambda after: db.page_objects(after, 4, department, group))
+            expected = [model.fdk_id for model in file_gw.objects()
+                        if model.department == department and model.group == group]
+            assert len(fdk_ids) == count
+            assert fdk_ids == _sorted(OBJECTS, expected)
+
+
+def test_child_pages(db: IFdkGateway, file_gw: JsonFdkGateway):
+    model = max(file_gw.psets(), key=lambda pset: len(pset.properties))
+    fdk_ids = _all_pages(lambda after: db.page_properties(after, 3, pset_id=model.fdk_id))
+    assert fdk_ids == _sorted(PROPERTIES, [prop.fdk_id for prop in model.properties])
+
+
+@pytest.mark.parametrize('db', ['store', 'models'], indirect=True)
+def test_pages_follow_updates(db: IFdkGateway, file_gw: JsonFdkGateway):
+    removed = [model.fdk_id for model in file_gw.properties()[::5]]
+    db.delete_properties(removed)
+    db.flush()
+    fdk_ids = _all_pages(lambda after: db.page_properties(after, 6))
+    assert fdk_ids == _sorted(PROPERTIES, [model.fdk_id for model in file_gw.properties()
+                                           if model.fdk_id not in removed])
@@ -0,0 +1,86 @@
+from typing import Any, Dict, List
+
+import pytest
+
+from fdk.importer import FdkImporter
+from fdk.storage.db.deta import _query_plan
+from fdk.storage.db.memory import MemoryDeta
+from fdk.storage.gateway import IFdkGateway, fdk_gateway
+from fdk.storage.json.gateway import JsonFdkGateway
+from fdk.storage.query import Query
+
+
+@pytest.fixture
+def db(file_gw: JsonFdkGateway, deta: MemoryDeta) -> IFdkGateway:
+    db = fdk_gateway(deta.Base)
+    FdkImporter(db).run(file_gw)
+    db.metrics.reset()
+    return db
+
+
+def _contents(db: IFdkGateway) -> List[Dict[str, Any]]:
+    return [model.as_dict(with_reference=False) for model in db.get_properties()]
+
+
+def test_plan_pushes_filters_down():
+    plan = _query_plan(Query().eq('unit', 'mm').prefix('name', 'Breite').take(5))
+    assert plan.native == [{'unit': 'mm', 'name?pfx': 'Breite'}]
+    assert plan.local.filters == ()
+    assert plan.limit == 5
+
+
+def test_plan_expands_small_in_filters():
+    plan = _query_plan(Query().is_in('unit', ['mm', 'kg']).is_in('format', ['Real', 'Text']))
+    assert len(plan.native) == 4
+    assert {'unit': 'kg', 'format': 'Text'} in plan.native
+    assert plan.local.filters == ()
+
+
+def test_plan_keeps_large_or_repeated_filters_local():
+    plan = _query_plan(Query().is_in('unit', [str(index) for index in range(30)]).eq('format', 'Real'))
+    assert plan.native == [{'format': 'Real'}]
+    assert [query_filter.attr for query_filter in plan.local.filters] == ['unit']
+    plan = _query_plan(Query().prefix('name', 'B').prefix('name', 'Br').ordered('name').take(3))
+    assert plan.native == [{'name?pfx': 'B'}]
+    assert len(plan.local.filters) == 1 and plan.limit is None
+
+
+def test_plan_of_empty_in_filter_reads_nothing():
+    assert _query_plan(Query().is_in('unit', [])).native == []
+
+
+@pytest.mark.parametrize('query', [
+    Query().eq('unit', 'mm'),
+    Query().prefix('name', 'Breite'),
+    Query().is_in('format', ['Real', 'Integer']).eq('unit', 'kg'),
+    Query().is_in('unit', ['', 'mm', 'm', 'm2', 'm3', 'kg', 'kN', 'V', 'A', 'W', '°C', '%']).is_in(
+        'format', ['Real', 'Text', 'Date']),
+    Query().contains('object_ids', 'OBJ_1'),
+    Query().prefix('name', 'B').ordered('fdk_id', descending=True).take(4),
+])
+def test_query_matches_local_filtering(db: IFdkGateway, query: Query):
+    expected = query.apply(_contents(db))
+    db.metrics.reset()
+    fdk_ids = [model.fdk_id for model in db.query_properties(query)]
+    if query.order_by is None:
+        assert sorted(fdk_ids) == sorted(content['fdk_id'] for content in expected)
+    else:
+        assert fdk_ids == [content['fdk_id'] for content in expected]
+
+
+def test_pushed_down_query_fetches_only_matches(db: IFdkGateway):
+    query = Query().eq('format', 'Text').prefix('name', 'S')
+    result = db.query_properties(query)
+    assert len(result) > 0
+    assert db.metrics.counter('gateway.properties.query.fetched') == len(result)
+
+
+def test_pushed_down_limit(db: IFdkGateway):
+    assert len(db.query_properties(Query().eq('format', 'Real').take(2))) == 2
+    assert db.metrics.counter('gateway.properties.query.fetched') == 2
+
+
+def test_select_projects_fields(db: IFdkGateway):
+    rows = db.properties.select(Query().eq('unit', 'kg').select('fdk_id', 'unit'))
+    assert len(rows) > 0
+    assert all(set(row) == {'fdk_id', 'unit'} and row['unit'] == 'kg' for row in rows)
@@ -0,0 +1,131 @@
+from dataclasses import replace
+from typing import Any, Callable, List, Optional, Tuple
+
+import pytest
+
+from fdk.importer import FdkImporter
+from fdk.metrics import metrics
+from fdk.models.models import FdkObject, Property, PropertySet
+from fdk.storage.db.memory import MemoryDeta
+from fdk.storage.gateway import IFdkGateway, fdk_gateway
+from fdk.storage.json.gateway import JsonFdkGateway
+from fdk.storage.session import FdkSession
+
+_WRITERS = ['save_properties', 'save_psets', 'save_objects', 'delete_properties', 'delete_psets', 'delete_objects',
+            'flush']
+
+Call = Tuple[str, Optional[List[str]]]
+
+
+@pytest.fixture
+def db(file_gw: JsonFdkGateway, deta: MemoryDeta) -> IFdkGateway:
+    db = fdk_gateway(deta.Base)
+    FdkImporter(db).run(file_gw)
+    metrics.reset()
+    return db
+
+
+@pytest.fixture
+def calls(db: IFdkGateway, monkeypatch: pytest.MonkeyPatch) -> List[Call]:
+    calls: List[Call] = []
+    for name in _WRITERS:
+        monkeypatch.setattr(db, name, _recorded(calls, name, getattr(db, name)))
+    return calls
+
+
+def _recorded(calls: List[Call], name: str, operation: Callable[..., Any]) -> Callable[..., Any]:
+    def record(values: Any = None) -> Any:
+        if name == 'flush':
+            calls.append((name, None))
+            return operation()
+        values = None if values is None else list(values)
+        calls.append((name, None if values is None else [getattr(value, 'fdk_id', value) for value in values]))
+        return operation(values)
+    return record
+
+
+def test_saves_of_the_same_model_are_coalesced(db: IFdkGateway, calls: List[Call]):
+    first, second = db.get_properties()[:2]
+    session = FdkSession(db)
+    session.save(replace(first, unit='m'))
+    session.save(second)
+    session.save(replace(first, unit='km'))
+    assert calls == []
+    assert session.pending(Property) == ([first.fdk_id, second.fdk_id], [])
+    session.commit()
+    assert calls == [('save_properties', [first.fdk_id, second.fdk_id]), ('flush', None)]
+    assert metrics.counter('session.superseded') == 1
+    stored = db.properties.by_id(first.fdk_id)
+    assert stored is not None and stored.unit == 'km'
+
+
+def test_deletes_supersede_saves_and_run_first(db: IFdkGateway, calls: List[Call]):
+    pset = db.get_psets()[0]
+    fdk_object = db.get_objects()[0]
+    prop = db.get_properties()[0]
+    session = FdkSession(db)
+    session.save(replace(pset, name='Renamed'))
+    session.delete(PropertySet, [pset.fdk_id])
+    session.save(replace(prop, unit='mm'))
+    session.delete(FdkObject, [fdk_object.fdk_id])
+    session.save(fdk_object)
+    assert session.pending(PropertySet) == ([], [pset.fdk_id])
+    assert session.pending(FdkObject) == ([fdk_object.fdk_id], [])
+    session.commit()
+    assert calls == [
+        ('delete_psets', [pset.fdk_id]),
+        ('save_properties', [prop.fdk_id]),
+        ('save_objects', [fdk_object.fdk_id]),
+        ('flush', None),
+    ]
+    assert db.property_sets.by_id(pset.fdk_id) is None
+    assert db.objects.by_id(fdk_object.fdk_id) is not None
+
+
+def test_clear_deletes_everything_before_later_saves(db: IFdkGateway, calls: List[Call]):
+    kept = db.get_properties()[0]
+    session = FdkSession(db)
+    session.save(replace(kept, unit='ignored'))
+    session.clear(Property)
+    session.save(kept)
+    session.commit()
+    assert calls == [('delete_properties', None), ('save_properties', [kept.fdk_id]), ('flush', None)]
+    assert [model.fdk_id for model in db.get_properties()] == [kept.fdk_id]
+
+
+def test_auto_flush_at_max_pending(db: IFdkGateway, calls: List[Call]):
+    properties = db.get_properties()[:5]
+    session = FdkSession(db, max_pending=3)
+    session.save_all(properties)
+    assert calls == [('save_properties', [model.fdk_id for model in properties[:3]])]
+    assert len(session) == 2
+    assert metrics.counter('session.auto_flushes') == 1
+
+
+def test_rollback_discards_pending_writes(db: IFdkGateway, calls: List[Call]):
+    session = FdkSession(db)
+    session.save(db.get_properties()[0])
+    session.delete(FdkObject, [db.get_objects()[0].fdk_id])
+    session.clear(PropertySet)
+    session.rollback()
+    assert len(session) == 0
+    session.commit()
+    assert calls == [('flush', None)]
+
+
+def test_context_manager_commits_on_success(db: IFdkGateway, calls: List[Call]):
+    prop = db.get_properties()[0]
+    with FdkSession(db) as session:
+        session.save(replace(prop, unit='mm'))
+    assert calls == [('save_properties', [prop.fdk_id]), ('flush', None)]
+
+
+def test_context_manager_discards_on_error(db: IFdkGateway, calls: List[Call]):
+    prop = db.get_properties()[0]
+    with pytest.raises(RuntimeError):
+        with FdkSession(db) as session:
+            session.save(replace(prop, unit='mm'))
+            raise RuntimeError('edit failed')
+    assert calls == []
+    stored = db.properties.by_id(prop.fdk_id)
+    assert stored is not None and stored.unit == prop.unit
@@ -0,0 +1,89 @@
+import math
+from pathlib import Path
+from typing import Dict, List, Set
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from fdk.analysis.similarity import (COSINE, JACCARD, IncidenceMatrix,  # noqa: E402
+                                     most_similar_pairs, top_k_similar)
+from fdk.storage.columnar.catalog import ColumnarCatalog, write_catalog  # noqa: E402
+from fdk.storage.json.gateway import JsonFdkGateway  # noqa: E402
+
+_ROWS = {
+    'a': ['x', 'y', 'z'],
+    'b': ['x', 'y'],
+    'c': ['z', 'w'],
+    'd': ['q'],
+    'e': ['x', 'y', 'z', 'w'],
+}
+
+
+def _score(first: Set[str], second: Set[str], metric: str) -> float:
+    shared = len(first & second)
+    if metric == JACCARD:
+        return shared / len(first | second)
+    return shared / math.sqrt(len(first) * len(second))
+
+
+def _brute_force(rows: Dict[str, List[str]], metric: str) -> Dict[str, Dict[str, float]]:
+    return {
+        source: {target: _score(set(rows[source]), set(rows[target]), metric)
+                 for target in rows if target != source and len(set(rows[source]) & set(rows[target])) > 0}
+        for source in rows
+    }
+
+
+def test_matrix_is_csr():
+    matrix = IncidenceMatrix.from_rows(_ROWS)
+    assert matrix.shape == (5, 5)
+    assert matrix.row_sizes().tolist() == [3, 2, 2, 1, 4]
+    transposed = matrix.transposed()
+    assert transposed.row_ids == matrix.column_ids
+    assert transposed.row_sizes().tolist() == [3, 3, 3, 2, 1]
+
+
+@pytest.mark.parametrize('metric', [JACCARD, COSINE])
+@pytest.mark.parametrize('block_size', [1, 2, 512])
+def test_top_k_matches_brute_force(metric: str, block_size: int):
+    similar = top_k_similar(IncidenceMatrix.from_rows(_ROWS), k=2, metric=metric, block_size=block_size)
+    expected = _brute_force(_ROWS, metric)
+    for source, pairs in similar.items():
+        best = sorted(expected[source].values(), reverse=True)[:2]
+        assert [pair.score for pair in pairs] == pytest.approx(best)
+        for pair in pairs:
+            assert pair.source == source
+            assert pair.score == pytest.approx(expected[source][pair.target])
+            assert pair.shared == len(set(_ROWS[source]) & set(_ROWS[pair.target]))
+    assert similar['d'] == []
+
+
+def test_unknown_metric():
+    with pytest.raises(ValueError):
+        top_k_similar(IncidenceMatrix.from_rows(_ROWS), metric='euclid')
+
+
+def test_most_similar_pairs_are_unique():
+    pairs = most_similar_pairs(IncidenceMatrix.from_rows(_ROWS), count=3)
+    assert [tuple(sorted((pair.source, pair.target))) for pair in pairs] == [('a', 'e'), ('a', 'b'), ('b', 'e')]
+    assert pairs[0].score == pytest.approx(0.75)
+
+
+def test_catalog_matrix_matches_models(tmp_path: Path, file_gw: JsonFdkGateway):
+    psets = file_gw.psets()
+    write_catalog(tmp_path / 'catalog.fdkc', file_gw.objects(), psets, file_gw.properties())
+    from_catalog = IncidenceMatrix.from_catalog_psets(ColumnarCatalog(tmp_path / 'catalog.fdkc'))
+    from_models = IncidenceMatrix.from_psets(psets)
+
+    def rows(matrix: IncidenceMatrix) -> Dict[str, Set[str]]:
+        return {row_id: set(matrix.column_ids[column] for column in
+                            map(int, matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]))
+                for row, row_id in enumerate(matrix.row_ids)}
+
+    assert rows(from_catalog) == rows(from_models)
+    similar = top_k_similar(from_catalog, k=3)
+    expected = top_k_similar(from_models, k=3)
+    assert similar.keys() == expected.keys()
+    for source, pairs in similar.items():
+        assert [pair.score for pair in pairs] == pytest.approx([pair.score for pair in expected[source]])
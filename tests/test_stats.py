@@ -0,0 +1,142 @@
+import json
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from fdk.analysis.aggregates import CatalogStats  # noqa: E402
+from fdk.importer import FdkImporter  # noqa: E402
+from fdk.models.models import FdkObject, Property, PropertySet  # noqa: E402
+from fdk.storage.columnar.catalog import ColumnarCatalog, write_catalog  # noqa: E402
+from fdk.storage.db.documents import DetaDocumentStore, DocumentListener  # noqa: E402
+from fdk.storage.db.hierarchy import DetaHierarchyStore, HierarchyListener  # noqa: E402
+from fdk.storage.db.memory import MemoryDeta  # noqa: E402
+from fdk.storage.db.stats import DetaStatsStore, StatsListener  # noqa: E402
+from fdk.storage.gateway import IFdkGateway, fdk_gateway  # noqa: E402
+from fdk.storage.json.gateway import JsonFdkGateway  # noqa: E402
+
+
+def _round_trips(db: IFdkGateway) -> int:
+    return int(sum(value for name, value in db.metrics.snapshot()['counters'].items()
+                   if name.endswith('.round_trips')))
+
+
+@pytest.fixture
+def listened_db(file_gw: JsonFdkGateway, deta: MemoryDeta) -> IFdkGateway:
+    hierarchy = DetaHierarchyStore(db_factory=deta.Base)
+    documents = DetaDocumentStore(db_factory=deta.Base)
+    db = fdk_gateway(deta.Base, listeners=[StatsListener(DetaStatsStore(db_factory=deta.Base)),
+                                           HierarchyListener(hierarchy), DocumentListener(documents)],
+                     index=hierarchy, documents=documents)
+    FdkImporter(db).run(file_gw)
+    return db
+
+
+def test_listeners_write_only_on_flush(listened_db: IFdkGateway, deta: MemoryDeta):
+    stats = DetaStatsStore(db_factory=deta.Base)
+    prop = max(listened_db.get_properties(), key=lambda model: len(model.object_ids))
+    before = stats.summary()
+    listened_db.metrics.reset()
+    listened_db.save_property(replace(prop, unit='furlong'))
+    assert _round_trips(listened_db) == 1
+    assert stats.summary() == before
+
+    listened_db.flush()
+    summary = stats.summary()
+    assert summary is not None and summary['units'].get('furlong') == 1
+
+
+def _catalog_stats(path: Path, objects: List[FdkObject], psets: List[PropertySet],
+                   properties: List[Property]) -> CatalogStats:
+    write_catalog(path, objects, psets, properties)
+    catalog = ColumnarCatalog(path)
+    try:
+        return CatalogStats.from_catalog(catalog)
+    finally:
+        catalog.close()
+
+
+def _assert_same(stats: CatalogStats, expected: CatalogStats) -> None:
+    assert stats.as_state() == expected.as_state()
+    assert stats.summary(top=1000) == expected.summary(top=1000)
+
+
+def test_catalog_stats_match_models(tmp_path: Path, file_gw: JsonFdkGateway):
+    objects, psets, properties = file_gw.objects(), file_gw.psets(), file_gw.properties()
+    _assert_same(CatalogStats.from_models(objects, psets, properties),
+                 _catalog_stats(tmp_path / 'catalog.fdkc', objects, psets, properties))
+
+
+def test_incremental_updates_match_catalog(tmp_path: Path, file_gw: JsonFdkGateway):
+    objects, psets, properties = list(file_gw.objects()), list(file_gw.psets()), list(file_gw.properties())
+    stats = CatalogStats.from_models(objects, psets, properties)
+
+    added = replace(objects[0], fdk_id='OBJ_9999', department='Neu', group='Neu 1')
+    objects.append(added)
+    stats.upsert([added])
+
+    moved = replace(objects[1], department=objects[2].department, group=objects[2].group)
+    objects[1] = moved
+    changed = replace(properties[0], unit='furlong', object_ids=properties[0].object_ids[1:])
+    properties[0] = changed
+    pset = replace(psets[0], object_ids=psets[0].object_ids + ['OBJ_9999'])
+    psets[0] = pset
+    stats.upsert([changed, pset, moved])
+
+    removed_property, removed_pset, removed_object = properties.pop(), psets.pop(), objects.pop(3)
+    stats.remove(Property, [removed_property.fdk_id])
+    stats.remove(PropertySet, [removed_pset.fdk_id])
+    stats.remove(FdkObject, [removed_object.fdk_id])
+
+    _assert_same(stats, _catalog_stats(tmp_path / 'catalog.fdkc', objects, psets, properties))
+
+
+def _stored(deta: MemoryDeta) -> Dict[str, Any]:
+    base = deta.Base('fdk_stats')
+    return {key: base.get(key) for key in base.keys()}
+
+
+def test_stats_store_round_trip(file_gw: JsonFdkGateway, deta: MemoryDeta):
+    stats = CatalogStats.from_models(file_gw.objects(), file_gw.psets(), file_gw.properties())
+    store = DetaStatsStore(db_factory=deta.Base, max_chunk_bytes=512)
+    store.save(stats)
+    assert all(len(fdk_ids) == 0 for fdk_ids in stats.dirty.values())
+    assert sum(1 for key in _stored(deta) if key.startswith('state:properties:')) > 3
+
+    loaded = DetaStatsStore(db_factory=deta.Base, max_chunk_bytes=512).load()
+    _assert_same(loaded, stats)
+    assert store.summary() == json.loads(json.dumps(stats.summary()))
+
+
+def test_stats_store_writes_only_changed_chunks(file_gw: JsonFdkGateway, deta: MemoryDeta):
+    properties = file_gw.properties()
+    stats = CatalogStats.from_models(file_gw.objects(), file_gw.psets(), properties)
+    DetaStatsStore(db_factory=deta.Base, max_chunk_bytes=512).save(stats)
+    before = _stored(deta)
+
+    store = DetaStatsStore(db_factory=deta.Base, max_chunk_bytes=512)
+    stats = store.load()
+    stats.upsert([replace(properties[-1], format='Other')])
+    store.save(stats)
+    after = _stored(deta)
+    changed = set(key for key in after if after[key] != before.get(key))
+    chunks = [key for key in changed if key.startswith('state:properties:')]
+    assert len(chunks) == 1
+    assert changed == {'summary', 'state:properties', chunks[0]}
+    _assert_same(DetaStatsStore(db_factory=deta.Base).load(), stats)
+
+
+def test_stats_store_removes_surplus_chunks(file_gw: JsonFdkGateway, deta: MemoryDeta):
+    properties = file_gw.properties()
+    stats = CatalogStats.from_models(file_gw.objects(), file_gw.psets(), properties)
+    store = DetaStatsStore(db_factory=deta.Base, max_chunk_bytes=512)
+    store.save(stats)
+    chunks = sum(1 for key in _stored(deta) if key.startswith('state:properties:'))
+
+    stats.remove(Property, [model.fdk_id for model in properties[len(properties) // 2:]])
+    store.save(stats)
+    assert sum(1 for key in _stored(deta) if key.startswith('state:properties:')) < chunks
+    _assert_same(DetaStatsStore(db_factory=deta.Base).load(), stats)